@@ -0,0 +1,433 @@
+"""
+Servidor ASGI de leitura para o tráfego de dashboards (muitos clientes).
+
+As rotas de leitura mais acessadas são respondidas direto no event loop, a
+partir do estado em memória do processo (sem banco e sem uma thread por
+requisição), então um processo segura milhares de conexões abertas:
+
+    GET /status              frota inteira (FleetState); ?since=<seq> incremental
+    GET /status/<id>         uma moto
+    GET /stats               estatísticas do banco em cache (ASGI_STATS_TTL_S)
+    GET /snapshot            mesmo payload compacto do Flask
+    GET /stream              Server-Sent Events com as mudanças da frota
+
+Todo o resto (``/snapshot?at=``, ``/ingest``, ``/dashboard``...) segue para o
+app Flask num pool limitado de threads, então as rotas existentes continuam
+iguais. Consultas lentas ao banco rodam sempre fora do loop.
+
+Uso (um processo = simulação + estado + API):
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import script
+
+_JSON = [(b"content-type", b"application/json"), (b"access-control-allow-origin", b"*")]
+
+
+def _dumps(payload):
+    return json.dumps(payload, separators=(",", ":"), default=str).encode()
+
+
+async def _respond(send, body, status=200, headers=_JSON):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [*headers, (b"content-length", str(len(body)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def _query(scope):
+    """Parâmetros da query string (último valor de cada chave)"""
+    params = {}
+    for part in scope["query_string"].decode("latin-1").split("&"):
+        if part:
+            key, _, value = part.partition("=")
+            params[key] = value
+    return params
+
+
+class SharedResult:
+    """Resultado de uma função bloqueante compartilhado entre requisições.
+
+    Roda no máximo uma execução por vez no pool; dentro de ``ttl_s`` devolve
+    o valor em cache e, depois disso, ainda devolve o valor antigo enquanto
+    a atualização roda (só a primeira chamada de todas espera).
+    """
+
+    def __init__(self, fn, ttl_s):
+        self.fn = fn
+        self.ttl_s = ttl_s
+        self.value = None
+        self._expires = 0.0
+        self._future = None
+
+    async def get(self, executor):
+        if self.value is not None and time.monotonic() < self._expires:
+            return self.value
+        if self._future is None:
+            self._future = asyncio.get_running_loop().run_in_executor(executor, self.fn)
+            self._future.add_done_callback(self._done)
+        if self.value is not None:
+            return self.value
+        return await asyncio.shield(self._future)
+
+    def _done(self, future):
+        self._future = None
+        if not future.cancelled() and future.exception() is None:
+            self.value = future.result()
+            self._expires = time.monotonic() + self.ttl_s
+
+
+# ---------------- /stream ----------------
+class _StreamClient:
+    """Fila limitada de eventos ``(seq, bytes)`` de um cliente SSE"""
+
+    def __init__(self, size):
+        self.queue = asyncio.Queue(size)
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Cliente lento: descarta o atrasado e pede um evento completo
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+def _event(seq, full):
+    """Evento SSE com as motos alteradas após ``seq`` (ou a frota inteira)"""
+    high_water, full, rows = script.fleet_state.compact_changes(0 if full else seq)
+    payload = {"t": script._now_ms(), "seq": high_water, "full": full, "motos": rows}
+    if full:
+        payload["statuses"] = script.STATUS_LABELS.tolist()
+    kind = b"full" if full else b"delta"
+    return high_water, b"id: %d\nevent: %s\ndata: %s\n\n" % (
+        high_water,
+        kind,
+        _dumps(payload),
+    )
+
+
+class StreamHub:
+    """Difusão das mudanças da frota para todos os clientes de /stream.
+
+    Um único laço por processo lê o delta do FleetState a cada
+    ``interval_s``, serializa uma vez e entrega os mesmos bytes a todas as
+    filas; o custo por tick não depende do número de clientes.
+    """
+
+    def __init__(self, interval_s, queue_size):
+        self.interval_s = interval_s
+        self.queue_size = queue_size
+        self.clients = set()
+        self.events = 0
+        self.resyncs = 0
+
+    def subscribe(self):
+        client = _StreamClient(self.queue_size)
+        self.clients.add(client)
+        script.metric_set("asgi_stream_clients", len(self.clients))
+        return client
+
+    def unsubscribe(self, client):
+        self.clients.discard(client)
+        script.metric_set("asgi_stream_clients", len(self.clients))
+
+    async def run(self):
+        seq = script.fleet_state.seq
+        while True:
+            await asyncio.sleep(self.interval_s)
+            if not self.clients or script.fleet_state.seq == seq:
+                seq = script.fleet_state.seq
+                continue
+            seq, event = _event(seq, full=False)
+            self.events += 1
+            for client in list(self.clients):
+                client.offer((seq, event))
+
+    def stats(self):
+        return {
+            "clients": len(self.clients),
+            "interval_ms": int(self.interval_s * 1000),
+            "events": self.events,
+            "resyncs": self.resyncs,
+        }
+
+
+# ---------------- WSGI (rotas Flask) ----------------
+def _wsgi_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        # PEP 3333: caminho em bytes decodificados como latin-1
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope["headers"]:
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    # O corpo já foi lido inteiro (inclusive uploads chunked sem Content-Length)
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+def _call_wsgi(wsgi_app, environ):
+    """Executa o app WSGI e devolve (status, headers, corpo)"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = headers
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    headers = [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in started["headers"]
+    ]
+    return started["status"], headers, body
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+# ---------------- APP ----------------
+class ReadServer:
+    """App ASGI: rotas de leitura em memória + fallback para o app WSGI"""
+
+    def __init__(self, wsgi_app, wsgi_threads, stream_interval_s, stream_queue):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(wsgi_threads, thread_name_prefix="wsgi")
+        self.hub = StreamHub(stream_interval_s, stream_queue)
+        self.stats_cache = SharedResult(script.get_stats, script.ASGI_STATS_TTL_S)
+        self.snapshot_cache = SharedResult(script.build_snapshot, 0.0)
+        self._hub_task = None
+        self.routes = {
+            "/status": self.status,
+            "/stats": self.stats,
+            "/snapshot": self.snapshot,
+            "/stream": self.stream,
+            "/asgi/stats": self.asgi_stats,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        if self._hub_task is None:
+            # Servidores sem lifespan: sobe o hub na primeira requisição
+            self._hub_task = asyncio.ensure_future(self.hub.run())
+        handler = None
+        path = scope["path"]
+        if scope["method"] == "GET":
+            handler = self.routes.get(path)
+            if handler is None and path.startswith("/status/"):
+                handler = self.status_moto
+        script.metric_inc("asgi_requests")
+        if handler is None or not await handler(scope, receive, send):
+            await self.forward(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._hub_task = asyncio.ensure_future(self.hub.run())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._hub_task is not None:
+                    self._hub_task.cancel()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def forward(self, scope, receive, send):
+        """Rota Flask: roda no pool de threads"""
+        body = await _read_body(receive)
+        if body is None:
+            return
+        script.metric_inc("asgi_wsgi_requests")
+        status, headers, payload = await asyncio.get_running_loop().run_in_executor(
+            self.executor, _call_wsgi, self.wsgi_app, _wsgi_environ(scope, body)
+        )
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": payload})
+
+    # Cada handler devolve False para delegar a requisição ao Flask
+    async def status(self, scope, receive, send):
+        params = _query(scope)
+        try:
+            since = int(params.get("since", 0))
+        except ValueError:
+            return False
+        if script.fleet_state.size() == 0:
+            return (
+                False  # memória vazia (restart, nó só de /ingest): o Flask lê o banco
+            )
+        delta = script.fleet_state.changes_since(since, script._now_ms())
+        payload = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "seq": delta["seq"],
+            "total_motos": script.fleet_state.size(),
+            "motos": delta["motos"],
+        }
+        if "since" in params:
+            payload.update(since=since, full=delta["full"], changed=len(delta["motos"]))
+        await _respond(send, _dumps(payload))
+        return True
+
+    async def status_moto(self, scope, receive, send):
+        try:
+            moto_id = int(scope["path"][len("/status/") :])
+        except ValueError:
+            return False
+        if not 1 <= moto_id <= script.NUM_MOTOS:
+            return False  # o Flask responde o 400 de id fora da faixa
+        record = script.fleet_state.record(moto_id, script._now_ms())
+        if record is None:
+            return False  # moto fora da memória: o Flask consulta o banco
+        await _respond(send, _dumps({**record, "yard": script.YARD_ID}))
+        return True
+
+    async def stats(self, scope, receive, send):
+        if scope["query_string"]:
+            return False  # ?hours=... consulta o banco pelo Flask
+        try:
+            stats = await self.stats_cache.get(self.executor)
+        except Exception as e:
+            await _respond(send, _dumps({"error": str(e)}), status=500)
+            return True
+        await _respond(send, _dumps(stats))
+        return True
+
+    async def snapshot(self, scope, receive, send):
+        if scope["query_string"]:
+            return False  # ?at=... lê checkpoints pelo Flask
+        try:
+            body = await self.snapshot_cache.get(self.executor)
+        except Exception as e:
+            await _respond(send, _dumps({"error": str(e)}), status=500)
+            return True
+        await _respond(send, body.encode())
+        return True
+
+    async def asgi_stats(self, scope, receive, send):
+        await _respond(send, _dumps({"stream": self.hub.stats()}))
+        return True
+
+    async def stream(self, scope, receive, send):
+        """SSE: evento inicial (completo ou delta desde Last-Event-ID) e depois
+        um delta por tick com mudanças; comentário de keep-alive quando parado"""
+        last_id = dict(scope["headers"]).get(b"last-event-id", b"")
+        since = int(last_id) if last_id.isdigit() else 0
+        client = self.hub.subscribe()
+        disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        (b"access-control-allow-origin", b"*"),
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            # O cliente assina antes do evento inicial: deltas já na fila com
+            # seq até este high-water mark estão cobertos por ele e são descartados
+            stale_until, event = _event(since, full=since == 0)
+            while not disconnected.done():
+                if event is not None:
+                    await send(
+                        {"type": "http.response.body", "body": event, "more_body": True}
+                    )
+                getter = asyncio.ensure_future(client.queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, disconnected},
+                    timeout=script.ASGI_STREAM_KEEPALIVE_S,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if getter not in done:
+                    getter.cancel()
+                    event = b": keep-alive\n\n"
+                    continue
+                item = getter.result()
+                if item is None:
+                    self.hub.resyncs += 1
+                    stale_until, event = _event(0, full=True)
+                    continue
+                seq, event = item
+                if stale_until is not None:
+                    if seq <= stale_until:
+                        event = None
+                    else:
+                        stale_until = None
+        except OSError:
+            pass  # conexão caiu no meio do envio
+        finally:
+            disconnected.cancel()
+            self.hub.unsubscribe(client)
+        return True
+
+
+async def _wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+app = ReadServer(
+    script.app,
+    script.ASGI_WSGI_THREADS,
+    script.ASGI_STREAM_INTERVAL_MS / 1000,
+    script.ASGI_STREAM_QUEUE,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=script._resolve_port(8000))
@@ -0,0 +1,180 @@
+"""
+Codec de chunks de série temporal: as posições de uma moto numa janela de
+tempo viram um único blob compacto.
+
+Layout (little-endian):
+    cabeçalho  "MCK2", n (uint32), ts0 (int64 ms), x0, y0 (int32 quantizados)
+    6 seções   tamanho (uint32) + varints:
+               timestamps   delta-of-delta em zigzag (n - 1 valores)
+               x, y         deltas em zigzag das coordenadas quantizadas
+               quadrante    runs (código, repetições)
+               status       runs (código, repetições)
+               amostras     runs (detecções representadas pela linha, repetições)
+
+Blobs "MCK1" (sem a seção de amostras) continuam legíveis: cada linha vale
+uma amostra.
+
+Coordenadas são quantizadas em 1/COORD_SCALE px. Amostras com intervalo
+regular custam ~1 byte de timestamp, e motos paradas ~1 byte por eixo.
+Codificação e decodificação são vetorizadas em NumPy.
+"""
+
+import struct
+
+import numpy as np
+
+MAGIC = b"MCK2"
+_MAGIC_V1 = b"MCK1"
+COORD_SCALE = 100  # resolução de 0,01 px
+_HEADER = struct.Struct("<4sIqii")
+_SECTION = struct.Struct("<I")
+_SHIFTS = np.arange(0, 70, 7, dtype=np.uint64)  # até 10 grupos de 7 bits
+
+
+# ---- varint / zigzag ----
+def varint_encode(values):
+    """Varints LEB128 (7 bits por byte) de um array de inteiros não negativos"""
+    v = np.asarray(values, dtype=np.uint64)
+    if len(v) == 0:
+        return b""
+    groups = (v[:, None] >> _SHIFTS) & np.uint64(0x7F)
+    nonzero = groups != 0
+    nbytes = np.where(
+        nonzero.any(axis=1), len(_SHIFTS) - np.argmax(nonzero[:, ::-1], axis=1), 1
+    )
+    index = np.arange(len(_SHIFTS))
+    # Bit de continuação em todos os bytes menos o último de cada valor
+    groups |= (index < (nbytes - 1)[:, None]).astype(np.uint64) << np.uint64(7)
+    return groups[index < nbytes[:, None]].astype(np.uint8).tobytes()
+
+
+def varint_decode(data, count):
+    """Inverso de varint_encode; devolve ``count`` valores uint64"""
+    b = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(b < 0x80)[:count]
+    if len(ends) != count:
+        raise ValueError("Chunk corrompido: varints incompletos")
+    if count == 0:
+        return np.empty(0, dtype=np.uint64)
+    starts = np.r_[0, ends[:-1] + 1]
+    lengths = ends - starts + 1
+    if lengths.max() > len(_SHIFTS):
+        raise ValueError("Chunk corrompido: varint maior que 64 bits")
+    position = np.arange(ends[-1] + 1) - np.repeat(starts, lengths)
+    parts = (b[: ends[-1] + 1] & 0x7F).astype(np.uint64) << (position * 7).astype(
+        np.uint64
+    )
+    return np.bitwise_or.reduceat(parts, starts)
+
+
+def zigzag_encode(values):
+    v = np.asarray(values, dtype=np.int64)
+    return ((v << 1) ^ (v >> 63)).astype(np.uint64)
+
+
+def zigzag_decode(values):
+    u = np.asarray(values, dtype=np.uint64)
+    return (u >> np.uint64(1)).astype(np.int64) ^ -(u & np.uint64(1)).astype(np.int64)
+
+
+def _runs(values):
+    """Pares (valor, repetições) intercalados para run-length encoding"""
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    lengths = np.diff(np.r_[starts, len(values)])
+    return np.column_stack([values[starts].astype(np.int64), lengths]).ravel()
+
+
+def _decode_all(data, expected=None):
+    """Todos os varints da seção (um por byte sem bit de continuação)"""
+    if len(data) and data[-1] >= 0x80:
+        raise ValueError("Chunk corrompido: varint truncado no fim da seção")
+    count = int(np.count_nonzero(np.frombuffer(data, dtype=np.uint8) < 0x80))
+    if expected is not None and count != expected:
+        raise ValueError(
+            f"Chunk corrompido: {count} varints na seção, esperados {expected}"
+        )
+    return varint_decode(data, count)
+
+
+def _expand_runs(pairs, dtype, n):
+    if len(pairs) % 2:
+        raise ValueError("Chunk corrompido: run sem contagem")
+    values, lengths = pairs[0::2], pairs[1::2].astype(np.int64)
+    if lengths.sum() != n:
+        raise ValueError("Chunk corrompido: runs não cobrem o chunk")
+    return np.repeat(values.astype(dtype), lengths)
+
+
+# ---- chunk ----
+def encode_chunk(ts_ms, xs, ys, quad_codes, status_codes, samples=None):
+    """Codifica as amostras de uma moto (ordenadas por timestamp) num blob"""
+    ts = np.asarray(ts_ms, dtype=np.int64)
+    n = len(ts)
+    if n == 0:
+        raise ValueError("Chunk vazio")
+    if samples is None:
+        samples = np.ones(n, dtype=np.int64)
+    qx = np.round(np.asarray(xs, dtype=np.float64) * COORD_SCALE).astype(np.int64)
+    qy = np.round(np.asarray(ys, dtype=np.float64) * COORD_SCALE).astype(np.int64)
+    deltas = np.diff(ts)
+    dod = np.diff(deltas, prepend=0)
+    sections = (
+        varint_encode(zigzag_encode(dod)),
+        varint_encode(zigzag_encode(np.diff(qx))),
+        varint_encode(zigzag_encode(np.diff(qy))),
+        varint_encode(_runs(np.asarray(quad_codes))),
+        varint_encode(_runs(np.asarray(status_codes))),
+        varint_encode(_runs(np.asarray(samples))),
+    )
+    parts = [_HEADER.pack(MAGIC, n, int(ts[0]), int(qx[0]), int(qy[0]))]
+    for section in sections:
+        parts.append(_SECTION.pack(len(section)))
+        parts.append(section)
+    return b"".join(parts)
+
+
+def decode_chunk(blob):
+    """Reconstrói os arrays (ts_ms, x, y, quad_code, status_code, samples) de um blob"""
+    blob = bytes(blob)
+    if len(blob) < _HEADER.size:
+        raise ValueError("Chunk truncado: cabeçalho incompleto")
+    magic, n, ts0, x0, y0 = _HEADER.unpack_from(blob, 0)
+    if magic not in (MAGIC, _MAGIC_V1):
+        raise ValueError(f"Chunk com formato desconhecido: {magic!r}")
+    if n == 0:
+        raise ValueError("Chunk corrompido: zero amostras")
+    offset = _HEADER.size
+    sections = []
+    for _ in range(6 if magic == MAGIC else 5):
+        if offset + _SECTION.size > len(blob):
+            raise ValueError("Chunk truncado: seção ausente")
+        (size,) = _SECTION.unpack_from(blob, offset)
+        offset += _SECTION.size
+        if offset + size > len(blob):
+            raise ValueError("Chunk truncado: seção incompleta")
+        sections.append(blob[offset : offset + size])
+        offset += size
+    ts_section, x_section, y_section, quad_section, status_section = sections[:5]
+    if len(sections) > 5:
+        samples = _expand_runs(_decode_all(sections[5]), np.int64, n)
+    else:
+        samples = np.ones(n, dtype=np.int64)
+
+    dod = zigzag_decode(_decode_all(ts_section, n - 1))
+    ts = np.empty(n, dtype=np.int64)
+    ts[0] = ts0
+    ts[1:] = ts0 + np.cumsum(np.cumsum(dod))
+    qx = np.empty(n, dtype=np.int64)
+    qy = np.empty(n, dtype=np.int64)
+    qx[0], qy[0] = x0, y0
+    qx[1:] = x0 + np.cumsum(zigzag_decode(_decode_all(x_section, n - 1)))
+    qy[1:] = y0 + np.cumsum(zigzag_decode(_decode_all(y_section, n - 1)))
+
+    return {
+        "ts_ms": ts,
+        "x": qx / COORD_SCALE,
+        "y": qy / COORD_SCALE,
+        "quad_code": _expand_runs(_decode_all(quad_section), np.int16, n),
+        "status_code": _expand_runs(_decode_all(status_section), np.int8, n),
+        "samples": samples,
+    }
@@ -0,0 +1,114 @@
+"""
+Conexão Oracle em memória para os testes importarem script.py sem banco.
+
+``load_script()`` troca ``oracledb.connect`` pela conexão falsa e importa o
+módulo com AUTOSTART=0 (sem simulação, spool, listener nem compactador).
+Os INSERTs ficam em ``FAKE_CONN.rows``; ``FAKE_CONN.fail_with`` faz o
+próximo ``executemany`` levantar a exceção informada.
+"""
+
+import os
+import sys
+
+import oracledb
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self._rows = []
+
+    def execute(self, sql, params=None, **kwargs):
+        self.conn.statements.append(" ".join(sql.split()))
+        # init_db pergunta se tabelas/sequências existem: responde que sim
+        self._rows = [(1,)] if "COUNT(*)" in sql.upper() else []
+        return self
+
+    def executemany(self, sql, rows, **kwargs):
+        self.conn.statements.append(" ".join(sql.split()))
+        if self.conn.fail_with is not None:
+            error, self.conn.fail_with = self.conn.fail_with, None
+            raise error
+        rows = list(rows)
+        self.conn.rows.extend(rows)
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def setinputsizes(self, *args, **kwargs):
+        pass
+
+    def var(self, *args, **kwargs):
+        return None
+
+    @property
+    def description(self):
+        return []
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.rows = []
+        self.commits = 0
+        self.fail_with = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def ping(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeOracleError:
+    """Equivalente ao ``_Error`` do oracledb (``e.args[0]``)"""
+
+    def __init__(self, code, message=""):
+        self.code = code
+        self.message = message or f"ORA-{code:05d}"
+
+    def __str__(self):
+        return self.message
+
+
+def database_error(code):
+    """``oracledb.DatabaseError`` com o código ORA informado"""
+    return oracledb.DatabaseError(FakeOracleError(code))
+
+
+FAKE_CONN = FakeConnection()
+
+
+def load_script():
+    """Importa script.py ligado à conexão falsa (uma vez por processo)"""
+    if "script" not in sys.modules:
+        os.environ["AUTOSTART"] = "0"
+        oracledb.connect = lambda **kwargs: FAKE_CONN
+        oracledb.init_oracle_client = lambda *args, **kwargs: None
+    import script
+
+    return script
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Teste de carga HTTP ponta a ponta da API com verificação de SLO de latência.
+
+Sobe a aplicação sob gunicorn (com a simulação rodando) ou usa uma URL já
+no ar, dispara clientes concorrentes com a mistura de rotas do arquivo de
+configuração e falha (exit 1) se algum SLO for violado.
+
+Exemplos:
+    python loadtest.py                                  # sobe gunicorn local
+    python loadtest.py --config loadtest_slo.json --workers 4 --threads 8
+    python loadtest.py --url http://localhost:5000 --duration 60
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+DEFAULT_CONFIG = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "loadtest_slo.json"
+)
+
+
+def load_config(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ---------------- APLICAÇÃO ----------------
+def start_app(port, workers, threads, app_cmd=None):
+    """Sobe ``gunicorn script:app`` (ou ``app_cmd``) e devolve o processo"""
+    cmd = (
+        app_cmd.split()
+        if app_cmd
+        else [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "script:app",
+            f"--bind=127.0.0.1:{port}",
+            f"--workers={workers}",
+            f"--threads={threads}",
+            "--timeout=120",
+        ]
+    )
+    print(f"🚀 Subindo aplicação: {' '.join(cmd)}")
+    return subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_healthy(base_url, timeout_s, process=None):
+    """Espera /health/ready responder 200 (banco, simulação e gravação ok)"""
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+            conn.request("GET", "/health/ready")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(1)
+    return False
+
+
+# ---------------- CLIENTES ----------------
+class Client(threading.Thread):
+    """Cliente HTTP com conexão keep-alive que registra (rota, ms, ok, t)"""
+
+    def __init__(self, base_url, deadline, rng):
+        super().__init__(daemon=True)
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.deadline = deadline
+        self.rng = rng
+        self.samples = []
+        self._conn = None
+
+    def get(self, route, path):
+        started = time.perf_counter()
+        ok = False
+        try:
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(
+                    self.host, self.port, timeout=30
+                )
+            self._conn.request("GET", path)
+            response = self._conn.getresponse()
+            response.read()
+            # 4xx também é erro: id inválido ou cursor ruim no mix não passa no SLO
+            ok = 200 <= response.status < 400
+        except (OSError, http.client.HTTPException):
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+        now = time.perf_counter()
+        self.samples.append((route, (now - started) * 1000, ok, time.monotonic()))
+
+
+class ApiClient(Client):
+    """Integração: sorteia rotas conforme os pesos de ``mix``"""
+
+    def __init__(self, base_url, deadline, rng, mix, moto_ids, think_s):
+        super().__init__(base_url, deadline, rng)
+        self.routes = list(mix)
+        weights = np.array([mix[r] for r in self.routes], dtype=float)
+        self.weights = weights / weights.sum()
+        self.moto_ids = moto_ids
+        self.think_s = think_s
+
+    def run(self):
+        while time.monotonic() < self.deadline:
+            route = self.routes[self.rng.choice(len(self.routes), p=self.weights)]
+            path = route.replace("{id}", str(self.rng.choice(self.moto_ids)))
+            self.get(route, path)
+            if self.think_s:
+                time.sleep(self.think_s)
+
+
+class DashboardViewer(Client):
+    """Navegador com /dashboard aberto: carrega a página e faz polling de /snapshot"""
+
+    def __init__(self, base_url, deadline, rng, poll_s):
+        super().__init__(base_url, deadline, rng)
+        self.poll_s = poll_s
+
+    def run(self):
+        # Espalha os viewers ao longo do primeiro intervalo de polling
+        time.sleep(random.random() * self.poll_s)
+        self.get("/dashboard", "/dashboard")
+        next_poll = time.monotonic()
+        while time.monotonic() < self.deadline:
+            self.get("/snapshot", "/snapshot")
+            next_poll += self.poll_s
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+
+
+# ---------------- RELATÓRIO / SLO ----------------
+def summarize(samples, window_s):
+    """Vazão, erros e p50/p95/p99 por rota"""
+    report = {}
+    routes = sorted({s[0] for s in samples})
+    for route in routes:
+        latencies = np.array([s[1] for s in samples if s[0] == route])
+        errors = sum(1 for s in samples if s[0] == route and not s[2])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        report[route] = {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / window_s, 1),
+            "error_rate": round(errors / len(latencies), 4),
+            "p50_ms": round(float(p50), 1),
+            "p95_ms": round(float(p95), 1),
+            "p99_ms": round(float(p99), 1),
+            "max_ms": round(float(latencies.max()), 1),
+        }
+    return report
+
+
+def check_slo(report, slo):
+    """Lista de violações (rota, métrica, medido, limite); ``*`` vale para todas"""
+    violations = []
+    for route, result in report.items():
+        limits = {**slo.get("*", {}), **slo.get(route, {})}
+        for key, limit in limits.items():
+            metric = key.replace("max_", "")
+            if metric in result and result[metric] > limit:
+                violations.append((route, metric, result[metric], limit))
+    return violations
+
+
+def print_report(report, total_s):
+    print()
+    print(
+        f"{'Rota':<14}{'Req':>8}{'Req/s':>9}{'Erros':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'máx':>9}"
+    )
+    for route, r in report.items():
+        print(
+            f"{route:<14}{r['requests']:>8}{r['rps']:>9.1f}{r['error_rate']:>8.2%}"
+            f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}"
+        )
+    total = sum(r["requests"] for r in report.values())
+    print(
+        f"Total: {total} requisições em {total_s:.1f} s · {total / total_s:,.0f} req/s (latências em ms)"
+    )
+
+
+def run(args, config):
+    process = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        process = start_app(args.port, args.workers, args.threads, args.app_cmd)
+    try:
+        if not wait_healthy(base_url, args.startup_timeout, process):
+            print("❌ Aplicação não respondeu /health/ready a tempo")
+            return 2
+
+        duration = args.duration or config.get("duration_s", 30)
+        warmup = config.get("warmup_s", 5)
+        started = time.monotonic()
+        deadline = started + warmup + duration
+        rng = np.random.default_rng(config.get("seed", 42))
+        clients = [
+            ApiClient(
+                base_url,
+                deadline,
+                np.random.default_rng(rng.integers(1 << 32)),
+                config["mix"],
+                config.get("moto_ids", [1, 2, 3, 4]),
+                config.get("think_ms", 0) / 1000,
+            )
+            for _ in range(config.get("api_clients", 50))
+        ]
+        clients += [
+            DashboardViewer(
+                base_url,
+                deadline,
+                np.random.default_rng(rng.integers(1 << 32)),
+                config.get("dashboard_poll_s", 1.0),
+            )
+            for _ in range(config.get("dashboard_viewers", 100))
+        ]
+        print(
+            f"📈 {len(clients)} clientes contra {base_url} por {duration}s "
+            f"(+{warmup}s de aquecimento)"
+        )
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+
+        measured_from = started + warmup
+        samples = [s for c in clients for s in c.samples if s[3] >= measured_from]
+        if not samples:
+            print("❌ Nenhuma requisição concluída")
+            return 2
+        report = summarize(samples, duration)
+        print_report(report, duration)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+        violations = check_slo(report, config.get("slo", {}))
+        if violations:
+            print()
+            for route, metric, value, limit in violations:
+                print(f"❌ SLO violado: {route} {metric} = {value} (limite {limit})")
+            return 1
+        print("✅ Todos os SLOs atendidos")
+        return 0
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--config", default=DEFAULT_CONFIG, help="mistura de rotas e SLOs"
+    )
+    parser.add_argument(
+        "--url", default=None, help="usa app já no ar (não sobe gunicorn)"
+    )
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument(
+        "--app-cmd", default=None, help="comando alternativo para subir a app"
+    )
+    parser.add_argument("--duration", type=float, default=None, help="segundos medidos")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--json", default=None, help="grava o relatório em JSON")
+    args = parser.parse_args()
+    sys.exit(run(args, load_config(args.config)))
+
+
+if __name__ == "__main__":
+    main()
@@ -20,3 +20,8 @@ def get_dsn():
 # Configurações da tabela
 TABLE_NAME = 'detections'
 SEQUENCE_NAME = 'detections_seq'
+INTERVALS_TABLE_NAME = 'status_intervals'
+SPOOL_CHECKPOINT_TABLE_NAME = 'spool_checkpoints'
+HOURLY_TABLE_NAME = 'detections_hourly'
+CHUNKS_TABLE_NAME = 'detections_chunks'
+CHECKPOINTS_TABLE_NAME = 'fleet_checkpoints'
@@ -0,0 +1,272 @@
+"""
+Motor de cenários: move a frota a partir de arquivos declarativos (JSON).
+
+Um cenário descreve o tamanho da frota, rotas de waypoints entre zonas do
+pátio (com tempo de permanência em cada uma) e rajadas de chegada/saída
+(ex.: troca de turno). Todo o estado é mantido em arrays NumPy e cada
+``step`` avança a frota inteira de uma vez.
+
+Formato (ver scenarios/troca_de_turno.json):
+    {
+      "name": "...", "fleet_size": 500, "seed": 7,
+      "duration_s": 28800, "loop": true, "time_scale": 60,
+      "speed": [40, 90],                       # px/s
+      "initial_active": 0.6,                   # fração ou quantidade
+      "zones": {"oficina": ["A4", "B4"]},      # opcional
+      "entry": "patio", "exit": "patio",
+      "routes": [
+        {"name": "locacao", "weight": 3, "waypoints": [
+          {"zone": "no_patio", "dwell_s": [60, 600]},
+          {"zone": "em_uso", "dwell_s": [600, 3600]}]}
+      ],
+      "bursts": [
+        {"at_s": 21600, "type": "arrival", "count": 150, "spread_s": 900},
+        {"at_s": 28000, "type": "departure", "count": 200, "spread_s": 600}
+      ]
+    }
+
+Uma zona pode ser um nome de ``zones``, um status (todos os quadrantes com
+esse status) ou um rótulo de quadrante ("C3").
+"""
+
+import json
+
+import numpy as np
+
+INACTIVE, MOVING, DWELLING, LEAVING = 0, 1, 2, 3
+
+
+def load_scenario(path):
+    """Lê e valida um arquivo de cenário"""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    if int(spec.get("fleet_size", 0)) <= 0:
+        raise ValueError("Cenário: fleet_size deve ser positivo")
+    if not spec.get("routes"):
+        raise ValueError("Cenário: ao menos uma rota é obrigatória")
+    for route in spec["routes"]:
+        if not route.get("waypoints"):
+            raise ValueError(f"Cenário: rota {route.get('name')} sem waypoints")
+    for burst in spec.get("bursts", []):
+        if burst.get("type") not in ("arrival", "departure"):
+            raise ValueError(f"Cenário: rajada com tipo inválido: {burst}")
+    return spec
+
+
+class ScenarioEngine:
+    """Estado vetorizado da frota guiado por um cenário.
+
+    ``step(t_s)`` avança até o instante ``t_s`` (segundos de cenário) e
+    devolve a máscara de motos ativas (presentes no pátio); ``x``/``y``
+    guardam as posições de toda a frota.
+    """
+
+    def __init__(
+        self, spec, quadrant_labels, quadrant_status, quad_width, quad_height, grid_cols
+    ):
+        self.spec = spec
+        self.name = spec.get("name", "cenario")
+        self.fleet_size = n = int(spec["fleet_size"])
+        self.duration_s = float(spec.get("duration_s", 0)) or None
+        self.loop = bool(spec.get("loop", True))
+        self.time_scale = float(spec.get("time_scale", 1.0))
+        self.rng = np.random.default_rng(spec.get("seed", 0))
+        self._quad_width = quad_width
+        self._quad_height = quad_height
+        self._grid_cols = grid_cols
+
+        # Zonas -> arrays de códigos de quadrante
+        labels = list(quadrant_labels)
+        statuses = list(quadrant_status)
+        custom = spec.get("zones", {})
+        self._zone_ids = {}
+        self._zone_quads = []
+
+        def zone_id(name):
+            if name not in self._zone_ids:
+                if name in custom:
+                    quads = [labels.index(q) for q in custom[name]]
+                elif name in statuses:
+                    quads = [i for i, s in enumerate(statuses) if s == name]
+                elif name in labels:
+                    quads = [labels.index(name)]
+                else:
+                    raise ValueError(f"Cenário: zona desconhecida: {name}")
+                self._zone_ids[name] = len(self._zone_quads)
+                self._zone_quads.append(np.array(quads, dtype=np.int64))
+            return self._zone_ids[name]
+
+        # Rotas achatadas: waypoint global = route_start[r] + índice local
+        routes = spec["routes"]
+        self._route_start = np.zeros(len(routes), dtype=np.int64)
+        self._route_len = np.zeros(len(routes), dtype=np.int64)
+        wp_zone, wp_lo, wp_hi = [], [], []
+        for r, route in enumerate(routes):
+            self._route_start[r] = len(wp_zone)
+            self._route_len[r] = len(route["waypoints"])
+            for wp in route["waypoints"]:
+                lo, hi = wp.get("dwell_s", [0, 0])
+                wp_zone.append(zone_id(wp["zone"]))
+                wp_lo.append(float(lo))
+                wp_hi.append(float(hi))
+        self._wp_zone = np.array(wp_zone, dtype=np.int64)
+        self._wp_lo = np.array(wp_lo)
+        self._wp_hi = np.array(wp_hi)
+        weights = np.array([float(r.get("weight", 1)) for r in routes])
+        self._route_p = weights / weights.sum()
+        first_zone = spec["routes"][0]["waypoints"][0]["zone"]
+        self._entry_zone = zone_id(spec.get("entry", first_zone))
+        self._exit_zone = zone_id(spec.get("exit", spec.get("entry", first_zone)))
+        self._bursts = sorted(spec.get("bursts", []), key=lambda b: b["at_s"])
+
+        # Estado por moto
+        speed_lo, speed_hi = spec.get("speed", [30, 80])
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self._tx = np.zeros(n)
+        self._ty = np.zeros(n)
+        self._speed = self.rng.uniform(speed_lo, speed_hi, n)
+        self.state = np.full(n, INACTIVE, dtype=np.int8)
+        self._route = self.rng.choice(len(routes), size=n, p=self._route_p)
+        self._wp = np.zeros(n, dtype=np.int64)
+        self._dwell_until = np.zeros(n)
+        self._arrive_at = np.full(n, np.inf)
+        self._leave_at = np.full(n, np.inf)
+        self._t = 0.0
+        self._cycle = 0
+        self._next_burst = 0
+        self._reset_fleet()
+
+    # ---- amostragem ----
+    def _points_in_zones(self, zones):
+        """Ponto aleatório dentro de um quadrante de cada zona pedida"""
+        quads = np.empty(len(zones), dtype=np.int64)
+        for zone in np.unique(zones).tolist():
+            mask = zones == zone
+            quads[mask] = self.rng.choice(self._zone_quads[zone], size=mask.sum())
+        rows, cols = np.divmod(quads, self._grid_cols)
+        # Margem de 10% para o ponto não cair na divisa entre quadrantes
+        px = (cols + self.rng.uniform(0.1, 0.9, len(quads))) * self._quad_width
+        py = (rows + self.rng.uniform(0.1, 0.9, len(quads))) * self._quad_height
+        return px, py
+
+    def _target_waypoint(self, idx):
+        zones = self._wp_zone[self._route_start[self._route[idx]] + self._wp[idx]]
+        self._tx[idx], self._ty[idx] = self._points_in_zones(zones)
+        self.state[idx] = MOVING
+
+    def _activate(self, idx, at_entry):
+        self._route[idx] = self.rng.choice(
+            len(self._route_p), size=len(idx), p=self._route_p
+        )
+        self._wp[idx] = 0
+        if at_entry:
+            self.x[idx], self.y[idx] = self._points_in_zones(
+                np.full(len(idx), self._entry_zone)
+            )
+        self._target_waypoint(idx)
+
+    def _reset_fleet(self):
+        n = self.fleet_size
+        initial = self.spec.get("initial_active", 1.0)
+        count = int(round(initial * n)) if isinstance(initial, float) else int(initial)
+        count = min(max(count, 0), n)
+        self.state[:] = INACTIVE
+        self._arrive_at[:] = np.inf
+        self._leave_at[:] = np.inf
+        idx = self.rng.permutation(n)[:count]
+        # Frota inicial já espalhada pelas rotas, em waypoints aleatórios
+        self._activate(idx, at_entry=False)
+        self._wp[idx] = self.rng.integers(0, self._route_len[self._route[idx]])
+        self._target_waypoint(idx)
+        self.x[idx], self.y[idx] = self._tx[idx], self._ty[idx]
+        self._start_dwell(idx, 0.0)
+
+    def _start_dwell(self, idx, t):
+        wp = self._route_start[self._route[idx]] + self._wp[idx]
+        self._dwell_until[idx] = t + self.rng.uniform(self._wp_lo[wp], self._wp_hi[wp])
+        self.state[idx] = DWELLING
+
+    # ---- rajadas ----
+    def _fire_burst(self, burst, t):
+        spread = float(burst.get("spread_s", 0))
+        count = int(burst["count"])
+        if burst["type"] == "arrival":
+            pool = np.flatnonzero((self.state == INACTIVE) & np.isinf(self._arrive_at))
+            idx = self.rng.permutation(pool)[:count]
+            self._arrive_at[idx] = t + self.rng.uniform(0, spread, len(idx))
+        else:
+            pool = np.flatnonzero(
+                ((self.state == MOVING) | (self.state == DWELLING))
+                & np.isinf(self._leave_at)
+            )
+            idx = self.rng.permutation(pool)[:count]
+            self._leave_at[idx] = t + self.rng.uniform(0, spread, len(idx))
+
+    # ---- passo ----
+    def step(self, t_s):
+        """Avança a frota até ``t_s`` (tempo real × ``time_scale``)"""
+        t = t_s * self.time_scale
+        if self.duration_s and self.loop:
+            cycle, t = divmod(t, self.duration_s)
+            if cycle != self._cycle:
+                self._cycle = cycle
+                self._next_burst = 0
+                self._t = 0.0
+                self._reset_fleet()
+        dt = max(t - self._t, 0.0)
+        self._t = t
+
+        while (
+            self._next_burst < len(self._bursts)
+            and self._bursts[self._next_burst]["at_s"] <= t
+        ):
+            self._fire_burst(self._bursts[self._next_burst], t)
+            self._next_burst += 1
+
+        arriving = np.flatnonzero((self.state == INACTIVE) & (self._arrive_at <= t))
+        if len(arriving):
+            self._arrive_at[arriving] = np.inf
+            self._activate(arriving, at_entry=True)
+
+        leaving = np.flatnonzero((self.state != INACTIVE) & (self._leave_at <= t))
+        if len(leaving):
+            self._leave_at[leaving] = np.inf
+            self._tx[leaving], self._ty[leaving] = self._points_in_zones(
+                np.full(len(leaving), self._exit_zone)
+            )
+            self.state[leaving] = LEAVING
+
+        done = np.flatnonzero((self.state == DWELLING) & (self._dwell_until <= t))
+        if len(done):
+            self._wp[done] = (self._wp[done] + 1) % self._route_len[self._route[done]]
+            self._target_waypoint(done)
+
+        moving = np.flatnonzero((self.state == MOVING) | (self.state == LEAVING))
+        if len(moving) and dt > 0:
+            dx = self._tx[moving] - self.x[moving]
+            dy = self._ty[moving] - self.y[moving]
+            dist = np.hypot(dx, dy)
+            travel = self._speed[moving] * dt
+            arrived = dist <= travel
+            scale = np.where(arrived, 1.0, travel / np.maximum(dist, 1e-9))
+            self.x[moving] += dx * scale
+            self.y[moving] += dy * scale
+            reached = moving[arrived]
+            left = reached[self.state[reached] == LEAVING]
+            self.state[left] = INACTIVE
+            parked = reached[self.state[reached] == MOVING]
+            self._start_dwell(parked, t)
+
+        return self.state != INACTIVE
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "fleet_size": self.fleet_size,
+            "scenario_time_s": round(self._t, 1),
+            "active": int((self.state != INACTIVE).sum()),
+            "moving": int((self.state == MOVING).sum()),
+            "dwelling": int((self.state == DWELLING).sum()),
+            "leaving": int((self.state == LEAVING).sum()),
+        }
@@ -2,15 +2,36 @@ import cv2
 import numpy as np
 import string
 import os
+import sys
+import json
+import time
+import base64
+import zlib
 import oracledb
 from datetime import datetime, timedelta
 import threading
 import pandas as pd
 import warnings
+from collections import OrderedDict, deque
 import plotly.express as px
-from flask import Flask, jsonify, request
+import plotly.graph_objects as go
+from flask import Flask, jsonify, redirect, request
 from flask_cors import CORS
-from oracle_config import ORACLE_CONFIG, get_dsn, TABLE_NAME, SEQUENCE_NAME
+from oracle_config import (
+    ORACLE_CONFIG,
+    get_dsn,
+    TABLE_NAME,
+    SEQUENCE_NAME,
+    INTERVALS_TABLE_NAME,
+    SPOOL_CHECKPOINT_TABLE_NAME,
+    HOURLY_TABLE_NAME,
+    CHUNKS_TABLE_NAME,
+    CHECKPOINTS_TABLE_NAME,
+)
+from telemetry_listener import TelemetryListener
+from spool import RejectedBatch, Spool
+from scenario import ScenarioEngine, load_scenario
+from chunk_codec import decode_chunk, encode_chunk
 
 # Suprime warnings do pandas sobre DBAPI2 connections
 warnings.filterwarnings("ignore", category=UserWarning, module="pandas")
@@ -33,8 +54,257 @@ QUAD_WIDTH = WIDTH // GRID_COLS
 QUAD_HEIGHT = HEIGHT // GRID_ROWS
 NUM_MOTOS = 4
 
+# Sobe simulação, spool, listener e compactador ao importar o módulo
+# (AUTOSTART=0 só importa, ex.: nos testes)
+AUTOSTART = os.environ.get("AUTOSTART", "1") == "1"
+
+# Ingestão em lote (POST /ingest)
+INGEST_MAX_BATCH = int(os.environ.get("INGEST_MAX_BATCH", 100_000))
+# Janela aceita para o timestamp de uma detecção: até MAX_AGE_S no passado e
+# MAX_SKEW_S no futuro (relógio adiantado do rastreador). Uma linha datada no
+# futuro faria todas as detecções seguintes da moto parecerem atrasadas
+INGEST_MAX_AGE_S = float(os.environ.get("INGEST_MAX_AGE_S", 30 * 86400))
+INGEST_MAX_SKEW_S = float(os.environ.get("INGEST_MAX_SKEW_S", 30))
+# moto_id é gravado como NUMBER e usado como int32 nos formatos binários
+MOTO_ID_MAX = 2**31 - 1
+
+# Paginação keyset de /latest e /moto/<id>: teto de linhas por página
+PAGE_MAX_LIMIT = int(os.environ.get("PAGE_MAX_LIMIT", 5000))
+
+# Listener UDP/TCP de telemetria (desligado por padrão)
+TELEMETRY_LISTENER = os.environ.get("TELEMETRY_LISTENER", "0") == "1"
+TELEMETRY_UDP_PORT = int(os.environ.get("TELEMETRY_UDP_PORT", 5005))
+TELEMETRY_TCP_PORT = int(os.environ.get("TELEMETRY_TCP_PORT", 5006))
+TELEMETRY_TICK_MS = int(os.environ.get("TELEMETRY_TICK_MS", 50))
+TELEMETRY_MAX_BUFFER = int(os.environ.get("TELEMETRY_MAX_BUFFER", 200_000))
+TELEMETRY_UDP_POLICY = os.environ.get("TELEMETRY_UDP_POLICY", "drop_oldest")
+TELEMETRY_TCP_POLICY = os.environ.get("TELEMETRY_TCP_POLICY", "backpressure")
+
+# Heatmap de ocupação: resolução das células (padrão = grid de quadrantes)
+HEATMAP_ROWS = int(os.environ.get("HEATMAP_ROWS", GRID_ROWS))
+HEATMAP_COLS = int(os.environ.get("HEATMAP_COLS", GRID_COLS))
+# janela -> (duração em s, tamanho do bucket em s)
+HEATMAP_WINDOWS = {"5m": (300, 1), "1h": (3600, 10), "24h": (86400, 240)}
+
+# /snapshot: KPIs vindos do banco são reaproveitados por este intervalo
+SNAPSHOT_KPI_TTL_S = float(os.environ.get("SNAPSHOT_KPI_TTL_S", 2.0))
+
+# Alertas de eventos (proximidade...) ficam visíveis em /alerts por este tempo
+ALERT_FEED_SIZE = int(os.environ.get("ALERT_FEED_SIZE", 1000))
+ALERT_EVENT_TTL_S = float(os.environ.get("ALERT_EVENT_TTL_S", 60))
+
+# Distância (px) abaixo da qual duas motos geram alerta de proximidade
+PROXIMITY_DISTANCE = float(os.environ.get("PROXIMITY_DISTANCE", 25))
+
+# /status?since=N: quantas mudanças ficam no log antes de exigir snapshot completo
+STATUS_CHANGE_LOG_SIZE = int(os.environ.get("STATUS_CHANGE_LOG_SIZE", 100_000))
+
+# Pátio atendido por este processo. Cada processo (ou nó) é o shard de um
+# pátio; o mapa YARD_MAP (JSON) diz qual URL atende cada pátio:
+#   {"yards": {"sp-centro": {"url": "http://no1:5000", "motos": 40,
+#                            "scenario": "scenarios/troca_de_turno.json"}}}
+YARD_ID = os.environ.get("YARD_ID", "default")
+if (
+    not YARD_ID
+    or len(YARD_ID) > 40
+    or not all(c.isalnum() or c in "-_" for c in YARD_ID)
+):
+    raise ValueError(f"YARD_ID inválido: {YARD_ID!r}")
+YARD_MAP_FILE = os.environ.get("YARD_MAP")
+if YARD_MAP_FILE:
+    with open(YARD_MAP_FILE, encoding="utf-8") as _f:
+        YARD_MAP = json.load(_f)["yards"]
+else:
+    YARD_MAP = {YARD_ID: {}}
+YARD_CONFIG = YARD_MAP.get(YARD_ID, {})
+NUM_MOTOS = int(YARD_CONFIG.get("motos", NUM_MOTOS))
+
+# Spool em disco: detecções vão primeiro para um log local e são drenadas
+# para o Oracle em background (sobrevive a quedas do banco e a restarts)
+SPOOL_ENABLED = os.environ.get("SPOOL_ENABLED", "1") == "1"
+# Um diretório por pátio: vários shards podem rodar na mesma máquina
+SPOOL_DIR = os.environ.get(
+    "SPOOL_DIR",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "spool" if YARD_ID == "default" else f"spool-{YARD_ID}",
+    ),
+)
+SPOOL_SEGMENT_RECORDS = int(os.environ.get("SPOOL_SEGMENT_RECORDS", 1_000_000))
+SPOOL_DRAIN_BATCH = int(os.environ.get("SPOOL_DRAIN_BATCH", 50_000))
+
+# Cache de /moto/<id>: validade máxima e teto de memória dos resultados
+MOTO_CACHE_TTL_S = float(os.environ.get("MOTO_CACHE_TTL_S", 5.0))
+MOTO_CACHE_MAX_BYTES = int(os.environ.get("MOTO_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Chunks compactados: janela de cada blob, idade mínima para compactar as
+# linhas de detections e intervalo do compactador em background (0 = desligado)
+CHUNK_WINDOW_S = int(os.environ.get("CHUNK_WINDOW_S", 60))
+CHUNK_WINDOW_MS = CHUNK_WINDOW_S * 1000
+CHUNK_COMPACT_AFTER_S = float(os.environ.get("CHUNK_COMPACT_AFTER_S", 3600))
+CHUNK_COMPACT_INTERVAL_S = float(os.environ.get("CHUNK_COMPACT_INTERVAL_S", 600))
+
+# Banda morta: só grava uma detecção quando a moto andou mais que EPSILON px,
+# trocou de quadrante/status ou ficou HEARTBEAT_S sem linha gravada (motos
+# paradas no pátio deixam de gerar uma linha por frame)
+DEAD_BAND_ENABLED = os.environ.get("DEAD_BAND_ENABLED", "1") == "1"
+DEAD_BAND_EPSILON_PX = float(os.environ.get("DEAD_BAND_EPSILON_PX", 2.0))
+DEAD_BAND_HEARTBEAT_S = float(os.environ.get("DEAD_BAND_HEARTBEAT_S", 10.0))
+
+# Checkpoints da frota para /snapshot?at=: a cada CHECKPOINT_INTERVAL_S de
+# histórico gravado, a última linha de cada moto vira um blob (0 = desligado)
+CHECKPOINT_INTERVAL_S = float(os.environ.get("CHECKPOINT_INTERVAL_S", 60))
+CHECKPOINT_INTERVAL_MS = int(CHECKPOINT_INTERVAL_S * 1000)
+
+# Servidor ASGI de leitura (asgi_app.py): período e fila por cliente do
+# /stream, keep-alive, threads para as rotas Flask e validade do /stats
+ASGI_STREAM_INTERVAL_MS = int(os.environ.get("ASGI_STREAM_INTERVAL_MS", 250))
+ASGI_STREAM_QUEUE = int(os.environ.get("ASGI_STREAM_QUEUE", 64))
+ASGI_STREAM_KEEPALIVE_S = float(os.environ.get("ASGI_STREAM_KEEPALIVE_S", 15.0))
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", 32))
+ASGI_STATS_TTL_S = float(os.environ.get("ASGI_STATS_TTL_S", 2.0))
+
+# Histórico recente em memória: últimas N detecções de cada moto
+MOTO_HISTORY_SIZE = int(os.environ.get("MOTO_HISTORY_SIZE", 1000))
+
+# Relógio da simulação: taxa alvo de ticks e quantos ticks atrasados recuperar
+SIMULATION_TICK_HZ = float(os.environ.get("SIMULATION_TICK_HZ", 33.0))
+SIMULATION_MAX_CATCHUP = int(os.environ.get("SIMULATION_MAX_CATCHUP", 5))
+# Ticks aguardando gravação antes de descartar os mais antigos
+SIMULATION_MAX_PENDING = int(os.environ.get("SIMULATION_MAX_PENDING", 10_000))
+
+# Health checks em background: intervalo entre verificações e limites de prontidão
+HEALTH_CHECK_INTERVAL_S = float(os.environ.get("HEALTH_CHECK_INTERVAL_S", 5.0))
+HEALTH_STALE_S = float(os.environ.get("HEALTH_STALE_S", 30.0))
+HEALTH_DB_TIMEOUT_MS = int(os.environ.get("HEALTH_DB_TIMEOUT_MS", 2000))
+HEALTH_MAX_TICK_LAG_MS = float(os.environ.get("HEALTH_MAX_TICK_LAG_MS", 1000.0))
+HEALTH_MAX_PENDING_TICKS = int(
+    os.environ.get("HEALTH_MAX_PENDING_TICKS", SIMULATION_MAX_PENDING // 2)
+)
+HEALTH_MAX_SPOOL_LAG_S = float(os.environ.get("HEALTH_MAX_SPOOL_LAG_S", 60.0))
+
+# Geofences poligonais (JSON) com zonas irregulares do pátio (lavagem, recarga,
+# saída...); opcionalmente impõem um status às motos dentro delas
+GEOFENCES_FILE = os.environ.get("GEOFENCES_FILE", YARD_CONFIG.get("geofences"))
+
+# Cenário declarativo (JSON) que define frota, rotas e rajadas; sem ele a
+# simulação usa as quatro motos quicando nas bordas
+SIMULATION_SCENARIO = os.environ.get("SIMULATION_SCENARIO", YARD_CONFIG.get("scenario"))
+SCENARIO_SPEC = load_scenario(SIMULATION_SCENARIO) if SIMULATION_SCENARIO else None
+if SCENARIO_SPEC is not None:
+    NUM_MOTOS = int(SCENARIO_SPEC["fleet_size"])
+
+# Anomalias de trajetória (em memória, sem consultas ao banco): salto maior
+# que TELEPORT_PX num único passo, velocidade acima de MAX_SPEED_PX_S, posição
+# fora do pátio e moto "em_uso" parada (dentro de STUCK_EPSILON_PX) por
+# STUCK_S segundos. Com cenário, a velocidade padrão acompanha o time_scale
+_ANOMALY_TIME_SCALE = (
+    float(SCENARIO_SPEC.get("time_scale", 1.0)) if SCENARIO_SPEC else 1.0
+)
+ANOMALY_MAX_SPEED_PX_S = float(
+    os.environ.get("ANOMALY_MAX_SPEED_PX_S", 400.0 * _ANOMALY_TIME_SCALE)
+)
+ANOMALY_TELEPORT_PX = float(os.environ.get("ANOMALY_TELEPORT_PX", 200.0))
+ANOMALY_STUCK_EPSILON_PX = float(os.environ.get("ANOMALY_STUCK_EPSILON_PX", 2.0))
+ANOMALY_STUCK_S = float(os.environ.get("ANOMALY_STUCK_S", 120.0))
+
 
 # ---------------- DATABASE ----------------
+def _create_if_missing(cur, ddl, label):
+    """Executa um CREATE ignorando objeto já existente (ORA-00955/ORA-01408).
+
+    Retorna True se o objeto foi criado agora.
+    """
+    try:
+        cur.execute(ddl)
+        print(f"✅ Criado com sucesso: {label}")
+        return True
+    except oracledb.Error as e:
+        (error,) = e.args
+        if error.code not in (955, 1408):
+            raise
+        print(f"ℹ️  Já existe: {label}")
+        return False
+
+
+# Status de linhas antigas gravadas antes da coluna status existir
+SUMMARY_NO_STATUS = "sem_status"
+
+
+def _rebuild_hourly_summary(cur):
+    """Recalcula o resumo horário do pátio a partir de detections (uma varredura)"""
+    cur.execute(f"DELETE FROM {HOURLY_TABLE_NAME} WHERE yard_id = :1", [YARD_ID])
+    cur.execute(
+        f"""
+        INSERT INTO {HOURLY_TABLE_NAME}
+            (yard_id, hour_ts, moto_id, quadrant, status, cnt, min_ts, max_ts)
+        SELECT yard_id, CAST(TRUNC(timestamp, 'HH24') AS TIMESTAMP), moto_id,
+               NVL(quadrant, '?'), NVL(status, '{SUMMARY_NO_STATUS}'),
+               SUM(samples), MIN(timestamp), MAX(timestamp)
+        FROM {TABLE_NAME}
+        WHERE yard_id = :1 AND timestamp IS NOT NULL AND moto_id IS NOT NULL
+        GROUP BY yard_id, TRUNC(timestamp, 'HH24'), moto_id,
+                 NVL(quadrant, '?'), NVL(status, '{SUMMARY_NO_STATUS}')
+        """,
+        [YARD_ID],
+    )
+    print(f"✅ Resumo {HOURLY_TABLE_NAME} recalculado ({cur.rowcount} linhas)")
+
+
+# Tabelas particionadas por pátio (LIST automático em yard_id)
+_YARD_TABLES = (TABLE_NAME, INTERVALS_TABLE_NAME, HOURLY_TABLE_NAME)
+
+
+def _ensure_yard_partitioning(cur):
+    """Garante a coluna yard_id e o particionamento por pátio das tabelas.
+
+    Linhas antigas ficam no pátio 'default'. O particionamento online exige
+    Oracle 12.2+ com a opção de partitioning; sem ela só emite um aviso e as
+    consultas continuam filtradas por yard_id via índice.
+    """
+    for table in _YARD_TABLES:
+        cur.execute(
+            """
+            SELECT COUNT(*) FROM user_tab_columns
+            WHERE table_name = UPPER(:1) AND column_name = 'YARD_ID'
+            """,
+            [table],
+        )
+        if cur.fetchone()[0] == 0:
+            cur.execute(
+                f"ALTER TABLE {table} ADD yard_id VARCHAR2(40) DEFAULT 'default' NOT NULL"
+            )
+            print(f"✅ Coluna 'yard_id' adicionada à tabela {table}")
+            if table == HOURLY_TABLE_NAME:
+                # O pátio passa a fazer parte da chave do resumo
+                cur.execute(
+                    f"ALTER TABLE {table} DROP CONSTRAINT {table}_pk DROP INDEX"
+                )
+                cur.execute(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {table}_pk "
+                    "PRIMARY KEY (yard_id, hour_ts, moto_id, quadrant, status)"
+                )
+
+        cur.execute(
+            "SELECT COUNT(*) FROM user_part_tables WHERE table_name = UPPER(:1)",
+            [table],
+        )
+        if cur.fetchone()[0] > 0:
+            print(f"ℹ️  Tabela {table} já particionada por pátio")
+            continue
+        try:
+            cur.execute(
+                f"""
+                ALTER TABLE {table} MODIFY PARTITION BY LIST (yard_id) AUTOMATIC
+                (PARTITION p_default VALUES ('default')) ONLINE
+                """
+            )
+            print(f"✅ Tabela {table} particionada por pátio")
+        except oracledb.Error as e:
+            (error,) = e.args
+            print(f"⚠️  Aviso ao particionar {table} por pátio: {error.message}")
+
+
 def init_db():
     # Conecta ao Oracle (sempre tenta conectar primeiro)
     try:
@@ -73,7 +343,7 @@ def init_db():
                 CREATE SEQUENCE {SEQUENCE_NAME}
                 START WITH 1
                 INCREMENT BY 1
-                NOCACHE
+                CACHE 1000
                 NOCYCLE
                 """
                 )
@@ -85,6 +355,13 @@ def init_db():
                 print("ℹ️  Sequência já existe")
         else:
             print("ℹ️  Sequência já existe")
+            # Inserts em lote chamam NEXTVAL por linha; sem cache cada chamada
+            # atualiza o dicionário de dados
+            try:
+                cur.execute(f"ALTER SEQUENCE {SEQUENCE_NAME} CACHE 1000")
+            except oracledb.Error as e:
+                (error,) = e.args
+                print(f"⚠️  Aviso ao ajustar cache da sequência: {error.message}")
 
         # Cria a tabela se não existir
         if not table_exists:
@@ -93,12 +370,14 @@ def init_db():
                     f"""
                 CREATE TABLE {TABLE_NAME} (
                     id NUMBER PRIMARY KEY,
+                    yard_id VARCHAR2(40) DEFAULT 'default' NOT NULL,
                     moto_id NUMBER,
                     x NUMBER,
                     y NUMBER,
                     quadrant VARCHAR2(10),
                     status VARCHAR2(20),
-                    timestamp TIMESTAMP
+                    timestamp TIMESTAMP,
+                    samples NUMBER DEFAULT 1 NOT NULL
                 )
                 """
                 )
@@ -131,6 +410,157 @@ def init_db():
                 (error,) = e.args
                 print(f"⚠️  Aviso ao verificar coluna status: {error.message}")
 
+            # Detecções representadas por cada linha (banda morta)
+            cur.execute(
+                f"""
+                SELECT COUNT(*)
+                FROM user_tab_columns
+                WHERE table_name = UPPER('{TABLE_NAME}')
+                AND column_name = 'SAMPLES'
+                """
+            )
+            if cur.fetchone()[0] == 0:
+                cur.execute(
+                    f"ALTER TABLE {TABLE_NAME} ADD samples NUMBER DEFAULT 1 NOT NULL"
+                )
+                print("✅ Coluna 'samples' adicionada à tabela")
+
+        # Índices para paginação keyset (ORDER BY timestamp DESC, id DESC)
+        _create_if_missing(
+            cur,
+            f"CREATE INDEX {TABLE_NAME}_ts_idx ON {TABLE_NAME} (timestamp, id)",
+            f"Índice {TABLE_NAME}_ts_idx",
+        )
+        _create_if_missing(
+            cur,
+            f"CREATE INDEX {TABLE_NAME}_moto_ts_idx ON {TABLE_NAME} (moto_id, timestamp, id)",
+            f"Índice {TABLE_NAME}_moto_ts_idx",
+        )
+
+        # Intervalos de status (dwell time) mantidos pelo caminho de ingestão
+        _create_if_missing(
+            cur,
+            f"""
+            CREATE TABLE {INTERVALS_TABLE_NAME} (
+                yard_id VARCHAR2(40) DEFAULT 'default' NOT NULL,
+                moto_id NUMBER NOT NULL,
+                status VARCHAR2(20) NOT NULL,
+                next_status VARCHAR2(20),
+                enter_ts TIMESTAMP NOT NULL,
+                exit_ts TIMESTAMP NOT NULL,
+                duration_ms NUMBER NOT NULL
+            )
+            """,
+            f"Tabela {INTERVALS_TABLE_NAME}",
+        )
+        _create_if_missing(
+            cur,
+            f"CREATE INDEX {INTERVALS_TABLE_NAME}_moto_idx ON {INTERVALS_TABLE_NAME} (moto_id, enter_ts)",
+            f"Índice {INTERVALS_TABLE_NAME}_moto_idx",
+        )
+        _create_if_missing(
+            cur,
+            f"CREATE INDEX {INTERVALS_TABLE_NAME}_status_idx ON {INTERVALS_TABLE_NAME} (exit_ts, status)",
+            f"Índice {INTERVALS_TABLE_NAME}_status_idx",
+        )
+
+        # Último seq do spool local confirmado (gravado na mesma transação)
+        _create_if_missing(
+            cur,
+            f"""
+            CREATE TABLE {SPOOL_CHECKPOINT_TABLE_NAME} (
+                spool_id VARCHAR2(100) PRIMARY KEY,
+                last_seq NUMBER NOT NULL,
+                updated_at TIMESTAMP
+            )
+            """,
+            f"Tabela {SPOOL_CHECKPOINT_TABLE_NAME}",
+        )
+
+        # Resumo horário (hora × moto × quadrante × status) mantido pela
+        # ingestão; /stats lê daqui em vez de varrer detections
+        created = _create_if_missing(
+            cur,
+            f"""
+            CREATE TABLE {HOURLY_TABLE_NAME} (
+                yard_id VARCHAR2(40) DEFAULT 'default' NOT NULL,
+                hour_ts TIMESTAMP NOT NULL,
+                moto_id NUMBER NOT NULL,
+                quadrant VARCHAR2(10) NOT NULL,
+                status VARCHAR2(20) NOT NULL,
+                cnt NUMBER NOT NULL,
+                min_ts TIMESTAMP NOT NULL,
+                max_ts TIMESTAMP NOT NULL,
+                CONSTRAINT {HOURLY_TABLE_NAME}_pk
+                    PRIMARY KEY (yard_id, hour_ts, moto_id, quadrant, status)
+            )
+            """,
+            f"Tabela {HOURLY_TABLE_NAME}",
+        )
+
+        # Pátio em todas as tabelas de detecção (antes do backfill do resumo)
+        _ensure_yard_partitioning(cur)
+        _create_if_missing(
+            cur,
+            f"CREATE INDEX {TABLE_NAME}_yard_ts_idx ON {TABLE_NAME} (yard_id, timestamp, id)",
+            f"Índice {TABLE_NAME}_yard_ts_idx",
+        )
+        _create_if_missing(
+            cur,
+            f"CREATE INDEX {TABLE_NAME}_yard_moto_ts_idx ON {TABLE_NAME} (yard_id, moto_id, timestamp, id)",
+            f"Índice {TABLE_NAME}_yard_moto_ts_idx",
+        )
+        if created and table_exists:
+            _rebuild_hourly_summary(cur)
+
+        # Histórico compactado: um blob por moto e janela de CHUNK_WINDOW_S
+        chunks_created = _create_if_missing(
+            cur,
+            f"""
+            CREATE TABLE {CHUNKS_TABLE_NAME} (
+                yard_id VARCHAR2(40) DEFAULT 'default' NOT NULL,
+                moto_id NUMBER NOT NULL,
+                window_start TIMESTAMP NOT NULL,
+                min_ts TIMESTAMP NOT NULL,
+                max_ts TIMESTAMP NOT NULL,
+                cnt NUMBER NOT NULL,
+                payload BLOB NOT NULL
+            )
+            """,
+            f"Tabela {CHUNKS_TABLE_NAME}",
+        )
+        _create_if_missing(
+            cur,
+            f"CREATE INDEX {CHUNKS_TABLE_NAME}_moto_idx ON {CHUNKS_TABLE_NAME} (yard_id, moto_id, max_ts)",
+            f"Índice {CHUNKS_TABLE_NAME}_moto_idx",
+        )
+        _create_if_missing(
+            cur,
+            f"CREATE INDEX {CHUNKS_TABLE_NAME}_ts_idx ON {CHUNKS_TABLE_NAME} (yard_id, max_ts)",
+            f"Índice {CHUNKS_TABLE_NAME}_ts_idx",
+        )
+        # Estado completo da frota a cada CHECKPOINT_INTERVAL_S (/snapshot?at=)
+        _create_if_missing(
+            cur,
+            f"""
+            CREATE TABLE {CHECKPOINTS_TABLE_NAME} (
+                yard_id VARCHAR2(40) DEFAULT 'default' NOT NULL,
+                checkpoint_ts TIMESTAMP NOT NULL,
+                moto_count NUMBER NOT NULL,
+                payload BLOB NOT NULL,
+                CONSTRAINT {CHECKPOINTS_TABLE_NAME}_pk
+                    PRIMARY KEY (yard_id, checkpoint_ts)
+            )
+            """,
+            f"Tabela {CHECKPOINTS_TABLE_NAME}",
+        )
+
+        if created and not chunks_created:
+            print(
+                "⚠️  Resumo horário recriado só a partir de detections; rode "
+                "`python script.py rebuild-summary` para incluir os chunks"
+            )
+
         # Cria ou atualiza o trigger (sempre executa)
         try:
             cur.execute(
@@ -170,27 +600,572 @@ db_lock = threading.Lock()
 
 def save_detection(moto_id, x, y, quadrant):
     """Salva detecção no banco com status baseado no quadrante"""
-    ts = datetime.utcnow()
-    status = get_status_from_quadrant(quadrant)
+    ingest_batch(
+        np.array([moto_id], dtype=np.int64),
+        np.array([x], dtype=np.float64),
+        np.array([y], dtype=np.float64),
+        np.array([_now_ms()], dtype=np.int64),
+    )
+
+
+_DETECTION_COLUMNS = "id, moto_id, x, y, quadrant, status, timestamp, yard_id, samples"
+# Tabela de staging (sem trigger) da carga direta do ``generate --direct-path``
+LOAD_TABLE_NAME = f"{TABLE_NAME}_load"
+
+
+def _insert_detections(cur, batch, direct_path=False, table=TABLE_NAME):
+    """INSERT array-DML do lote no cursor informado (sem commit).
+
+    O id vem sempre da sequência no próprio INSERT, sem depender do trigger.
+    ``direct_path`` usa o hint APPEND_VALUES, que o Oracle só respeita em
+    tabela sem trigger habilitado (a de staging).
+    """
+    samples = batch.get("samples")
+    if samples is None:
+        samples = np.ones(len(batch["moto_id"]), dtype=np.int64)
+    rows = list(
+        zip(
+            batch["moto_id"].tolist(),
+            batch["x"].tolist(),
+            batch["y"].tolist(),
+            QUADRANT_LABELS[batch["quad_code"]].tolist(),
+            STATUS_LABELS[batch["status_code"]].tolist(),
+            batch["ts_ms"].astype("datetime64[ms]").tolist(),
+            [YARD_ID] * len(batch["moto_id"]),
+            samples.tolist(),
+        )
+    )
+    cur.setinputsizes(None, None, None, 10, 20, oracledb.DB_TYPE_TIMESTAMP, 40, None)
+    hint = "/*+ APPEND_VALUES */ " if direct_path else ""
+    cur.executemany(
+        f"INSERT {hint}INTO {table} ({_DETECTION_COLUMNS}) "
+        f"VALUES ({SEQUENCE_NAME}.NEXTVAL, :1, :2, :3, :4, :5, :6, :7, :8)",
+        rows,
+    )
+
+
+def _upsert_hourly_summary(cur, batch):
+    """Agrega o lote por hora × moto × quadrante × status e faz MERGE no resumo.
+
+    Linhas com ``samples`` (banda morta) contam pelas detecções que representam.
+    """
+    if len(batch["moto_id"]) == 0:
+        return
+    frame = pd.DataFrame(
+        {
+            "hour": batch["ts_ms"] // 3_600_000 * 3_600_000,
+            "moto_id": batch["moto_id"],
+            "quad_code": batch["quad_code"],
+            "status_code": batch["status_code"],
+            "ts_ms": batch["ts_ms"],
+            "samples": batch.get("samples", 1),
+        }
+    )
+    groups = (
+        frame.groupby(["hour", "moto_id", "quad_code", "status_code"], sort=False)
+        .agg(
+            size=("samples", "sum"),
+            min=("ts_ms", "min"),
+            max=("ts_ms", "max"),
+        )
+        .reset_index()
+    )
+    rows = list(
+        zip(
+            groups["hour"].to_numpy().astype("datetime64[ms]").tolist(),
+            groups["moto_id"].tolist(),
+            QUADRANT_LABELS[groups["quad_code"].to_numpy()].tolist(),
+            STATUS_LABELS[groups["status_code"].to_numpy()].tolist(),
+            groups["size"].tolist(),
+            groups["min"].to_numpy().astype("datetime64[ms]").tolist(),
+            groups["max"].to_numpy().astype("datetime64[ms]").tolist(),
+            [YARD_ID] * len(groups),
+        )
+    )
+    cur.setinputsizes(
+        oracledb.DB_TYPE_TIMESTAMP,
+        None,
+        10,
+        20,
+        None,
+        oracledb.DB_TYPE_TIMESTAMP,
+        oracledb.DB_TYPE_TIMESTAMP,
+        40,
+    )
+    cur.executemany(
+        f"""
+        MERGE INTO {HOURLY_TABLE_NAME} h
+        USING (
+            SELECT :1 AS hour_ts, :2 AS moto_id, :3 AS quadrant, :4 AS status,
+                   :5 AS cnt, :6 AS min_ts, :7 AS max_ts, :8 AS yard_id
+            FROM dual
+        ) s
+        ON (h.yard_id = s.yard_id AND h.hour_ts = s.hour_ts AND h.moto_id = s.moto_id
+            AND h.quadrant = s.quadrant AND h.status = s.status)
+        WHEN MATCHED THEN UPDATE SET
+            h.cnt = h.cnt + s.cnt,
+            h.min_ts = LEAST(h.min_ts, s.min_ts),
+            h.max_ts = GREATEST(h.max_ts, s.max_ts)
+        WHEN NOT MATCHED THEN INSERT
+            (yard_id, hour_ts, moto_id, quadrant, status, cnt, min_ts, max_ts)
+            VALUES (s.yard_id, s.hour_ts, s.moto_id, s.quadrant, s.status,
+                    s.cnt, s.min_ts, s.max_ts)
+        """,
+        rows,
+    )
+
+
+def rebuild_hourly_summary(block_rows=200_000):
+    """Recalcula o resumo horário (ex.: após carga externa via SQL*Loader),
+    incluindo o histórico compactado em chunks"""
+    with db_lock:
+        cur = db_conn.cursor()
+        _rebuild_hourly_summary(cur)
+        parts, rows = [], 0
+        for moto_id, _, payload in _iter_chunks("", {}, cur=db_conn.cursor()):
+            chunk = decode_chunk(payload)
+            chunk["moto_id"] = np.full(len(chunk["ts_ms"]), moto_id, dtype=np.int64)
+            parts.append(chunk)
+            rows += len(chunk["ts_ms"])
+            if rows >= block_rows:
+                _upsert_hourly_summary(cur, _concat_chunks(parts))
+                parts, rows = [], 0
+        if parts:
+            _upsert_hourly_summary(cur, _concat_chunks(parts))
+        db_conn.commit()
+
+
+def history_trackers():
+    """Banda morta, intervalos de status e checkpoints da frota de uma carga de
+    histórico (``generate``).
+
+    São instâncias próprias, vazias: o intervalo gerado não se mistura com o
+    estado ao vivo nem parte do banco. Amostras retidas pela banda morta no
+    fim da carga não são gravadas (como num restart).
+    """
+    return (
+        DeadBandFilter(
+            DEAD_BAND_EPSILON_PX, int(DEAD_BAND_HEARTBEAT_S * 1000), DEAD_BAND_ENABLED
+        ),
+        StatusIntervalTracker(),
+        FleetCheckpointer(
+            CHECKPOINT_INTERVAL_MS, initial_state=np.empty(0, dtype=_FLEET_RECORD)
+        ),
+    )
+
+
+def save_history_batch(batch, trackers, direct_path=False, chunked=False):
+    """Persiste um lote de histórico como o persist_batch: detecções (ou
+    chunks), resumo horário, intervalos de status e checkpoints da frota numa
+    única transação, com os rastreadores de ``history_trackers()``.
+
+    ``direct_path`` faz a carga direta (APPEND_VALUES) na tabela de staging
+    ``LOAD_TABLE_NAME``, sem trigger, e a copia para detections com um único
+    INSERT ... SELECT na transação do lote. A tabela ao vivo não perde o
+    trigger nem fica com lock exclusivo. O staging é esvaziado antes de cada
+    lote, então o que sobrar de um crash não é copiado duas vezes.
+    """
+    n = len(batch["moto_id"])
+    if n == 0:
+        return 0
+    dead_band_filter, tracker, checkpointer = trackers
+    with db_lock:
+        try:
+            rows, dead_band_pending = dead_band_filter.plan(batch)
+            closed, pending = tracker.plan(
+                batch["moto_id"], batch["status_code"], batch["ts_ms"]
+            )
+            cur = db_conn.cursor()
+            if direct_path and not chunked and len(rows["moto_id"]):
+                # Linhas de carga direta só podem ser lidas após o commit
+                cur.execute(f"TRUNCATE TABLE {LOAD_TABLE_NAME}")
+                _insert_detections(cur, rows, True, table=LOAD_TABLE_NAME)
+                db_conn.commit()
+            checkpoint, checkpoint_pending = checkpointer.plan(cur, rows)
+            if chunked:
+                _insert_chunks(cur, _chunk_rows(rows, CHUNK_WINDOW_MS))
+            elif direct_path and len(rows["moto_id"]):
+                cur.execute(
+                    f"INSERT INTO {TABLE_NAME} ({_DETECTION_COLUMNS}) "
+                    f"SELECT {_DETECTION_COLUMNS} FROM {LOAD_TABLE_NAME}"
+                )
+            elif len(rows["moto_id"]):
+                _insert_detections(cur, rows)
+            _upsert_hourly_summary(cur, rows)
+            if checkpoint is not None:
+                _insert_checkpoint(cur, checkpoint)
+            _insert_intervals(cur, closed)
+            db_conn.commit()
+            tracker.commit(pending)
+            dead_band_filter.commit(dead_band_pending)
+            checkpointer.commit(checkpoint_pending)
+        except Exception:
+            try:
+                db_conn.rollback()
+            except oracledb.Error:
+                pass
+            raise
+    moto_cache.bump(rows["moto_id"])
+    return n
+
+
+def persist_batch(batch, spool_id=None, spool_seq=None):
+    """Grava detecções, intervalos fechados e o checkpoint do spool numa única
+    transação; o estado do rastreador de intervalos, o da banda morta e o
+    dos checkpoints da frota só avançam após o commit.
+
+    Só as linhas que passam pela banda morta vão para detections; os
+    intervalos de status usam o lote inteiro.
+    """
+    # Planeja sob o db_lock: dois produtores concorrentes (simulação, /ingest,
+    # listener) partiriam do mesmo estado, fechariam o mesmo intervalo duas
+    # vezes e um commit da banda morta apagaria as amostras retidas do outro
+    with db_lock:
+        try:
+            rows, dead_band_pending = dead_band.plan(batch)
+            cur = db_conn.cursor()
+            closed, pending = status_tracker.plan(
+                batch["moto_id"], batch["status_code"], batch["ts_ms"], cur=cur
+            )
+            checkpoint, checkpoint_pending = fleet_checkpoints.plan(
+                db_conn.cursor(), rows
+            )
+            if len(rows["moto_id"]):
+                _insert_detections(cur, rows)
+                _upsert_hourly_summary(cur, rows)
+            if checkpoint is not None:
+                _insert_checkpoint(cur, checkpoint)
+            _insert_intervals(cur, closed)
+            if spool_id is not None:
+                cur.execute(
+                    f"""
+                    MERGE INTO {SPOOL_CHECKPOINT_TABLE_NAME} c
+                    USING (SELECT :1 AS spool_id, :2 AS last_seq FROM dual) s
+                    ON (c.spool_id = s.spool_id)
+                    WHEN MATCHED THEN UPDATE
+                        SET c.last_seq = s.last_seq, c.updated_at = SYSTIMESTAMP
+                    WHEN NOT MATCHED THEN INSERT (spool_id, last_seq, updated_at)
+                        VALUES (s.spool_id, s.last_seq, SYSTIMESTAMP)
+                    """,
+                    [spool_id, int(spool_seq)],
+                )
+            db_conn.commit()
+            # Ainda sob o db_lock: o próximo lote já parte deste estado
+            status_tracker.commit(pending)
+            dead_band.commit(dead_band_pending)
+            fleet_checkpoints.commit(checkpoint_pending)
+            # Mesmas linhas (e samples) que foram para detections
+            moto_history.record(
+                rows["moto_id"],
+                rows["x"],
+                rows["y"],
+                rows["quad_code"],
+                rows["status_code"],
+                rows["ts_ms"],
+                rows["samples"],
+            )
+        except Exception:
+            try:
+                db_conn.rollback()
+            except oracledb.Error:
+                pass  # Conexão perdida: o rollback é implícito
+            raise
+    moto_cache.bump(rows["moto_id"])
+    return len(batch["moto_id"])
+
+
+def _ensure_db_connection():
+    """Reabre a conexão global se o ping falhar (queda/restart do Oracle)"""
+    global db_conn
+    with db_lock:
+        try:
+            db_conn.ping()
+            return False
+        except oracledb.Error:
+            pass
+        try:
+            db_conn.close()
+        except oracledb.Error:
+            pass
+        db_conn = oracledb.connect(
+            user=ORACLE_CONFIG["user"],
+            password=ORACLE_CONFIG["password"],
+            dsn=get_dsn(),
+        )
+        print("🔌 Conexão com Oracle restabelecida")
+        return True
+
+
+def load_spool_checkpoint(spool_id):
+    """Último seq do spool confirmado no banco (0 se nunca drenou)"""
+    _ensure_db_connection()
     with db_lock:
         cur = db_conn.cursor()
         cur.execute(
-            f"INSERT INTO {TABLE_NAME} (moto_id, x, y, quadrant, status, timestamp) VALUES (:1, :2, :3, :4, :5, :6)",
-            (moto_id, x, y, quadrant, status, ts),
+            f"SELECT last_seq FROM {SPOOL_CHECKPOINT_TABLE_NAME} WHERE spool_id = :1",
+            [spool_id],
         )
-        db_conn.commit()
+        row = cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+# ---------------- CHUNKS COMPACTADOS ----------------
+def _blob_as_bytes(cursor, metadata):
+    """Lê colunas BLOB direto como bytes (sem um round-trip por LOB)"""
+    if metadata.type_code is oracledb.DB_TYPE_BLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG_RAW, arraysize=cursor.arraysize)
+
+
+def _chunk_rows(batch, window_ms):
+    """Linhas de detections_chunks: um blob por moto e janela de tempo"""
+    samples = batch.get("samples")
+    order = np.lexsort((batch["ts_ms"], batch["moto_id"]))
+    motos = batch["moto_id"][order]
+    ts = batch["ts_ms"][order]
+    windows = ts // window_ms
+    starts = np.flatnonzero(
+        np.r_[True, (motos[1:] != motos[:-1]) | (windows[1:] != windows[:-1])]
+    )
+    ends = np.r_[starts[1:], len(order)]
+    rows = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        idx = order[start:end]
+        blob = encode_chunk(
+            ts[start:end],
+            batch["x"][idx],
+            batch["y"][idx],
+            batch["quad_code"][idx],
+            batch["status_code"][idx],
+            samples[idx] if samples is not None else None,
+        )
+        rows.append(
+            (
+                YARD_ID,
+                int(motos[start]),
+                np.datetime64(int(windows[start]) * window_ms, "ms").tolist(),
+                np.datetime64(int(ts[start]), "ms").tolist(),
+                np.datetime64(int(ts[end - 1]), "ms").tolist(),
+                end - start,
+                blob,
+            )
+        )
+    return rows
+
+
+def _insert_chunks(cur, rows):
+    cur.setinputsizes(
+        40,
+        None,
+        oracledb.DB_TYPE_TIMESTAMP,
+        oracledb.DB_TYPE_TIMESTAMP,
+        oracledb.DB_TYPE_TIMESTAMP,
+        None,
+        oracledb.DB_TYPE_BLOB,
+    )
+    cur.executemany(
+        f"INSERT INTO {CHUNKS_TABLE_NAME} "
+        "(yard_id, moto_id, window_start, min_ts, max_ts, cnt, payload) "
+        "VALUES (:1, :2, :3, :4, :5, :6, :7)",
+        rows,
+    )
+    metric_inc("chunks_written", len(rows))
 
 
-def detections_dataframe(limit=200):
-    """Retorna DataFrame com últimas detecções"""
-    try:
+def _concat_chunks(parts):
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+def _iter_chunks(where, params, order="max_ts DESC", cur=None):
+    """(moto_id, max_ts em ms, payload) dos chunks do pátio que casam com ``where``.
+
+    Sem ``cur`` abre um cursor próprio e solta o db_lock entre blocos; com
+    ``cur`` o chamador já segura o lock.
+    """
+    own = cur is None
+    if own:
+        with db_lock:
+            cur = db_conn.cursor()
+    cur.outputtypehandler = _blob_as_bytes
+    query = f"""
+        SELECT moto_id, max_ts, payload FROM {CHUNKS_TABLE_NAME}
+        WHERE yard_id = :yard {where}
+        ORDER BY {order}
+    """
+    if own:
+        with db_lock:
+            cur.execute(query, {"yard": YARD_ID, **params})
+    else:
+        cur.execute(query, {"yard": YARD_ID, **params})
+    while True:
+        if own:
+            with db_lock:
+                rows = cur.fetchmany()
+        else:
+            rows = cur.fetchmany()
+        if not rows:
+            return
+        for moto_id, max_ts, payload in rows:
+            yield int(moto_id), int(pd.Timestamp(max_ts).value // 1_000_000), payload
+
+
+def _chunk_frame(chunk):
+    """DataFrame no formato de detections (colunas em maiúsculas, ID None)"""
+    return pd.DataFrame(
+        {
+            "ID": None,
+            "YARD_ID": YARD_ID,
+            "MOTO_ID": chunk["moto_id"],
+            "X": chunk["x"],
+            "Y": chunk["y"],
+            "QUADRANT": QUADRANT_LABELS[chunk["quad_code"]],
+            "STATUS": STATUS_LABELS[chunk["status_code"]],
+            "TIMESTAMP": chunk["ts_ms"].astype("datetime64[ms]"),
+            "SAMPLES": chunk["samples"],
+        }
+    )
+
+
+def _chunk_page(moto_id, limit, before, floor=None):
+    """Até ``limit`` detecções compactadas na ordem keyset (timestamp DESC).
+
+    Linhas de chunk não têm id (valem como id 0 no cursor). ``floor`` ignora
+    chunks que terminam antes dele (a página do banco já está completa).
+    """
+    where, params = "", {}
+    if moto_id is not None:
+        where += " AND moto_id = :moto_id"
+        params["moto_id"] = moto_id
+    if floor is not None:
+        where += " AND max_ts >= :floor"
+        params["floor"] = floor
+    cursor_us = None
+    if before is not None:
+        where += " AND min_ts <= :ts"
+        params["ts"] = before[0]
+        cursor_us = int(pd.Timestamp(before[0]).value // 1000)
+
+    parts, kept, kth_ms = [], 0, None
+    for chunk_moto, max_ms, payload in _iter_chunks(where, params):
+        # Chunks vêm do mais novo para o mais antigo: para quando já há
+        # ``limit`` linhas mais novas que tudo o que falta decodificar
+        if kth_ms is not None and kth_ms > max_ms:
+            break
+        chunk = decode_chunk(payload)
+        if cursor_us is not None:
+            ts_us = chunk["ts_ms"] * 1000
+            keep = (ts_us < cursor_us) | ((ts_us == cursor_us) & (before[1] > 0))
+            chunk = {key: values[keep] for key, values in chunk.items()}
+        chunk["moto_id"] = np.full(len(chunk["ts_ms"]), chunk_moto, dtype=np.int64)
+        parts.append(chunk)
+        kept += len(chunk["ts_ms"])
+        if kept >= limit:
+            all_ts = np.concatenate([p["ts_ms"] for p in parts])
+            kth_ms = int(np.partition(all_ts, kept - limit)[kept - limit])
+    if not parts:
+        return None
+    merged = _concat_chunks(parts)
+    order = np.argsort(-merged["ts_ms"], kind="stable")[:limit]
+    return _chunk_frame({key: values[order] for key, values in merged.items()})
+
+
+def _merge_pages(df, compacted, limit):
+    """Junta a página do banco com a dos chunks mantendo a ordem keyset"""
+    if compacted is None or compacted.empty:
+        return df
+    if df.empty:
+        return compacted
+    merged = pd.concat([df, compacted], ignore_index=True)
+    merged["_ID"] = merged["ID"].fillna(0)
+    merged = merged.sort_values(["TIMESTAMP", "_ID"], ascending=False, kind="stable")
+    return merged.drop(columns="_ID").head(limit).reset_index(drop=True)
+
+
+def _latest_compacted(cur, moto_id):
+    """Última posição compactada da moto: (x, y, quadrant, status, timestamp)"""
+    for _, _, payload in _iter_chunks(
+        "AND moto_id = :moto_id", {"moto_id": moto_id}, cur=cur
+    ):
+        chunk = decode_chunk(payload)
+        last = int(np.argmax(chunk["ts_ms"]))
+        return (
+            float(chunk["x"][last]),
+            float(chunk["y"][last]),
+            str(QUADRANT_LABELS[chunk["quad_code"][last]]),
+            str(STATUS_LABELS[chunk["status_code"][last]]),
+            np.datetime64(int(chunk["ts_ms"][last]), "ms").tolist(),
+        )
+    return None
+
+
+def _stored_codes(frame):
+    """Códigos de quadrante/status das linhas lidas de detections.
+
+    Preserva quadrante e status gravados (podem ter sido corrigidos) e só
+    reclassifica pela posição as linhas antigas sem eles.
+    """
+    quad_codes, status_codes = classify_batch(
+        frame["x"].to_numpy(np.float64), frame["y"].to_numpy(np.float64)
+    )
+    stored_quad = frame["quadrant"].map(_QUADRANT_INDEX)
+    stored_status = frame["status"].map(_STATUS_INDEX)
+    return (
+        np.where(stored_quad.notna(), stored_quad.fillna(0), quad_codes).astype(
+            np.int16
+        ),
+        np.where(stored_status.notna(), stored_status.fillna(0), status_codes).astype(
+            np.int8
+        ),
+    )
+
+
+def compact_detections(older_than_s=None, max_windows=None):
+    """Move janelas fechadas de detections para detections_chunks.
+
+    Cada janela de CHUNK_WINDOW_S mais antiga que ``older_than_s`` vira um
+    blob por moto numa única transação, que insere os chunks e apaga as
+    linhas lidas. FOR UPDATE SKIP LOCKED evita que dois processos compactem
+    a mesma janela; uma janela inteira presa por outro processo é pulada
+    (fica para a próxima rodada) e as mais antigas seguem sendo compactadas.
+    Detecções atrasadas viram um chunk extra na rodada seguinte. O resumo
+    horário já contou as linhas e não muda.
+    Retorna ``(janelas, linhas, puladas)``.
+    """
+    if older_than_s is None:
+        older_than_s = CHUNK_COMPACT_AFTER_S
+    cutoff_ms = (_now_ms() - int(older_than_s * 1000)) // CHUNK_WINDOW_MS
+    cutoff = np.datetime64(cutoff_ms * CHUNK_WINDOW_MS, "ms").tolist()
+    windows = moved = skipped = 0
+    # Início da próxima janela a procurar; avança além das janelas puladas
+    after_ms = 0
+    while max_windows is None or windows < max_windows:
         with db_lock:
-            query = f"SELECT * FROM {TABLE_NAME} ORDER BY timestamp DESC FETCH FIRST {limit} ROWS ONLY"
-            df = pd.read_sql_query(query, db_conn)
-            return (
-                df
-                if not df.empty
-                else pd.DataFrame(
+            cur = db_conn.cursor()
+            cur.execute(
+                f"SELECT MIN(timestamp) FROM {TABLE_NAME} "
+                "WHERE yard_id = :1 AND timestamp >= :2 AND timestamp < :3",
+                [YARD_ID, np.datetime64(after_ms, "ms").tolist(), cutoff],
+            )
+            (oldest,) = cur.fetchone()
+            if oldest is None:
+                break
+            start_ms = int(pd.Timestamp(oldest).value // 1_000_000)
+            start_ms -= start_ms % CHUNK_WINDOW_MS
+            try:
+                cur.execute(
+                    f"""
+                    SELECT id, moto_id, x, y, quadrant, status, timestamp, samples
+                    FROM {TABLE_NAME}
+                    WHERE yard_id = :1 AND timestamp >= :2 AND timestamp < :3
+                    FOR UPDATE SKIP LOCKED
+                    """,
+                    [
+                        YARD_ID,
+                        np.datetime64(start_ms, "ms").tolist(),
+                        np.datetime64(start_ms + CHUNK_WINDOW_MS, "ms").tolist(),
+                    ],
+                )
+                fetched = pd.DataFrame(
+                    cur.fetchall(),
                     columns=[
                         "id",
                         "moto_id",
@@ -198,74 +1173,573 @@ def detections_dataframe(limit=200):
                         "y",
                         "quadrant",
                         "status",
-                        "timestamp",
-                    ]
+                        "ts",
+                        "samples",
+                    ],
                 )
+                if fetched.empty:
+                    # Janela presa por outro compactador: segue para a próxima
+                    db_conn.rollback()
+                    skipped += 1
+                    after_ms = start_ms + CHUNK_WINDOW_MS
+                    metric_inc("chunk_windows_skipped")
+                    continue
+                quad_codes, status_codes = _stored_codes(fetched)
+                batch = {
+                    "moto_id": fetched["moto_id"].to_numpy(np.int64),
+                    "x": fetched["x"].to_numpy(np.float64),
+                    "y": fetched["y"].to_numpy(np.float64),
+                    "ts_ms": fetched["ts"].to_numpy("datetime64[ms]").astype(np.int64),
+                    "quad_code": quad_codes,
+                    "status_code": status_codes,
+                    "samples": fetched["samples"].to_numpy(np.int64),
+                }
+                _insert_chunks(cur, _chunk_rows(batch, CHUNK_WINDOW_MS))
+                cur.executemany(
+                    f"DELETE FROM {TABLE_NAME} WHERE id = :1",
+                    [(int(i),) for i in fetched["id"].tolist()],
+                )
+                db_conn.commit()
+            except Exception:
+                try:
+                    db_conn.rollback()
+                except oracledb.Error:
+                    pass
+                raise
+        moto_cache.bump(np.unique(batch["moto_id"]))
+        windows += 1
+        moved += len(fetched)
+        metric_inc("chunk_rows_compacted", len(fetched))
+    return windows, moved, skipped
+
+
+def _run_chunk_compactor():
+    """Compacta periodicamente as janelas antigas (thread daemon)"""
+    while not _simulation_stop.wait(CHUNK_COMPACT_INTERVAL_S):
+        started = time.perf_counter()
+        try:
+            windows, rows, skipped = compact_detections()
+        except Exception as e:
+            metric_inc("chunk_compact_errors")
+            print(f"⚠️  Erro ao compactar detecções: {e}")
+            continue
+        if skipped:
+            print(f"⚠️  {skipped} janelas presas por outro compactador, puladas")
+        if rows:
+            elapsed = time.perf_counter() - started
+            print(
+                f"🗜️  {rows:,} detecções compactadas em {windows} janelas ({elapsed:.1f} s)"
             )
-    except Exception as e:
-        print(f"⚠️  Erro ao buscar detecções: {e}")
-        return pd.DataFrame(
-            columns=["id", "moto_id", "x", "y", "quadrant", "status", "timestamp"]
+
+
+# ---------------- CHECKPOINTS DA FROTA (SNAPSHOT HISTÓRICO) ----------------
+# Última linha gravada de uma moto; é também o layout do blob de checkpoint
+_FLEET_RECORD = np.dtype(
+    [
+        ("moto_id", "<i8"),
+        ("x", "<f4"),
+        ("y", "<f4"),
+        ("quad", "<i2"),
+        ("status", "<i1"),
+        ("ts", "<i8"),
+    ]
+)
+
+
+def _fleet_records(moto_ids, xs, ys, quad_codes, status_codes, ts_ms):
+    records = np.empty(len(moto_ids), dtype=_FLEET_RECORD)
+    records["moto_id"], records["x"], records["y"] = moto_ids, xs, ys
+    records["quad"], records["status"], records["ts"] = quad_codes, status_codes, ts_ms
+    return records
+
+
+def _latest_per_moto(*parts):
+    """Linha mais nova de cada moto entre os registros dados (ordem de moto_id)"""
+    records = np.concatenate(parts)
+    if len(records) == 0:
+        return records
+    records = records[np.lexsort((records["ts"], records["moto_id"]))]
+    motos = records["moto_id"]
+    return records[np.r_[motos[1:] != motos[:-1], True]]
+
+
+def fleet_as_of(at_ms=None, cur=None):
+    """Última linha gravada de cada moto até ``at_ms`` (None = agora).
+
+    Parte do checkpoint mais recente até ``at_ms`` e aplica só o que foi
+    gravado depois dele (detections e chunks), então o trabalho fica
+    limitado a um intervalo de checkpoint. Sem checkpoint anterior varre só
+    a última janela de CHECKPOINT_INTERVAL_S. Sem ``cur`` cada consulta pega
+    o db_lock; com ``cur`` o chamador já o segura.
+    Retorna ``(records, checkpoint_ms, linhas_varridas)``.
+    """
+
+    def fetch(query, params):
+        if cur is not None:
+            cur.outputtypehandler = _blob_as_bytes
+            cur.execute(query, params)
+            return cur.fetchall()
+        with db_lock:
+            own = db_conn.cursor()
+            own.outputtypehandler = _blob_as_bytes
+            own.execute(query, params)
+            return own.fetchall()
+
+    params = {"yard": YARD_ID}
+    upper = ""
+    if at_ms is not None:
+        params["at"] = np.datetime64(int(at_ms), "ms").tolist()
+        upper = "AND checkpoint_ts <= :at"
+    found = fetch(
+        f"""
+        SELECT checkpoint_ts, payload FROM (
+            SELECT checkpoint_ts, payload FROM {CHECKPOINTS_TABLE_NAME}
+            WHERE yard_id = :yard {upper}
+            ORDER BY checkpoint_ts DESC
+        ) WHERE ROWNUM <= 1
+        """,
+        params,
+    )
+    if found:
+        checkpoint_ms = int(pd.Timestamp(found[0][0]).value // 1_000_000)
+        base = np.frombuffer(zlib.decompress(found[0][1]), dtype=_FLEET_RECORD)
+        since_ms = checkpoint_ms
+    else:
+        checkpoint_ms = None
+        base = np.empty(0, dtype=_FLEET_RECORD)
+        since_ms = (at_ms if at_ms is not None else _now_ms()) - CHECKPOINT_INTERVAL_MS
+
+    params["since"] = np.datetime64(since_ms, "ms").tolist()
+    upper = "AND timestamp <= :at" if at_ms is not None else ""
+    rows = pd.DataFrame(
+        fetch(
+            f"""
+            SELECT moto_id, x, y, quadrant, status, timestamp FROM {TABLE_NAME}
+            WHERE yard_id = :yard AND timestamp > :since {upper}
+            """,
+            params,
+        ),
+        columns=["moto_id", "x", "y", "quadrant", "status", "ts"],
+    )
+    parts = [base]
+    if not rows.empty:
+        quad_codes, status_codes = _stored_codes(rows)
+        parts.append(
+            _fleet_records(
+                rows["moto_id"].to_numpy(np.int64),
+                rows["x"].to_numpy(np.float64),
+                rows["y"].to_numpy(np.float64),
+                quad_codes,
+                status_codes,
+                rows["ts"].to_numpy("datetime64[ms]").astype(np.int64),
+            )
+        )
+    scanned = len(rows)
+
+    # Chunks só guardam amostras da própria janela: max_ts < início + janela
+    where, chunk_params = "AND max_ts > :since", {"since": params["since"]}
+    if at_ms is not None:
+        where += " AND max_ts < :upper"
+        chunk_params["upper"] = np.datetime64(
+            int(at_ms) + CHUNK_WINDOW_MS, "ms"
+        ).tolist()
+    for moto_id, _, payload in _iter_chunks(where, chunk_params, cur=cur):
+        chunk = decode_chunk(payload)
+        keep = chunk["ts_ms"] > since_ms
+        if at_ms is not None:
+            keep &= chunk["ts_ms"] <= at_ms
+        if keep.any():
+            parts.append(
+                _fleet_records(
+                    np.full(int(keep.sum()), moto_id, dtype=np.int64),
+                    chunk["x"][keep],
+                    chunk["y"][keep],
+                    chunk["quad_code"][keep],
+                    chunk["status_code"][keep],
+                    chunk["ts_ms"][keep],
+                )
+            )
+        scanned += int(keep.sum())
+    return _latest_per_moto(*parts), checkpoint_ms, scanned
+
+
+class FleetCheckpointer:
+    """Acompanha a última linha gravada de cada moto e grava checkpoints.
+
+    Quando o maior timestamp gravado cruza uma fronteira de ``interval_ms``,
+    o estado inteiro vira uma linha de fleet_checkpoints (blob zlib) na
+    mesma transação do lote. Na primeira gravação o estado é carregado do
+    banco com ``fleet_as_of``.
+    """
+
+    def __init__(self, interval_ms, initial_state=None):
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        # Registros _FLEET_RECORD por moto (None = carregar do banco)
+        self._state = initial_state
+        self._watermark = 0  # maior timestamp já gravado
+        self.written = 0
+        self.last_checkpoint_ms = None
+
+    def plan(self, cur, rows):
+        """(checkpoint ou None, pending) para as linhas do lote.
+
+        ``cur`` (com o db_lock seguro) só é usado para carregar o estado.
+        """
+        if self.interval_ms <= 0 or len(rows["moto_id"]) == 0:
+            return None, None
+        with self._lock:
+            state, watermark = self._state, self._watermark
+        if state is None:
+            state, _, _ = fleet_as_of(cur=cur)
+            watermark = int(state["ts"].max()) if len(state) else 0
+        state = _latest_per_moto(
+            state,
+            _fleet_records(
+                rows["moto_id"],
+                rows["x"],
+                rows["y"],
+                rows["quad_code"],
+                rows["status_code"],
+                rows["ts_ms"],
+            ),
         )
+        new_watermark = max(watermark, int(rows["ts_ms"].max()))
+        checkpoint = None
+        if new_watermark // self.interval_ms > watermark // self.interval_ms:
+            checkpoint = (new_watermark, state)
+        return checkpoint, (state, new_watermark, checkpoint)
+
+    def commit(self, pending):
+        if pending is None:
+            return
+        state, watermark, checkpoint = pending
+        with self._lock:
+            self._state, self._watermark = state, watermark
+            if checkpoint is not None:
+                self.written += 1
+                self.last_checkpoint_ms = checkpoint[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "interval_s": self.interval_ms / 1000,
+                "motos": len(self._state) if self._state is not None else None,
+                "written": self.written,
+                "last_checkpoint": (
+                    str(np.datetime64(self.last_checkpoint_ms, "ms").tolist())
+                    if self.last_checkpoint_ms is not None
+                    else None
+                ),
+            }
+
+
+fleet_checkpoints = FleetCheckpointer(CHECKPOINT_INTERVAL_MS)
+
+
+def _insert_checkpoint(cur, checkpoint):
+    """INSERT do checkpoint ``(ts_ms, records)`` no cursor informado (sem commit)"""
+    ts_ms, records = checkpoint
+    cur.setinputsizes(40, oracledb.DB_TYPE_TIMESTAMP, None, oracledb.DB_TYPE_BLOB)
+    cur.execute(
+        f"INSERT INTO {CHECKPOINTS_TABLE_NAME} "
+        "(yard_id, checkpoint_ts, moto_count, payload) VALUES (:1, :2, :3, :4)",
+        [
+            YARD_ID,
+            np.datetime64(ts_ms, "ms").tolist(),
+            len(records),
+            zlib.compress(records.tobytes()),
+        ],
+    )
+    metric_inc("fleet_checkpoints_written")
+
+
+def encode_cursor(ts, row_id):
+    """Cursor opaco (timestamp, id) para paginação keyset"""
+    micros = int(pd.Timestamp(ts).value // 1000)
+    raw = f"{micros}:{int(row_id)}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# Faixa de pd.Timestamp (1677 a 2262) em microssegundos: as páginas são
+# comparadas com timestamps do pandas em nanossegundos
+_CURSOR_MICROS_RANGE = (
+    pd.Timestamp.min.value // 1000 + 1,
+    pd.Timestamp.max.value // 1000,
+)
+
 
+def decode_cursor(cursor):
+    """Inverso de encode_cursor; levanta ValueError se o cursor for inválido"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    micros, row_id = base64.urlsafe_b64decode(padded).decode().split(":")
+    micros, row_id = int(micros), int(row_id)
+    # Fora da faixa o datetime64 estoura (OverflowError) ou vira int no tolist()
+    if not _CURSOR_MICROS_RANGE[0] <= micros <= _CURSOR_MICROS_RANGE[1]:
+        raise ValueError("Cursor com timestamp fora da faixa")
+    if not 0 <= row_id < 2**63:
+        raise ValueError("Cursor com id fora da faixa")
+    return np.datetime64(micros, "us").tolist(), row_id
 
-def get_moto_data(moto_id, limit=100):
-    """Obtém dados de uma moto específica"""
+
+def next_cursor(df, limit):
+    """Cursor da próxima página (None quando a página veio incompleta)"""
+    if len(df) < limit:
+        return None
+    last = {str(k).lower(): v for k, v in df.iloc[-1].items()}
+    # Linhas servidas da memória não têm id, mas a página traz todos os
+    # empates do último timestamp: id 0 = estritamente mais antigas
+    return encode_cursor(last["timestamp"], last["id"] or 0)
+
+
+# Página keyset: faixa do índice (timestamp, id) estritamente abaixo do cursor
+_KEYSET_FILTER = "timestamp <= :ts AND (timestamp < :ts OR id < :id)"
+
+
+def detections_dataframe(limit=200, before=None):
+    """Retorna DataFrame com últimas detecções (``before`` = cursor keyset decodificado)"""
+    if before is None:
+        recent = moto_history.latest(limit)
+        if recent is not None:
+            return recent
     try:
         with db_lock:
+            params = {"yard": YARD_ID}
+            keyset = ""
+            if before is not None:
+                keyset = f"AND {_KEYSET_FILTER}"
+                params.update(ts=before[0], id=before[1])
             query = f"""
-            SELECT * FROM {TABLE_NAME} 
-            WHERE moto_id = :1 
-            ORDER BY timestamp DESC 
-            FETCH FIRST {limit} ROWS ONLY
+            SELECT * FROM {TABLE_NAME}
+            WHERE yard_id = :yard {keyset}
+            ORDER BY timestamp DESC, id DESC
+            FETCH FIRST {int(limit)} ROWS ONLY
             """
-            df = pd.read_sql_query(query, db_conn, params=[moto_id])
-            return (
-                df
-                if not df.empty
-                else pd.DataFrame(
-                    columns=[
-                        "id",
-                        "moto_id",
-                        "x",
-                        "y",
-                        "quadrant",
-                        "status",
-                        "timestamp",
-                    ]
-                )
+            df = pd.read_sql_query(query, db_conn, params=params)
+        # Completa com o histórico compactado (só chunks que alcançam a página)
+        floor = df["TIMESTAMP"].iloc[-1].to_pydatetime() if len(df) >= limit else None
+        df = _merge_pages(df, _chunk_page(None, limit, before, floor), limit)
+        return (
+            df
+            if not df.empty
+            else pd.DataFrame(
+                columns=["id", "moto_id", "x", "y", "quadrant", "status", "timestamp"]
             )
+        )
     except Exception as e:
-        print(f"⚠️  Erro ao buscar dados da moto {moto_id}: {e}")
+        print(f"⚠️  Erro ao buscar detecções: {e}")
         return pd.DataFrame(
             columns=["id", "moto_id", "x", "y", "quadrant", "status", "timestamp"]
         )
 
 
-def get_stats():
-    """Calcula estatísticas gerais do sistema"""
-    try:
-        with db_lock:
-            cur = db_conn.cursor()
+# ---------------- CACHE POR MOTO ----------------
+class MotoQueryCache:
+    """Cache LRU + TTL de resultados por moto, invalidado por versão de escrita.
+
+    Cada gravação confirmada incrementa a versão das motos do lote; uma
+    entrada gravada com versão antiga é descartada na leitura. Misses
+    simultâneos da mesma chave fazem uma única consulta (single-flight).
+    Os DataFrames devolvidos são compartilhados: não devem ser alterados.
+    """
+
+    def __init__(self, ttl_s, max_bytes):
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # chave -> (versão, expira_em, valor, bytes)
+        self._versions = {}  # moto_id -> versão de escrita
+        self._inflight = {}  # chave -> [Event, valor, exceção]
+        self._bytes = 0
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "evictions": 0,
+            "coalesced": 0,
+        }
 
-            # Total de detecções
-            cur.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
-            total_detections = cur.fetchone()[0] or 0
+    def bump(self, moto_ids):
+        """Marca as motos como alteradas (chamado após o commit no banco)"""
+        with self._lock:
+            for moto_id in np.unique(moto_ids).tolist():
+                self._versions[moto_id] = self._versions.get(moto_id, 0) + 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[3]
+
+    def get_or_load(self, key, moto_id, loader):
+        now = time.monotonic()
+        with self._lock:
+            version = self._versions.get(moto_id, 0)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version and now < entry[1]:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return entry[2]
+                self._drop(key)
+                self.counters["stale"] += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = [threading.Event(), None, None]
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            flight[0].wait()
+            if flight[2] is not None:
+                raise flight[2]
+            return flight[1]
 
-            # Total de motos únicas
-            cur.execute(f"SELECT COUNT(DISTINCT moto_id) FROM {TABLE_NAME}")
-            unique_motos = cur.fetchone()[0] or 0
+        try:
+            value = loader()
+            flight[1] = value
+        except Exception as e:
+            flight[2] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight[0].set()
+
+        size = int(value.memory_usage(deep=True).sum())
+        with self._lock:
+            if size <= self.max_bytes:
+                if key in self._entries:
+                    self._drop(key)
+                self._entries[key] = (version, now + self.ttl_s, value, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+                    self.counters["evictions"] += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self.counters["hits"] + self.counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hit_ratio": round(self.counters["hits"] / total, 4) if total else 0.0,
+                **self.counters,
+            }
 
-            # Detecções por moto
-            detections_per_moto = {}
-            if total_detections > 0:
-                cur.execute(
-                    f"""
-                    SELECT moto_id, COUNT(*) as count 
-                    FROM {TABLE_NAME} 
-                    GROUP BY moto_id 
-                    ORDER BY moto_id
-                """
+
+moto_cache = MotoQueryCache(MOTO_CACHE_TTL_S, MOTO_CACHE_MAX_BYTES)
+
+
+def _query_moto_data(moto_id, limit, before):
+    with db_lock:
+        params = {"moto_id": moto_id, "yard": YARD_ID}
+        keyset = ""
+        if before is not None:
+            keyset = f"AND {_KEYSET_FILTER}"
+            params.update(ts=before[0], id=before[1])
+        query = f"""
+        SELECT * FROM {TABLE_NAME} 
+        WHERE yard_id = :yard AND moto_id = :moto_id {keyset}
+        ORDER BY timestamp DESC, id DESC
+        FETCH FIRST {int(limit)} ROWS ONLY
+        """
+        df = pd.read_sql_query(query, db_conn, params=params)
+    floor = df["TIMESTAMP"].iloc[-1].to_pydatetime() if len(df) >= limit else None
+    df = _merge_pages(df, _chunk_page(moto_id, limit, before, floor), limit)
+    return (
+        df
+        if not df.empty
+        else pd.DataFrame(
+            columns=["id", "moto_id", "x", "y", "quadrant", "status", "timestamp"]
+        )
+    )
+
+
+def get_moto_data(moto_id, limit=100, before=None):
+    """Obtém dados de uma moto específica (``before`` = cursor keyset decodificado)"""
+    if before is None:
+        recent = moto_history.moto(moto_id, limit)
+        if recent is not None:
+            return recent
+    try:
+        return moto_cache.get_or_load(
+            (moto_id, int(limit), before),
+            moto_id,
+            lambda: _query_moto_data(moto_id, limit, before),
+        )
+    except Exception as e:
+        print(f"⚠️  Erro ao buscar dados da moto {moto_id}: {e}")
+        return pd.DataFrame(
+            columns=["id", "moto_id", "x", "y", "quadrant", "status", "timestamp"]
+        )
+
+
+def _current_statuses(cur):
+    """Status atual de cada moto (1..NUM_MOTOS) sem uma consulta por moto.
+
+    Vem do estado da frota em memória; só com a memória vazia lê o banco
+    via ``fleet_as_of`` (checkpoint + linhas posteriores). ``cur`` é usado
+    com o db_lock já seguro.
+    """
+    if fleet_state.size():
+        _, rows = fleet_state.compact()
+        codes = {row[0]: row[3] for row in rows}
+    else:
+        records, _, _ = fleet_as_of(cur=cur)
+        codes = dict(zip(records["moto_id"].tolist(), records["status"].tolist()))
+    return {
+        moto_id: str(STATUS_LABELS[codes[moto_id]]) if moto_id in codes else "sem_dados"
+        for moto_id in range(1, NUM_MOTOS + 1)
+    }
+
+
+def get_stats(hours=None):
+    """Calcula estatísticas gerais do sistema a partir do resumo horário.
+
+    O custo depende do número de buckets (hora × moto × quadrante × status),
+    não do total de detecções. ``hours`` restringe às últimas N horas.
+    """
+    try:
+        where, params = "WHERE yard_id = :1", [YARD_ID]
+        if hours is not None:
+            where += " AND hour_ts >= :2"
+            params.append(
+                (datetime.utcnow() - timedelta(hours=hours)).replace(
+                    minute=0, second=0, microsecond=0
+                )
+            )
+        with db_lock:
+            cur = db_conn.cursor()
+
+            # Total de detecções, motos únicas e primeira/última detecção
+            cur.execute(
+                f"""
+                SELECT SUM(cnt), COUNT(DISTINCT moto_id), MIN(min_ts), MAX(max_ts)
+                FROM {HOURLY_TABLE_NAME} {where}
+                """,
+                params,
+            )
+            total_detections, unique_motos, first_ts, last_ts = cur.fetchone()
+            total_detections = total_detections or 0
+            unique_motos = unique_motos or 0
+            last_detection = str(last_ts) if last_ts else None
+            first_detection = str(first_ts) if first_ts else None
+
+            # Detecções por moto
+            detections_per_moto = {}
+            if total_detections > 0:
+                cur.execute(
+                    f"""
+                    SELECT moto_id, SUM(cnt) as count 
+                    FROM {HOURLY_TABLE_NAME} {where}
+                    GROUP BY moto_id 
+                    ORDER BY moto_id
+                """,
+                    params,
                 )
                 detections_per_moto = {
                     int(row[0]): int(row[1]) for row in cur.fetchall()
@@ -276,69 +1750,41 @@ def get_stats():
             if total_detections > 0:
                 cur.execute(
                     f"""
-                    SELECT quadrant, COUNT(*) as count 
-                    FROM {TABLE_NAME} 
+                    SELECT quadrant, SUM(cnt) as count 
+                    FROM {HOURLY_TABLE_NAME} {where}
                     GROUP BY quadrant 
                     ORDER BY count DESC 
                     FETCH FIRST 5 ROWS ONLY
-                """
+                """,
+                    params,
                 )
                 top_quadrants = [
                     {"quadrant": row[0], "count": int(row[1])} for row in cur.fetchall()
                 ]
 
-            # Última detecção
-            last_detection = None
-            if total_detections > 0:
-                cur.execute(f"SELECT MAX(timestamp) FROM {TABLE_NAME}")
-                result = cur.fetchone()[0]
-                last_detection = str(result) if result else None
-
-            # Primeira detecção
-            first_detection = None
-            if total_detections > 0:
-                cur.execute(f"SELECT MIN(timestamp) FROM {TABLE_NAME}")
-                result = cur.fetchone()[0]
-                first_detection = str(result) if result else None
-
             # Estatísticas por status
             status_stats = {}
-            try:
+            if total_detections > 0:
                 cur.execute(
                     f"""
-                    SELECT status, COUNT(*) as count 
-                    FROM {TABLE_NAME} 
-                    WHERE status IS NOT NULL
+                    SELECT status, SUM(cnt) as count 
+                    FROM {HOURLY_TABLE_NAME} {where}
                     GROUP BY status 
                     ORDER BY count DESC
-                    """
-                )
-                status_stats = {row[0]: int(row[1]) for row in cur.fetchall()}
-            except Exception:
-                # Se coluna status não existe, retorna vazio
-                pass
-
-            # Status atual das motos (última detecção de cada moto)
-            current_statuses = {}
-            for moto_id in range(1, NUM_MOTOS + 1):
-                cur.execute(
-                    f"""
-                    SELECT status FROM (
-                        SELECT status 
-                        FROM {TABLE_NAME} 
-                        WHERE moto_id = :1 
-                        ORDER BY timestamp DESC
-                    ) WHERE ROWNUM <= 1
                     """,
-                    [moto_id],
+                    params,
                 )
-                result = cur.fetchone()
-                if result and result[0]:
-                    current_statuses[moto_id] = result[0]
-                else:
-                    current_statuses[moto_id] = "sem_dados"
+                status_stats = {
+                    row[0]: int(row[1])
+                    for row in cur.fetchall()
+                    if row[0] != SUMMARY_NO_STATUS
+                }
+
+            current_statuses = _current_statuses(cur)
 
             return {
+                "yard": YARD_ID,
+                "hours": hours,
                 "total_detections": int(total_detections),
                 "unique_motos": int(unique_motos),
                 "detections_per_moto": detections_per_moto,
@@ -364,7 +1810,11 @@ def get_stats():
 
 
 def get_moto_status(moto_id):
-    """Obtém status atual de uma moto específica (baseado no quadrante onde está)"""
+    """Obtém status atual de uma moto específica (baseado no quadrante onde está).
+
+    Carry-forward: com a banda morta a última linha vale até a próxima, então
+    uma moto parada pode estar até DEAD_BAND_HEARTBEAT_S sem linha nova.
+    """
     with db_lock:
         cur = db_conn.cursor()
 
@@ -374,14 +1824,14 @@ def get_moto_status(moto_id):
             SELECT * FROM (
                 SELECT x, y, quadrant, status, timestamp 
                 FROM {TABLE_NAME} 
-                WHERE moto_id = :1 
+                WHERE yard_id = :1 AND moto_id = :2 
                 ORDER BY timestamp DESC
             ) WHERE ROWNUM <= 1
         """,
-            [moto_id],
+            [YARD_ID, moto_id],
         )
 
-        last_pos = cur.fetchone()
+        last_pos = cur.fetchone() or _latest_compacted(db_conn.cursor(), moto_id)
         if not last_pos:
             return {
                 "moto_id": moto_id,
@@ -396,8 +1846,9 @@ def get_moto_status(moto_id):
             status = get_status_from_quadrant(quadrant)
             # Atualiza o registro com o status correto
             cur.execute(
-                f"UPDATE {TABLE_NAME} SET status = :1 WHERE moto_id = :2 AND timestamp = :3",
-                (status, moto_id, timestamp),
+                f"UPDATE {TABLE_NAME} SET status = :1 "
+                "WHERE yard_id = :2 AND moto_id = :3 AND timestamp = :4",
+                (status, YARD_ID, moto_id, timestamp),
             )
             db_conn.commit()
 
@@ -407,6 +1858,7 @@ def get_moto_status(moto_id):
 
         return {
             "moto_id": moto_id,
+            "yard": YARD_ID,
             "status": status or get_status_from_quadrant(quadrant),
             "position": {"x": float(x), "y": float(y), "quadrant": quadrant},
             "last_update": str(timestamp),
@@ -446,8 +1898,9 @@ def get_alerts():
                 }
             )
 
-        # Alerta: Moto não atualizada há muito tempo (sistema offline?)
-        if seconds_since > 30:
+        # Alerta: Moto não atualizada há muito tempo (sistema offline?). Com a
+        # banda morta uma moto parada só grava a cada heartbeat
+        if seconds_since > 30 + (DEAD_BAND_HEARTBEAT_S if DEAD_BAND_ENABLED else 0):
             alerts.append(
                 {
                     "type": "stale_data",
@@ -470,6 +1923,9 @@ def get_alerts():
                 }
             )
 
+    # Alertas de eventos (proximidade, etc.) emitidos pelos detectores em streaming
+    alerts.extend(alert_feed.recent(ALERT_EVENT_TTL_S))
+
     return alerts
 
 
@@ -499,116 +1955,2389 @@ def get_status_from_quadrant(quadrant):
     return QUADRANT_STATUS_MAP.get(quadrant, "desconhecido")
 
 
-# ---------------- SIMULAÇÃO ----------------
-cores = [(0, 0, 255), (0, 255, 0), (255, 0, 0), (0, 255, 255)]
-xs = [100, 700, 400, 200]
-ys = [100, 500, 300, 400]
-vxs = [3, -2, 4, -3]
-vys = [2, -3, -2, 3]
+# Códigos inteiros para processamento vetorizado: quad_code = linha * GRID_COLS + coluna
+QUADRANT_LABELS = np.array(
+    [
+        f"{string.ascii_uppercase[r]}{c+1}"
+        for r in range(GRID_ROWS)
+        for c in range(GRID_COLS)
+    ]
+)
+STATUS_LABELS = np.array(
+    ["em_uso", "no_patio", "manutencao", "reservada", "desconhecido"]
+)
+_STATUS_INDEX = {status: code for code, status in enumerate(STATUS_LABELS.tolist())}
+_QUADRANT_INDEX = {label: code for code, label in enumerate(QUADRANT_LABELS.tolist())}
+QUAD_STATUS_CODES = np.array(
+    [_STATUS_INDEX[get_status_from_quadrant(q)] for q in QUADRANT_LABELS.tolist()],
+    dtype=np.int8,
+)
+QUADRANT_LABELS_STATUS = STATUS_LABELS[QUAD_STATUS_CODES]
+
+
+# ---------------- GEOFENCES ----------------
+def load_geofences(path):
+    """Lê e valida o arquivo de geofences.
+
+    Formato: {"geofences": [{"name": "lavagem", "status": "manutencao",
+    "polygon": [[x, y], ...]}]} com vértices em pixels do pátio; ``status``
+    é opcional.
+    """
+    with open(path, encoding="utf-8") as f:
+        fences = json.load(f)["geofences"]
+    names = set()
+    for fence in fences:
+        name = fence.get("name")
+        if not name or name in names:
+            raise ValueError(f"Geofence sem nome ou duplicada: {name!r}")
+        names.add(name)
+        if len(fence.get("polygon", [])) < 3:
+            raise ValueError(f"Geofence {name}: polígono precisa de ao menos 3 pontos")
+        if fence.get("status") is not None and fence["status"] not in _STATUS_INDEX:
+            raise ValueError(f"Geofence {name}: status inválido {fence['status']!r}")
+    return fences
+
+
+def rasterize_geofences(fences, width, height):
+    """Máscara (height × width) com o código da geofence de cada pixel (0 = nenhuma).
+
+    Rasterizada uma única vez; em sobreposição vale a geofence que aparece
+    depois no arquivo.
+    """
+    mask = np.zeros((height, width), dtype=np.int16)
+    for code, fence in enumerate(fences, start=1):
+        points = np.round(np.asarray(fence["polygon"], dtype=np.float64))
+        cv2.fillPoly(mask, [points.astype(np.int32)], code)
+    return mask
+
+
+GEOFENCES = load_geofences(GEOFENCES_FILE) if GEOFENCES_FILE else []
+# Código 0 = fora de qualquer geofence
+GEOFENCE_NAMES = np.array(["", *[fence["name"] for fence in GEOFENCES]])
+# Status imposto por geofence; -1 mantém o status do quadrante
+GEOFENCE_STATUS_CODES = np.array(
+    [-1, *[_STATUS_INDEX.get(fence.get("status"), -1) for fence in GEOFENCES]],
+    dtype=np.int8,
+)
+GEOFENCE_MASK = rasterize_geofences(GEOFENCES, WIDTH, HEIGHT)
+_GEOFENCE_OVERRIDES = bool((GEOFENCE_STATUS_CODES >= 0).any())
+
+
+def geofence_codes(xs, ys):
+    """Código da geofence de cada posição: um único fancy-index na máscara"""
+    cols = np.clip(np.asarray(xs).astype(np.int64), 0, WIDTH - 1)
+    rows = np.clip(np.asarray(ys).astype(np.int64), 0, HEIGHT - 1)
+    return GEOFENCE_MASK[rows, cols]
+
+
+def classify_batch(xs, ys):
+    """Equivalente vetorizado de get_quadrant + get_status_from_quadrant.
+
+    Retorna (quad_codes, status_codes) para todas as posições de uma vez.
+    Geofences com ``status`` têm prioridade sobre o status do quadrante.
+    """
+    cols = np.clip(np.asarray(xs).astype(np.int64) // QUAD_WIDTH, 0, GRID_COLS - 1)
+    rows = np.clip(np.asarray(ys).astype(np.int64) // QUAD_HEIGHT, 0, GRID_ROWS - 1)
+    quad_codes = (rows * GRID_COLS + cols).astype(np.int16)
+    status_codes = QUAD_STATUS_CODES[quad_codes]
+    if _GEOFENCE_OVERRIDES:
+        override = GEOFENCE_STATUS_CODES[geofence_codes(xs, ys)]
+        status_codes = np.where(override >= 0, override, status_codes)
+    return quad_codes, status_codes
+
+
+# ---------------- HEATMAP DE OCUPAÇÃO ----------------
+class OccupancyHeatmap:
+    """Contagens de ocupação por célula em janelas deslizantes (ring buffers).
+
+    Cada janela guarda um anel de buckets de tempo com a contagem por célula e
+    um total acumulado; atualizar e consultar custa O(buckets × células),
+    independente do tamanho do histórico.
+    """
+
+    def __init__(self, rows, cols, windows):
+        self.rows, self.cols = rows, cols
+        self.cell_w = WIDTH / cols
+        self.cell_h = HEIGHT / rows
+        n_cells = rows * cols
+        self._lock = threading.Lock()
+        self._windows = {}
+        for name, (duration_s, bucket_s) in windows.items():
+            n_buckets = duration_s // bucket_s
+            self._windows[name] = {
+                "bucket_ms": bucket_s * 1000,
+                "n": n_buckets,
+                "bucket_ids": np.full(n_buckets, -1, dtype=np.int64),
+                "counts": np.zeros((n_buckets, n_cells), dtype=np.int64),
+                "samples": np.zeros(n_buckets, dtype=np.int64),
+                "total_counts": np.zeros(n_cells, dtype=np.int64),
+                "total_samples": 0,
+            }
+
+    def cells(self, xs, ys):
+        """Índice de célula (linha * cols + coluna) de cada posição"""
+        cols = np.clip(
+            (np.asarray(xs) // self.cell_w).astype(np.int64), 0, self.cols - 1
+        )
+        rows = np.clip(
+            (np.asarray(ys) // self.cell_h).astype(np.int64), 0, self.rows - 1
+        )
+        return rows * self.cols + cols
+
+    @staticmethod
+    def _expire(w, current_bucket):
+        """Remove do total os buckets que saíram da janela"""
+        stale = (w["bucket_ids"] >= 0) & (w["bucket_ids"] <= current_bucket - w["n"])
+        if stale.any():
+            w["total_counts"] -= w["counts"][stale].sum(axis=0)
+            w["total_samples"] -= int(w["samples"][stale].sum())
+            w["counts"][stale] = 0
+            w["samples"][stale] = 0
+            w["bucket_ids"][stale] = -1
+
+    def record(self, moto_ids, xs, ys, ts_ms, now_ms):
+        """Registra o lote como uma amostra da frota em cada bucket que ele toca.
+
+        Os buckets vêm do timestamp da detecção (não do relógio do servidor) e
+        cada moto conta uma vez por bucket, na sua última posição dentro dele;
+        assim vários ticks juntados num lote, ou uma rajada de pontos de uma
+        só moto, não inflam a ocupação. Linhas fora da janela são ignoradas.
+        """
+        if len(moto_ids) == 0:
+            return
+        n_cells = self.rows * self.cols
+        order = np.lexsort((ts_ms, moto_ids))
+        motos = moto_ids[order]
+        stamps = ts_ms[order]
+        cells = self.cells(xs[order], ys[order])
+        with self._lock:
+            for w in self._windows.values():
+                current = now_ms // w["bucket_ms"]
+                self._expire(w, current)
+                buckets = stamps // w["bucket_ms"]
+                # Última linha de cada (moto, bucket): o lote está ordenado por moto e ts
+                last = np.r_[
+                    (motos[1:] != motos[:-1]) | (buckets[1:] != buckets[:-1]), True
+                ]
+                keep = last & (buckets > current - w["n"]) & (buckets <= current)
+                if not keep.any():
+                    continue
+                touched, inverse = np.unique(buckets[keep], return_inverse=True)
+                counts = np.bincount(
+                    inverse * n_cells + cells[keep], minlength=len(touched) * n_cells
+                ).reshape(len(touched), n_cells)
+                # Slots de buckets fora da janela já foram zerados pelo _expire
+                slots = touched % w["n"]
+                w["bucket_ids"][slots] = touched
+                w["counts"][slots] += counts
+                w["samples"][slots] += 1
+                w["total_counts"] += counts.sum(axis=0)
+                w["total_samples"] += len(touched)
+
+    def snapshot(self, window, now_ms):
+        """Contagens e ocupação média por célula na janela pedida"""
+        w = self._windows[window]
+        with self._lock:
+            self._expire(w, now_ms // w["bucket_ms"])
+            counts = w["total_counts"].copy()
+            samples = w["total_samples"]
+        occupancy = counts / samples if samples else np.zeros(len(counts))
+        return {
+            "window": window,
+            "rows": self.rows,
+            "cols": self.cols,
+            "cell_width": self.cell_w,
+            "cell_height": self.cell_h,
+            "samples": int(samples),
+            "counts": counts.reshape(self.rows, self.cols).tolist(),
+            "occupancy": np.round(occupancy, 4).reshape(self.rows, self.cols).tolist(),
+            "max_occupancy": float(occupancy.max()) if len(occupancy) else 0.0,
+        }
+
+
+occupancy_heatmap = OccupancyHeatmap(HEATMAP_ROWS, HEATMAP_COLS, HEATMAP_WINDOWS)
+
+
+# ---------------- HISTÓRICO RECENTE EM MEMÓRIA ----------------
+class MotoHistory:
+    """Ring buffers NumPy pré-alocados com as últimas ``capacity`` linhas
+    gravadas de cada moto (x, y, quadrante, status, timestamp em ms e
+    ``samples``).
+
+    Recebe as mesmas linhas que vão para detections (depois da banda morta),
+    então uma página servida daqui e a seguinte, vinda do banco, se encaixam.
+    Cada moto ocupa uma linha fixa de ``capacity`` posições, então a memória
+    por moto é constante; as linhas crescem por duplicação conforme novas
+    motos aparecem. Leituras só são atendidas daqui quando a janela pedida
+    está inteira dentro do horizonte do buffer.
+    """
+
+    _FIELDS = (
+        ("x", np.float32),
+        ("y", np.float32),
+        ("quad", np.int16),
+        ("status", np.int8),
+        ("ts", np.int64),
+        ("samples", np.int32),
+    )
+
+    def __init__(self, capacity, initial_slots=16):
+        self.capacity = capacity
+        self.started_ms = int(time.time() * 1000)
+        self._lock = threading.Lock()
+        self._slots = {}  # moto_id -> linha
+        self._moto_ids = np.zeros(initial_slots, dtype=np.int64)
+        self._head = np.zeros(initial_slots, dtype=np.int64)  # próxima posição
+        self._count = np.zeros(initial_slots, dtype=np.int64)
+        self._data = {
+            name: np.zeros((initial_slots, capacity), dtype=dtype)
+            for name, dtype in self._FIELDS
+        }
+
+    @property
+    def bytes_per_moto(self):
+        return self.capacity * sum(
+            np.dtype(dtype).itemsize for _, dtype in self._FIELDS
+        )
+
+    def _grow(self, needed):
+        rows = len(self._moto_ids)
+        while rows < needed:
+            rows *= 2
+        extra = rows - len(self._moto_ids)
+        self._moto_ids = np.r_[self._moto_ids, np.zeros(extra, dtype=np.int64)]
+        self._head = np.r_[self._head, np.zeros(extra, dtype=np.int64)]
+        self._count = np.r_[self._count, np.zeros(extra, dtype=np.int64)]
+        for name, dtype in self._FIELDS:
+            self._data[name] = np.vstack(
+                [self._data[name], np.zeros((extra, self.capacity), dtype=dtype)]
+            )
+
+    def record(self, moto_ids, xs, ys, quad_codes, status_codes, ts_ms, samples=None):
+        """Acrescenta um lote (vetorizado; ordem de chegada dentro de cada moto)"""
+        n = len(moto_ids)
+        if n == 0:
+            return
+        if samples is None:
+            samples = np.ones(n, dtype=np.int32)
+        unique_ids, inverse = np.unique(moto_ids, return_inverse=True)
+        with self._lock:
+            rows_of_unique = np.empty(len(unique_ids), dtype=np.int64)
+            for i, moto_id in enumerate(unique_ids.tolist()):
+                row = self._slots.get(moto_id)
+                if row is None:
+                    row = len(self._slots)
+                    if row >= len(self._moto_ids):
+                        self._grow(row + 1)
+                    self._slots[moto_id] = row
+                    self._moto_ids[row] = moto_id
+                rows_of_unique[i] = row
+            rows = rows_of_unique[inverse]
+
+            # Posição de cada linha dentro do grupo da sua moto (ordem estável)
+            order = np.argsort(rows, kind="stable")
+            sorted_rows = rows[order]
+            starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+            sizes = np.diff(np.r_[starts, n])
+            rank = np.arange(n) - np.repeat(starts, sizes)
+            group_size = np.repeat(sizes, sizes)
+            # Lotes maiores que o buffer: só as últimas ``capacity`` linhas contam
+            keep = rank >= group_size - self.capacity
+            idx, sorted_rows, rank = order[keep], sorted_rows[keep], rank[keep]
+            cols = (self._head[sorted_rows] + rank) % self.capacity
+            values = {
+                "x": xs,
+                "y": ys,
+                "quad": quad_codes,
+                "status": status_codes,
+                "ts": ts_ms,
+                "samples": samples,
+            }
+            for name, _ in self._FIELDS:
+                self._data[name][sorted_rows, cols] = values[name][idx]
+
+            touched = sorted_rows[np.r_[True, sorted_rows[1:] != sorted_rows[:-1]]]
+            added = np.bincount(sorted_rows, minlength=len(self._head))[touched]
+            self._head[touched] = (self._head[touched] + added) % self.capacity
+            self._count[touched] = np.minimum(
+                self._count[touched] + added, self.capacity
+            )
+
+    def _frame(self, rows, cols):
+        data = self._data
+        return pd.DataFrame(
+            {
+                "ID": None,
+                "MOTO_ID": self._moto_ids[rows],
+                "X": data["x"][rows, cols].astype(np.float64),
+                "Y": data["y"][rows, cols].astype(np.float64),
+                "QUADRANT": QUADRANT_LABELS[data["quad"][rows, cols]],
+                "STATUS": STATUS_LABELS[data["status"][rows, cols]],
+                "TIMESTAMP": data["ts"][rows, cols].astype("datetime64[ms]"),
+                "SAMPLES": data["samples"][rows, cols].astype(np.int64),
+            }
+        )
+
+    def moto(self, moto_id, limit):
+        """Últimas ``limit`` linhas da moto, ou None se o buffer não cobre.
+
+        Como em ``latest``, empates no timestamp de corte vêm todos juntos.
+        """
+        with self._lock:
+            row = self._slots.get(moto_id)
+            if row is None or limit > self._count[row] or limit <= 0:
+                return None
+            count = self._count[row]
+            cols = (self._head[row] - 1 - np.arange(count)) % self.capacity
+            ts = self._data["ts"][row, cols]
+            order = np.argsort(-ts, kind="stable")
+            cutoff = ts[order[limit - 1]]
+            cols = cols[order[ts[order] >= cutoff]]
+            return self._frame(np.full(len(cols), row), cols)
+
+    def latest(self, limit):
+        """Últimas ``limit`` linhas da frota, ou None se o buffer não cobre.
+
+        Só responde se o corte da janela for mais novo que o início do
+        processo e que a linha mais antiga de qualquer buffer já cheio
+        (senão o banco pode ter linhas mais novas que o corte). Todas as
+        linhas com o timestamp do corte entram na página (que pode passar de
+        ``limit``): o cursor seguinte (corte, id 0) pega só as mais antigas,
+        e as motos de um mesmo tick compartilham o timestamp.
+        """
+        with self._lock:
+            used = len(self._slots)
+            counts = self._count[:used]
+            if counts.sum() < limit or limit <= 0:
+                return None
+            mask = np.arange(self.capacity) < counts[:, None]
+            ts = np.where(mask, self._data["ts"][:used], np.iinfo(np.int64).min)
+            flat_ts = ts.ravel()
+            cutoff = int(np.partition(flat_ts, -limit)[-limit])
+            flat = np.flatnonzero(flat_ts >= cutoff)
+            flat = flat[np.argsort(-flat_ts[flat], kind="stable")]
+            rows, cols = np.divmod(flat, self.capacity)
+            horizon = self.started_ms
+            full = np.flatnonzero(counts == self.capacity)
+            if len(full):
+                horizon = max(horizon, int(ts[full].min(axis=1).max()))
+            if cutoff <= horizon:
+                return None
+            return self._frame(rows, cols)
+
+    def stats(self):
+        with self._lock:
+            used = len(self._slots)
+            allocated = len(self._moto_ids)
+            return {
+                "capacity_per_moto": self.capacity,
+                "bytes_per_moto": self.bytes_per_moto,
+                "motos": used,
+                "allocated_slots": allocated,
+                "bytes_allocated": allocated * self.bytes_per_moto,
+                "rows_buffered": int(self._count[:used].sum()),
+            }
+
+
+moto_history = MotoHistory(MOTO_HISTORY_SIZE)
+
+
+# ---------------- BANDA MORTA (GRAVAÇÃO SÓ DE MUDANÇAS) ----------------
+class DeadBandFilter:
+    """Filtro de mudança por moto aplicado antes de gravar em detections.
+
+    Uma detecção só vira linha quando a moto andou mais que ``epsilon`` px
+    desde a última linha gravada, trocou de quadrante ou status, ou ficou
+    ``heartbeat_ms`` sem linha gravada. As suprimidas não se perdem: a
+    coluna ``samples`` diz quantas detecções cada linha representa. A linha
+    seguinte absorve as suprimidas antes dela; só numa troca de quadrante ou
+    status a última suprimida é gravada primeiro, para que as detecções
+    contem no quadrante/status em que de fato estavam.
+
+    Leitura com carry-forward: a posição/status de uma moto num instante é
+    a da última linha gravada até ele, válida até a próxima. Somas ponderadas
+    por ``samples`` (resumo horário, mapa de densidade) continuam exatas.
+
+    Estado por moto em arrays NumPy; o lote é percorrido por posição dentro
+    de cada moto, vetorizado entre as motos (poucas iterações por lote).
+    """
+
+    _FIELDS = (
+        ("x", np.float64),  # última linha gravada
+        ("y", np.float64),
+        ("quad", np.int16),
+        ("status", np.int8),
+        ("ts", np.int64),
+        ("held_x", np.float64),  # última detecção suprimida
+        ("held_y", np.float64),
+        ("held_ts", np.int64),
+        ("held", np.int64),  # suprimidas desde a última linha gravada
+    )
+    _OUTPUT = ("moto_id", "x", "y", "ts_ms", "quad_code", "status_code", "samples")
+
+    def __init__(self, epsilon, heartbeat_ms, enabled=True):
+        self.epsilon = epsilon
+        self.heartbeat_ms = heartbeat_ms
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._slots = {}  # moto_id -> posição nos arrays de estado
+        self._state = {name: np.zeros(0, dtype=dtype) for name, dtype in self._FIELDS}
+
+    def plan(self, batch):
+        """Linhas a gravar (com ``samples``) sem alterar o estado.
+
+        Retorna ``(rows, pending)``; ``commit(pending)`` aplica o novo estado
+        (feito só depois que as linhas foram gravadas no banco).
+        """
+        n = len(batch["moto_id"])
+        if not self.enabled or n == 0:
+            rows = {key: batch[key] for key in self._OUTPUT[:-1]}
+            rows["samples"] = np.ones(n, dtype=np.int64)
+            return rows, None
+        order = np.lexsort((batch["ts_ms"], batch["moto_id"]))
+        motos = batch["moto_id"][order]
+        starts = np.flatnonzero(np.r_[True, motos[1:] != motos[:-1]])
+        sizes = np.diff(np.r_[starts, n])
+        moto_ids = motos[starts]
+        with self._lock:
+            slots = np.array(
+                [self._slots.get(m, -1) for m in moto_ids.tolist()], dtype=np.int64
+            )
+            known = slots >= 0
+            state = {}
+            for name, dtype in self._FIELDS:
+                state[name] = np.zeros(len(slots), dtype=dtype)
+                state[name][known] = self._state[name][slots[known]]
+
+        has_ref = known
+        written, samples, held_rows = [], [], []
+        for k in range(int(sizes.max())):
+            g = np.flatnonzero(sizes > k)
+            idx = order[starts[g] + k]
+            xs, ys, ts = batch["x"][idx], batch["y"][idx], batch["ts_ms"][idx]
+            quads, statuses = batch["quad_code"][idx], batch["status_code"][idx]
+            # Detecções atrasadas são gravadas como vieram, sem mexer no estado
+            late = has_ref[g] & (ts < np.maximum(state["ts"][g], state["held_ts"][g]))
+            reclassified = (
+                ~has_ref[g]
+                | (quads != state["quad"][g])
+                | (statuses != state["status"][g])
+            )
+            moved = np.hypot(xs - state["x"][g], ys - state["y"][g]) > self.epsilon
+            beat = ts - state["ts"][g] >= self.heartbeat_ms
+            write = ~late & (reclassified | moved | beat)
+            held = state["held"][g]
+            close = write & reclassified & (held > 0)
+
+            closing = g[close]
+            if len(closing):
+                held_rows.append(
+                    (
+                        moto_ids[closing],
+                        state["held_x"][closing],
+                        state["held_y"][closing],
+                        state["held_ts"][closing],
+                        state["quad"][closing],
+                        state["status"][closing],
+                        state["held"][closing],
+                    )
+                )
+            written.append(idx[write | late])
+            samples.append(
+                np.where(write & ~close, held + 1, 1)[write | late].astype(np.int64)
+            )
+
+            updated = g[write]
+            state["x"][updated], state["y"][updated] = xs[write], ys[write]
+            state["quad"][updated] = quads[write]
+            state["status"][updated] = statuses[write]
+            state["ts"][updated] = ts[write]
+            state["held"][updated] = 0
+            has_ref[updated] = True
+            suppressed = ~late & ~write
+            kept = g[suppressed]
+            state["held_x"][kept], state["held_y"][kept] = (
+                xs[suppressed],
+                ys[suppressed],
+            )
+            state["held_ts"][kept] = ts[suppressed]
+            state["held"][kept] += 1
+
+        idx = np.concatenate(written)
+        columns = [
+            [batch[key][idx] for key in self._OUTPUT[:-1]] + [np.concatenate(samples)]
+        ]
+        columns += [list(held) for held in held_rows]
+        rows = {
+            key: np.concatenate([c[i] for c in columns])
+            for i, key in enumerate(self._OUTPUT)
+        }
+        # Ordem de gravação = ordem temporal (ids crescem com o timestamp)
+        order = np.lexsort((rows["moto_id"], rows["ts_ms"]))
+        rows = {key: values[order] for key, values in rows.items()}
+        return rows, (moto_ids, state, n, len(order))
+
+    def commit(self, pending):
+        if pending is None:
+            return
+        moto_ids, state, seen, written = pending
+        with self._lock:
+            slots = np.array(
+                [
+                    self._slots.setdefault(m, len(self._slots))
+                    for m in moto_ids.tolist()
+                ],
+                dtype=np.int64,
+            )
+            capacity = len(self._state["ts"])
+            if len(self._slots) > capacity:
+                extra = max(len(self._slots), 2 * capacity) - capacity
+                for name, dtype in self._FIELDS:
+                    self._state[name] = np.r_[
+                        self._state[name], np.zeros(extra, dtype=dtype)
+                    ]
+            for name, _ in self._FIELDS:
+                self._state[name][slots] = state[name]
+        metric_inc("dead_band_rows_in", seen)
+        metric_inc("dead_band_rows_written", written)
+
+
+dead_band = DeadBandFilter(
+    DEAD_BAND_EPSILON_PX, int(DEAD_BAND_HEARTBEAT_S * 1000), DEAD_BAND_ENABLED
+)
+
+
+# ---------------- DWELL TIME / TRANSIÇÕES ----------------
+class StatusIntervalTracker:
+    """Máquina de estados por moto que fecha intervalos de status em streaming.
+
+    Estado O(1) por moto: status atual, início do intervalo e último timestamp.
+    Cada lote devolve os intervalos que foram fechados (mudança de status).
+    Na primeira vez que uma moto aparece, o estado parte do último intervalo
+    gravado para ela (``next_status`` desde ``exit_ts``), então um restart
+    não perde a transição em curso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}  # moto_id -> [status_code, enter_ms, last_ms]
+
+    def plan(self, moto_ids, status_codes, ts_ms, cur=None):
+        """Calcula os intervalos fechados pelo lote sem alterar o estado.
+
+        Retorna ``(closed, pending)``; ``commit(pending)`` aplica o novo estado
+        (feito só depois que o lote foi gravado no banco). ``cur`` (com o
+        db_lock seguro) só é usado para carregar o estado de motos novas.
+        """
+        closed = []
+        pending = {}
+        if len(moto_ids) == 0:
+            return closed, pending
+        order = np.lexsort((ts_ms, moto_ids))
+        motos = moto_ids[order]
+        statuses = status_codes[order]
+        stamps = ts_ms[order]
+        # Índice da primeira linha de cada moto no lote ordenado
+        starts = np.flatnonzero(np.r_[True, motos[1:] != motos[:-1]])
+        ends = np.r_[starts[1:], len(motos)]
+
+        seeded = {}
+        if cur is not None:
+            with self._lock:
+                unseen = [m for m in motos[starts].tolist() if m not in self._state]
+            if unseen:
+                seeded = _load_interval_states(cur, unseen)
+
+        with self._lock:
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                moto_id = int(motos[start])
+                run_status = statuses[start:end]
+                run_ts = stamps[start:end]
+                state = self._state.get(moto_id) or seeded.get(moto_id)
+                if state is None:
+                    state = [int(run_status[0]), int(run_ts[0]), int(run_ts[0])]
+                else:
+                    state = list(state)
+                # Descarta detecções atrasadas (anteriores ao último timestamp visto)
+                fresh = run_ts >= state[2]
+                if not fresh.all():
+                    run_status, run_ts = run_status[fresh], run_ts[fresh]
+                    if len(run_ts) == 0:
+                        continue
+                previous = np.r_[state[0], run_status[:-1]]
+                for i in np.flatnonzero(run_status != previous).tolist():
+                    exit_ms = int(run_ts[i])
+                    closed.append(
+                        (moto_id, state[0], int(run_status[i]), state[1], exit_ms)
+                    )
+                    state[0], state[1] = int(run_status[i]), exit_ms
+                state[2] = int(run_ts[-1])
+                pending[moto_id] = state
+        return closed, pending
+
+    def commit(self, pending):
+        with self._lock:
+            self._state.update(pending)
+
+    def update(self, moto_ids, status_codes, ts_ms):
+        """Processa um lote e retorna lista de intervalos fechados"""
+        closed, pending = self.plan(moto_ids, status_codes, ts_ms)
+        self.commit(pending)
+        return closed
+
+    def current(self, moto_id):
+        """Intervalo ainda aberto da moto (ou None)"""
+        with self._lock:
+            state = self._state.get(moto_id)
+            return list(state) if state else None
+
+
+status_tracker = StatusIntervalTracker()
+
+
+def _load_interval_states(cur, moto_ids):
+    """Estado inicial do rastreador a partir do último intervalo de cada moto:
+    ``{moto_id: [next_status, exit_ms, exit_ms]}``"""
+    states = {}
+    for i in range(0, len(moto_ids), 1000):  # limite de itens do IN no Oracle
+        chunk = [int(m) for m in moto_ids[i : i + 1000]]
+        binds = ", ".join(f":{n}" for n in range(2, len(chunk) + 2))
+        cur.execute(
+            f"""
+            SELECT moto_id, next_status, exit_ts FROM (
+                SELECT moto_id, next_status, exit_ts,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY moto_id ORDER BY exit_ts DESC
+                       ) AS rn
+                FROM {INTERVALS_TABLE_NAME}
+                WHERE yard_id = :1 AND moto_id IN ({binds})
+            ) WHERE rn = 1
+            """,
+            [YARD_ID, *chunk],
+        )
+        for moto_id, next_status, exit_ts in cur.fetchall():
+            code = _STATUS_INDEX.get(next_status)
+            if code is None:
+                continue  # status que não existe mais na configuração atual
+            exit_ms = int(np.datetime64(exit_ts, "ms").astype(np.int64))
+            states[int(moto_id)] = [code, exit_ms, exit_ms]
+    return states
+
+
+def _insert_intervals(cur, intervals):
+    """INSERT array-DML dos intervalos fechados (sem commit)"""
+    if not intervals:
+        return
+    rows = [
+        (
+            moto_id,
+            STATUS_LABELS[status],
+            STATUS_LABELS[next_status],
+            np.datetime64(enter_ms, "ms").tolist(),
+            np.datetime64(exit_ms, "ms").tolist(),
+            exit_ms - enter_ms,
+            YARD_ID,
+        )
+        for moto_id, status, next_status, enter_ms, exit_ms in intervals
+    ]
+    cur.executemany(
+        f"INSERT INTO {INTERVALS_TABLE_NAME} "
+        "(moto_id, status, next_status, enter_ts, exit_ts, duration_ms, yard_id) "
+        "VALUES (:1, :2, :3, :4, :5, :6, :7)",
+        rows,
+    )
+
+
+def save_intervals(intervals):
+    """Grava intervalos fechados com um único executemany"""
+    if not intervals:
+        return
+    with db_lock:
+        _insert_intervals(db_conn.cursor(), intervals)
+        db_conn.commit()
+
+
+def get_moto_timeline(moto_id, limit=100):
+    """Linha do tempo de status da moto a partir da tabela de intervalos"""
+    with db_lock:
+        cur = db_conn.cursor()
+        cur.execute(
+            f"""
+            SELECT status, next_status, enter_ts, exit_ts, duration_ms
+            FROM {INTERVALS_TABLE_NAME}
+            WHERE yard_id = :1 AND moto_id = :2
+            ORDER BY enter_ts DESC
+            FETCH FIRST {int(limit)} ROWS ONLY
+            """,
+            [YARD_ID, moto_id],
+        )
+        rows = cur.fetchall()
+
+    intervals = [
+        {
+            "status": status,
+            "next_status": next_status,
+            "enter": str(enter_ts),
+            "exit": str(exit_ts),
+            "duration_s": round(float(duration_ms) / 1000, 3),
+        }
+        for status, next_status, enter_ts, exit_ts, duration_ms in rows
+    ]
+    current = status_tracker.current(moto_id)
+    return {
+        "moto_id": moto_id,
+        "current": (
+            {
+                "status": STATUS_LABELS[current[0]],
+                "enter": str(np.datetime64(current[1], "ms").tolist()),
+                "duration_s": round((current[2] - current[1]) / 1000, 3),
+            }
+            if current
+            else None
+        ),
+        "intervals": intervals,
+    }
+
+
+def get_dwell_distribution(hours=24):
+    """Distribuição de dwell time e matriz de transições da frota"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    with db_lock:
+        cur = db_conn.cursor()
+        cur.execute(
+            f"""
+            SELECT status,
+                   COUNT(*),
+                   SUM(duration_ms),
+                   AVG(duration_ms),
+                   PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms),
+                   PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY duration_ms),
+                   PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY duration_ms),
+                   MAX(duration_ms)
+            FROM {INTERVALS_TABLE_NAME}
+            WHERE yard_id = :1 AND exit_ts >= :2
+            GROUP BY status
+            """,
+            [YARD_ID, since],
+        )
+        dwell_rows = cur.fetchall()
+        cur.execute(
+            f"""
+            SELECT status, next_status, COUNT(*)
+            FROM {INTERVALS_TABLE_NAME}
+            WHERE yard_id = :1 AND exit_ts >= :2
+            GROUP BY status, next_status
+            """,
+            [YARD_ID, since],
+        )
+        transition_rows = cur.fetchall()
+
+    def seconds(value):
+        return round(float(value) / 1000, 3) if value is not None else None
+
+    dwell = {
+        status: {
+            "intervals": int(count),
+            "total_s": seconds(total),
+            "mean_s": seconds(mean),
+            "p50_s": seconds(p50),
+            "p90_s": seconds(p90),
+            "p99_s": seconds(p99),
+            "max_s": seconds(longest),
+        }
+        for status, count, total, mean, p50, p90, p99, longest in dwell_rows
+    }
+    transitions = {}
+    for status, next_status, count in transition_rows:
+        transitions.setdefault(status, {})[next_status] = int(count)
+    return {"hours": hours, "dwell": dwell, "transitions": transitions}
+
+
+# ---------------- ESTADO DA FROTA ----------------
+class FleetState:
+    """Última posição/status de cada moto com número de sequência por mudança.
+
+    Cada mudança de posição, quadrante ou status recebe um ``seq`` monotônico e
+    entra em um log circular (seq -> moto_id), permitindo responder
+    ``/status?since=N`` olhando só as mudanças posteriores a N.
+
+    O ``seq`` carrega nos bits altos uma época aleatória do processo
+    (``época << 32 | contador``, até 2^52, seguro em JSON/JS): um ``since``
+    vindo de outro worker ou de antes de um restart não casa com a época e
+    recebe o snapshot completo, em vez de pular mudanças em silêncio.
+    """
+
+    _COUNTER_BITS = 32
+
+    def __init__(self, log_size):
+        self._lock = threading.Lock()
+        self._motos = {}  # moto_id -> [x, y, quad_code, status_code, ts_ms, seq]
+        self._log_size = log_size
+        self._log = np.zeros(log_size, dtype=np.int64)
+        self._new_epoch()
+
+    def _new_epoch(self):
+        self._epoch = int.from_bytes(os.urandom(3), "little") % (1 << 20) or 1
+        self._counter = 0
+
+    @property
+    def seq(self):
+        return (self._epoch << self._COUNTER_BITS) | self._counter
+
+    def apply(self, moto_ids, xs, ys, quad_codes, status_codes, ts_ms):
+        """Aplica a última detecção de cada moto do lote"""
+        if len(moto_ids) == 0:
+            return
+        order = np.lexsort((ts_ms, moto_ids))
+        sorted_motos = moto_ids[order]
+        last = order[np.r_[sorted_motos[1:] != sorted_motos[:-1], True]]
+        with self._lock:
+            for i in last.tolist():
+                moto_id = int(moto_ids[i])
+                record = self._motos.get(moto_id)
+                new = (
+                    float(xs[i]),
+                    float(ys[i]),
+                    int(quad_codes[i]),
+                    int(status_codes[i]),
+                )
+                if record is not None:
+                    if ts_ms[i] < record[4]:
+                        continue  # detecção atrasada não sobrescreve a mais nova
+                    if tuple(record[:4]) == new:
+                        record[4] = int(ts_ms[i])
+                        continue
+                if self._counter + 1 >= 1 << self._COUNTER_BITS:
+                    self._new_epoch()  # contador esgotado: clientes recebem tudo
+                self._counter += 1
+                self._log[self._counter % self._log_size] = moto_id
+                self._motos[moto_id] = [*new, int(ts_ms[i]), self.seq]
+
+    def _record(self, moto_id, now_ms):
+        x, y, quad_code, status_code, ts, seq = self._motos[moto_id]
+        return {
+            "moto_id": moto_id,
+            "status": STATUS_LABELS[status_code],
+            "position": {"x": x, "y": y, "quadrant": QUADRANT_LABELS[quad_code]},
+            "last_update": str(np.datetime64(ts, "ms").tolist()),
+            "seconds_since_last_update": int((now_ms - ts) // 1000),
+            "seq": seq,
+        }
+
+    def _changed(self, since):
+        """(seq, full, moto_ids) alteradas após ``since`` (chamar com o lock)"""
+        high_water = self.seq
+        counter = since - (self._epoch << self._COUNTER_BITS)
+        full = (
+            counter < 0
+            or counter < self._counter - self._log_size
+            or counter > self._counter
+        )
+        if full:
+            return high_water, full, sorted(self._motos)
+        slots = np.arange(counter + 1, self._counter + 1) % self._log_size
+        return high_water, full, np.unique(self._log[slots]).tolist()
+
+    def changes_since(self, since, now_ms):
+        """Motos alteradas após ``since``; snapshot completo se ``since`` é antigo demais"""
+        with self._lock:
+            high_water, full, moto_ids = self._changed(since)
+            motos = [self._record(moto_id, now_ms) for moto_id in moto_ids]
+        return {"seq": high_water, "full": full, "motos": motos}
+
+    def record(self, moto_id, now_ms):
+        """Status de uma moto no formato de /status, ou None se nunca apareceu"""
+        with self._lock:
+            if moto_id not in self._motos:
+                return None
+            return self._record(moto_id, now_ms)
+
+    def compact_changes(self, since):
+        """Como ``changes_since`` no formato compacto do /snapshot:
+        ``(seq, full, [[moto_id, x, y, status_code, quad_code], ...])``"""
+        with self._lock:
+            high_water, full, moto_ids = self._changed(since)
+            rows = [
+                [moto_id, round(r[0], 1), round(r[1], 1), r[3], r[2]]
+                for moto_id, r in ((m, self._motos[m]) for m in moto_ids)
+            ]
+        return high_water, full, rows
+
+    def compact(self):
+        """(seq, [[moto_id, x, y, status_code, quad_code], ...]) para o /snapshot"""
+        seq, _, rows = self.compact_changes(0)
+        return seq, rows
+
+    def size(self):
+        return len(self._motos)
+
+
+fleet_state = FleetState(STATUS_CHANGE_LOG_SIZE)
+
+
+_snapshot_lock = threading.Lock()
+_snapshot_kpi_lock = threading.Lock()
+_snapshot_cache = {
+    "seq": -1,
+    "kpi_expires": 0.0,
+    "kpi": None,
+    "body": None,
+    "body_kpi": None,
+}
+
+
+def _snapshot_kpi():
+    stats = get_stats()
+    return {
+        "total_detections": stats["total_detections"],
+        "unique_motos": stats["unique_motos"],
+        "last_detection": stats["last_detection"],
+    }
+
+
+def _refresh_snapshot_kpi():
+    """Recalcula os KPIs do /snapshot em segundo plano; quem chama já tem
+    ``_snapshot_kpi_lock``"""
+    try:
+        kpi = _snapshot_kpi()
+        with _snapshot_lock:
+            _snapshot_cache["kpi"] = kpi
+            _snapshot_cache["kpi_expires"] = time.monotonic() + SNAPSHOT_KPI_TTL_S
+    except Exception as e:
+        print(f"⚠️  Erro ao atualizar KPIs do snapshot: {e}")
+    finally:
+        _snapshot_kpi_lock.release()
+
+
+def build_snapshot():
+    """Status da frota + KPIs + timestamp do servidor em um payload compacto.
+
+    O JSON é montado no máximo uma vez por tick (mudança de ``seq``) ou
+    troca de KPIs, e reaproveitado por todos os viewers. KPIs do banco têm
+    TTL próprio e são recalculados em segundo plano, fora de
+    ``_snapshot_lock``, enquanto o payload anterior segue sendo servido (só a
+    primeira chamada de todas espera).
+    """
+    cache = _snapshot_cache
+    with _snapshot_lock:
+        have_kpi = cache["kpi"] is not None
+        kpi_stale = not have_kpi or time.monotonic() >= cache["kpi_expires"]
+        body_fresh = (
+            cache["body"] is not None
+            and cache["seq"] == fleet_state.seq
+            and cache["body_kpi"] is cache["kpi"]
+        )
+        if body_fresh and not kpi_stale:
+            return cache["body"]
+
+    if kpi_stale and have_kpi:
+        # KPIs vencidos: atualiza em segundo plano e serve os anteriores
+        if _snapshot_kpi_lock.acquire(blocking=False):
+            threading.Thread(
+                target=_refresh_snapshot_kpi, name="snapshot-kpi", daemon=True
+            ).start()
+    elif kpi_stale:
+        # Primeira chamada: não há KPIs anteriores, então espera o cálculo
+        with _snapshot_kpi_lock:
+            if cache["kpi"] is None:
+                kpi = _snapshot_kpi()
+                with _snapshot_lock:
+                    cache["kpi"] = kpi
+                    cache["kpi_expires"] = time.monotonic() + SNAPSHOT_KPI_TTL_S
+
+    with _snapshot_lock:
+        if cache["seq"] == fleet_state.seq and cache["body_kpi"] is cache["kpi"]:
+            return cache["body"]
+        seq, motos = fleet_state.compact()
+        cache["seq"] = seq
+        cache["body_kpi"] = cache["kpi"]
+        cache["body"] = json.dumps(
+            {
+                "t": _now_ms(),
+                "seq": seq,
+                "statuses": STATUS_LABELS.tolist(),
+                "motos": motos,
+                "kpi": cache["kpi"],
+            },
+            separators=(",", ":"),
+        )
+        return cache["body"]
+
+
+def build_snapshot_at(at_ms):
+    """Frota no instante ``at_ms`` no mesmo formato compacto do /snapshot.
+
+    ``complete`` é False quando não há checkpoint anterior ao instante (só a
+    última janela de CHECKPOINT_INTERVAL_S foi varrida).
+    """
+    started = time.perf_counter()
+    records, checkpoint_ms, scanned = fleet_as_of(at_ms)
+    metric_observe("snapshot_at_ms", (time.perf_counter() - started) * 1000)
+    return json.dumps(
+        {
+            "t": int(at_ms),
+            "at": str(np.datetime64(int(at_ms), "ms").tolist()),
+            "seq": None,
+            "statuses": STATUS_LABELS.tolist(),
+            "motos": [
+                [moto_id, round(x, 1), round(y, 1), status, quad]
+                for moto_id, x, y, status, quad in zip(
+                    records["moto_id"].tolist(),
+                    records["x"].tolist(),
+                    records["y"].tolist(),
+                    records["status"].tolist(),
+                    records["quad"].tolist(),
+                )
+            ],
+            "checkpoint": (
+                str(np.datetime64(checkpoint_ms, "ms").tolist())
+                if checkpoint_ms is not None
+                else None
+            ),
+            "complete": checkpoint_ms is not None,
+            "scanned_rows": scanned,
+        },
+        separators=(",", ":"),
+    )
+
+
+# ---------------- MÉTRICAS E ALERTAS DE EVENTOS ----------------
+_metrics_lock = threading.Lock()
+metrics = {}
+
+
+def metric_inc(name, value=1):
+    """Incrementa um contador"""
+    with _metrics_lock:
+        metrics[name] = metrics.get(name, 0) + value
+
+
+def metric_set(name, value):
+    """Define o valor atual de um gauge"""
+    with _metrics_lock:
+        metrics[name] = value
+
+
+def metric_observe(name, value):
+    """Acumula uma medida (ex.: duração em ms): count, sum, max e último valor"""
+    with _metrics_lock:
+        m = metrics.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0, "last": 0.0})
+        m["count"] += 1
+        m["sum"] += value
+        m["max"] = max(m["max"], value)
+        m["last"] = value
+
+
+def metrics_snapshot():
+    with _metrics_lock:
+        return {k: dict(v) if isinstance(v, dict) else v for k, v in metrics.items()}
+
+
+class AlertFeed:
+    """Buffer circular de alertas de eventos gerados pelos detectores"""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._alerts = deque(maxlen=size)
+
+    def push(self, alert):
+        with self._lock:
+            self._alerts.append((time.monotonic(), alert))
+        metric_inc(f"alerts_{alert['type']}")
+
+    def recent(self, max_age_s):
+        cutoff = time.monotonic() - max_age_s
+        with self._lock:
+            return [alert for ts, alert in self._alerts if ts >= cutoff]
+
+
+alert_feed = AlertFeed(ALERT_FEED_SIZE)
+
+
+# ---------------- PROXIMIDADE ----------------
+# Vizinhança "meia" (própria célula + 4 vizinhas) para gerar cada par uma única vez
+_NEIGHBOR_OFFSETS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+_HASH_STRIDE = 1 << 20
+
+
+def find_close_pairs(xs, ys, distance):
+    """Pares (i, j, distância) mais próximos que ``distance`` via spatial hash.
+
+    Cada posição cai em uma célula de lado ``distance``; só pontos da mesma
+    célula ou de células vizinhas são comparados, então o custo é O(n + pares
+    candidatos) em vez de O(n²).
+    """
+    n = len(xs)
+    empty = np.empty(0, dtype=np.int64)
+    if n < 2:
+        return empty, empty, np.empty(0)
+    keys = (xs // distance).astype(np.int64) * _HASH_STRIDE + (ys // distance).astype(
+        np.int64
+    )
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    positions = np.arange(n)
+
+    left, right = [], []
+    for dx, dy in _NEIGHBOR_OFFSETS:
+        target = sorted_keys + dx * _HASH_STRIDE + dy
+        hi = np.searchsorted(sorted_keys, target, side="right")
+        if dx == 0 and dy == 0:
+            lo = positions + 1  # mesma célula: só os que vêm depois na ordem
+        else:
+            lo = np.searchsorted(sorted_keys, target, side="left")
+        counts = np.maximum(hi - lo, 0)
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        src = np.repeat(positions, counts)
+        run_start = np.repeat(np.cumsum(counts) - counts, counts)
+        dst = lo[src] + (np.arange(total) - run_start)
+        left.append(order[src])
+        right.append(order[dst])
+
+    if not left:
+        return empty, empty, np.empty(0)
+    i = np.concatenate(left)
+    j = np.concatenate(right)
+    dist = np.hypot(xs[i] - xs[j], ys[i] - ys[j])
+    close = dist < distance
+    return i[close], j[close], dist[close]
+
+
+class ProximityDetector:
+    """Emite alerta ``proximity`` quando um par de motos entra no raio configurado"""
+
+    def __init__(self, distance):
+        self.distance = distance
+        self._active = set()
+
+    def check(self, moto_ids, xs, ys):
+        started = time.perf_counter()
+        i, j, dist = find_close_pairs(xs, ys, self.distance)
+        pairs = {}
+        for a, b, d in zip(moto_ids[i].tolist(), moto_ids[j].tolist(), dist.tolist()):
+            pairs[(min(a, b), max(a, b))] = d
+
+        now = datetime.utcnow().isoformat()
+        for (a, b), d in pairs.items():
+            if (a, b) in self._active:
+                continue
+            alert_feed.push(
+                {
+                    "type": "proximity",
+                    "severity": "warning",
+                    "moto_id": a,
+                    "other_moto_id": b,
+                    "distance": round(d, 1),
+                    "message": f"Motos {a} e {b} a {d:.1f} px (limite {self.distance:g})",
+                    "timestamp": now,
+                }
+            )
+        self._active = set(pairs)
+
+        metric_observe("proximity_check_ms", (time.perf_counter() - started) * 1000)
+        metric_set("proximity_close_pairs", len(pairs))
+        return pairs
+
+
+proximity_detector = ProximityDetector(PROXIMITY_DISTANCE)
+
+
+class GeofenceTracker:
+    """Eventos de entrada/saída de geofence por diferença de código entre ticks.
+
+    Guarda só o código de geofence atual de cada moto; como a pertinência vem
+    da máscara rasterizada, o custo por lote não depende do número de
+    polígonos. A primeira detecção de uma moto só inicializa o estado.
+    """
+
+    def __init__(self, names, statuses):
+        self.names = names
+        self.statuses = statuses
+        self._lock = threading.Lock()
+        self._state = {}  # moto_id -> [zone_code, last_ms]
+        self.entries = np.zeros(len(names), dtype=np.int64)
+        self.exits = np.zeros(len(names), dtype=np.int64)
+
+    def update(self, moto_ids, zone_codes, ts_ms):
+        """Processa um lote e emite os eventos no alert_feed; retorna os eventos"""
+        if len(moto_ids) == 0 or len(self.names) <= 1:
+            return []
+        started = time.perf_counter()
+        order = np.lexsort((ts_ms, moto_ids))
+        motos = moto_ids[order]
+        zones = zone_codes[order].astype(np.int64)
+        stamps = ts_ms[order]
+        starts = np.flatnonzero(np.r_[True, motos[1:] != motos[:-1]])
+        lengths = np.diff(np.r_[starts, len(motos)])
+
+        with self._lock:
+            known = [self._state.get(int(m)) for m in motos[starts].tolist()]
+            # Sem estado: a primeira linha da moto vira o próprio "anterior"
+            first_zone = np.array(
+                [s[0] if s else int(zones[i]) for s, i in zip(known, starts.tolist())],
+                dtype=np.int64,
+            )
+            last_ms = np.array([s[1] if s else -1 for s in known], dtype=np.int64)
+
+            # Descarta detecções atrasadas e refaz os grupos
+            fresh = stamps >= np.repeat(last_ms, lengths)
+            group = np.repeat(np.arange(len(starts)), lengths)[fresh]
+            motos, zones, stamps = motos[fresh], zones[fresh], stamps[fresh]
+            if len(motos) == 0:
+                return []
+            group_start = np.r_[True, group[1:] != group[:-1]]
+            previous = np.r_[0, zones[:-1]]
+            previous[group_start] = first_zone[group[group_start]]
+
+            group_end = np.r_[group[1:] != group[:-1], True]
+            for m, z, t in zip(
+                motos[group_end].tolist(),
+                zones[group_end].tolist(),
+                stamps[group_end].tolist(),
+            ):
+                self._state[m] = [z, t]
+
+            changed = np.flatnonzero(zones != previous)
+            np.add.at(self.exits, previous[changed], 1)
+            np.add.at(self.entries, zones[changed], 1)
+
+        events = []
+        for moto_id, old, new, ts in zip(
+            motos[changed].tolist(),
+            previous[changed].tolist(),
+            zones[changed].tolist(),
+            stamps[changed].tolist(),
+        ):
+            when = np.datetime64(ts, "ms").tolist().isoformat()
+            if old:
+                events.append(("exit", moto_id, self.names[old], when))
+            if new:
+                events.append(("entry", moto_id, self.names[new], when))
+        for kind, moto_id, name, when in events:
+            verb = "entrou em" if kind == "entry" else "saiu de"
+            alert_feed.push(
+                {
+                    "type": f"geofence_{kind}",
+                    "severity": "info",
+                    "moto_id": moto_id,
+                    "geofence": name,
+                    "message": f"Moto {moto_id} {verb} {name}",
+                    "timestamp": when,
+                }
+            )
+        metric_observe("geofence_update_ms", (time.perf_counter() - started) * 1000)
+        return events
+
+    def stats(self):
+        """Motos dentro, entradas e saídas de cada geofence"""
+        with self._lock:
+            current = np.array([s[0] for s in self._state.values()], dtype=np.int64)
+            inside = np.bincount(current, minlength=len(self.names))
+            entries, exits = self.entries.copy(), self.exits.copy()
+        return {
+            self.names[code]: {
+                "status": self.statuses[code],
+                "inside": int(inside[code]),
+                "entries": int(entries[code]),
+                "exits": int(exits[code]),
+            }
+            for code in range(1, len(self.names))
+        }
+
+
+geofence_tracker = GeofenceTracker(
+    GEOFENCE_NAMES.tolist(), [None, *[fence.get("status") for fence in GEOFENCES]]
+)
+
+
+# ---------------- ANOMALIAS DE TRAJETÓRIA ----------------
+class TrajectoryAnomalyDetector:
+    """Valida a telemetria em streaming, moto a moto, sem consultar o banco.
+
+    Emite no alert_feed:
+        teleport       salto maior que ``teleport_px`` num passo, com
+                       velocidade implícita acima do limite
+        speeding       velocidade acima de ``max_speed`` (px/s)
+        out_of_bounds  posição fora do pátio (linhas rejeitadas na ingestão)
+        stuck          moto "em_uso" parada (dentro de ``stuck_epsilon`` px)
+                       por ``stuck_ms``: rastreador travado ou moto abandonada
+
+    O estado por moto é fixo (última amostra, âncora de parada e flags), em
+    arrays NumPy como na banda morta; o lote é percorrido por posição dentro
+    de cada moto, vetorizado entre as motos. ``speeding``, ``out_of_bounds``
+    e ``stuck`` só alertam na entrada da condição, não a cada detecção.
+    """
+
+    _FIELDS = (
+        ("x", np.float64),  # última amostra aceita
+        ("y", np.float64),
+        ("ts", np.int64),
+        ("anchor_x", np.float64),  # início do trecho parado atual
+        ("anchor_y", np.float64),
+        ("anchor_ts", np.int64),
+        ("flags", np.int8),  # condições ativas (bits abaixo)
+        ("known", np.bool_),
+    )
+    SPEEDING, STUCK, OUT_OF_BOUNDS = 1, 2, 4
+
+    def __init__(self, max_speed, teleport_px, stuck_epsilon, stuck_ms, width, height):
+        self.max_speed = max_speed
+        self.teleport_px = teleport_px
+        self.stuck_epsilon = stuck_epsilon
+        self.stuck_ms = stuck_ms
+        self.width = width
+        self.height = height
+        self._moving_status = _STATUS_INDEX["em_uso"]
+        self._lock = threading.Lock()
+        self._slots = {}  # moto_id -> posição nos arrays de estado
+        self._state = {name: np.zeros(0, dtype=dtype) for name, dtype in self._FIELDS}
+
+    def _slots_for(self, moto_ids):
+        """Posições de estado das motos, criando as que faltam (com o lock)"""
+        slots = np.array(
+            [self._slots.setdefault(m, len(self._slots)) for m in moto_ids.tolist()],
+            dtype=np.int64,
+        )
+        capacity = len(self._state["ts"])
+        if len(self._slots) > capacity:
+            extra = max(len(self._slots), 2 * capacity) - capacity
+            for name, dtype in self._FIELDS:
+                self._state[name] = np.r_[
+                    self._state[name], np.zeros(extra, dtype=dtype)
+                ]
+        return slots
+
+    def update(self, moto_ids, xs, ys, status_codes, ts_ms):
+        """Processa um lote e emite os alertas; retorna a lista de alertas"""
+        if len(moto_ids) == 0:
+            return []
+        started = time.perf_counter()
+        inside = (xs >= 0) & (xs <= self.width) & (ys >= 0) & (ys <= self.height)
+        alerts = []
+        if not inside.all():
+            alerts += self.out_of_bounds(
+                moto_ids[~inside], xs[~inside], ys[~inside], ts_ms[~inside]
+            )
+            moto_ids, xs, ys = moto_ids[inside], xs[inside], ys[inside]
+            status_codes, ts_ms = status_codes[inside], ts_ms[inside]
+            if len(moto_ids) == 0:
+                return alerts
+        events = []  # (índice do lote, tipo, valor)
+
+        order = np.lexsort((ts_ms, moto_ids))
+        motos = moto_ids[order]
+        starts = np.flatnonzero(np.r_[True, motos[1:] != motos[:-1]])
+        sizes = np.diff(np.r_[starts, len(motos)])
+        with self._lock:
+            slots = self._slots_for(motos[starts]) if len(starts) else starts
+            state = self._state
+            for k in range(int(sizes.max()) if len(sizes) else 0):
+                g = np.flatnonzero(sizes > k)
+                idx = order[starts[g] + k]
+                s = slots[g]
+                x, y, ts = xs[idx], ys[idx], ts_ms[idx]
+                known = state["known"][s]
+                # Detecções atrasadas não alteram a trajetória
+                fresh = ~known | (ts >= state["ts"][s])
+                idx, s, x, y, ts = idx[fresh], s[fresh], x[fresh], y[fresh], ts[fresh]
+                known = known[fresh]
+                flags = state["flags"][s] & ~np.int8(self.OUT_OF_BOUNDS)
+
+                dist = np.hypot(x - state["x"][s], y - state["y"][s])
+                dt_s = (ts - state["ts"][s]) / 1000
+                timed = known & (dt_s > 0)
+                speed = np.where(timed, dist / np.where(timed, dt_s, 1), np.inf)
+                fast = speed > self.max_speed
+                teleport = known & (dist > self.teleport_px) & fast
+                speeding = timed & fast & ~teleport
+                new_speeding = speeding & ((flags & self.SPEEDING) == 0)
+                # Sem intervalo de tempo (mesmo timestamp) o estado não muda
+                flags = np.where(
+                    speeding,
+                    flags | self.SPEEDING,
+                    np.where(timed, flags & ~np.int8(self.SPEEDING), flags),
+                ).astype(np.int8)
+
+                # Âncora reinicia quando a moto sai do raio ou não está em uso
+                moved = (
+                    ~known
+                    | (
+                        np.hypot(x - state["anchor_x"][s], y - state["anchor_y"][s])
+                        > self.stuck_epsilon
+                    )
+                    | (status_codes[idx] != self._moving_status)
+                )
+                anchored = s[moved]
+                state["anchor_x"][anchored] = x[moved]
+                state["anchor_y"][anchored] = y[moved]
+                state["anchor_ts"][anchored] = ts[moved]
+                parked_ms = ts - state["anchor_ts"][s]
+                stuck = ~moved & (parked_ms >= self.stuck_ms)
+                new_stuck = stuck & ((flags & self.STUCK) == 0)
+                flags = np.where(
+                    stuck, flags | self.STUCK, flags & ~np.int8(self.STUCK)
+                ).astype(np.int8)
+
+                state["x"][s], state["y"][s], state["ts"][s] = x, y, ts
+                state["flags"][s] = flags
+                state["known"][s] = True
+
+                for kind, mask, values in (
+                    ("teleport", teleport, dist),
+                    ("speeding", new_speeding, speed),
+                    ("stuck", new_stuck, parked_ms / 1000),
+                ):
+                    events += [
+                        (i, kind, v)
+                        for i, v in zip(idx[mask].tolist(), values[mask].tolist())
+                    ]
+            active = state["flags"][: len(self._slots)]
+            speeding_motos = int(np.count_nonzero(active & self.SPEEDING))
+            stuck_motos = int(np.count_nonzero(active & self.STUCK))
+
+        messages = {
+            "teleport": "saltou {:.0f} px em um passo",
+            "speeding": "a {:.0f} px/s (limite %g)" % self.max_speed,
+            "stuck": "em uso e parada há {:.0f} s",
+        }
+        for i, kind, value in sorted(events):
+            moto_id = int(moto_ids[i])
+            alert = {
+                "type": kind,
+                "severity": "warning",
+                "moto_id": moto_id,
+                "value": round(value, 1),
+                "message": f"Moto {moto_id} {messages[kind].format(value)}",
+                "timestamp": np.datetime64(int(ts_ms[i]), "ms").tolist().isoformat(),
+            }
+            alert_feed.push(alert)
+            alerts.append(alert)
+        metric_set("trajectory_speeding_motos", speeding_motos)
+        metric_set("trajectory_stuck_motos", stuck_motos)
+        metric_observe("trajectory_check_ms", (time.perf_counter() - started) * 1000)
+        return alerts
+
+    def out_of_bounds(self, moto_ids, xs, ys, ts_ms):
+        """Alerta (uma vez por episódio) posições fora do pátio; não move a trajetória"""
+        if len(moto_ids) == 0:
+            return []
+        with self._lock:
+            ids, first = np.unique(moto_ids, return_index=True)
+            slots = self._slots_for(ids)
+            new = (self._state["flags"][slots] & self.OUT_OF_BOUNDS) == 0
+            self._state["flags"][slots] |= np.int8(self.OUT_OF_BOUNDS)
+        alerts = []
+        for i in first[new].tolist():
+            moto_id = int(moto_ids[i])
+            alert = {
+                "type": "out_of_bounds",
+                "severity": "warning",
+                "moto_id": moto_id,
+                "value": [round(float(xs[i]), 1), round(float(ys[i]), 1)],
+                "message": f"Moto {moto_id} reportou posição fora do pátio "
+                f"({xs[i]:.0f}, {ys[i]:.0f})",
+                "timestamp": np.datetime64(int(ts_ms[i]), "ms").tolist().isoformat(),
+            }
+            alert_feed.push(alert)
+            alerts.append(alert)
+        metric_inc("trajectory_out_of_bounds_rows", len(moto_ids))
+        return alerts
+
+    def stats(self):
+        """Motos acompanhadas e quantas estão em cada condição agora"""
+        with self._lock:
+            flags = self._state["flags"][: len(self._slots)]
+            return {
+                "motos": len(self._slots),
+                "speeding": int(np.count_nonzero(flags & self.SPEEDING)),
+                "stuck": int(np.count_nonzero(flags & self.STUCK)),
+                "out_of_bounds": int(np.count_nonzero(flags & self.OUT_OF_BOUNDS)),
+            }
+
+
+trajectory_anomalies = TrajectoryAnomalyDetector(
+    ANOMALY_MAX_SPEED_PX_S,
+    ANOMALY_TELEPORT_PX,
+    ANOMALY_STUCK_EPSILON_PX,
+    int(ANOMALY_STUCK_S * 1000),
+    WIDTH,
+    HEIGHT,
+)
+
+
+# ---------------- INGESTÃO ----------------
+def _now_ms():
+    """Epoch UTC em milissegundos"""
+    return int(time.time() * 1000)
+
+
+spool = None  # Spool em disco (criado na inicialização se SPOOL_ENABLED)
+
+
+def _build_batch(moto_ids, xs, ys, ts_ms):
+    quad_codes, status_codes = classify_batch(xs, ys)
+    return {
+        "moto_id": moto_ids,
+        "x": xs,
+        "y": ys,
+        "ts_ms": ts_ms,
+        "quad_code": quad_codes,
+        "status_code": status_codes,
+        "zone_code": geofence_codes(xs, ys),
+    }
+
+
+def ingest_batch(moto_ids, xs, ys, ts_ms):
+    """Classifica e persiste um lote já validado (caminho único de escrita).
+
+    Todos os produtores (simulação, /ingest) passam por aqui. Com o spool
+    ativo o lote só é gravado no log local; a drenagem leva ao Oracle.
+    """
+    batch = _build_batch(moto_ids, xs, ys, ts_ms)
+    if spool is not None:
+        spool.append(moto_ids, xs, ys, ts_ms)
+        metric_inc("spool_appended_rows", len(moto_ids))
+    else:
+        persist_batch(batch)
+    fleet_state.apply(moto_ids, xs, ys, batch["quad_code"], batch["status_code"], ts_ms)
+    occupancy_heatmap.record(moto_ids, xs, ys, ts_ms, _now_ms())
+    geofence_tracker.update(moto_ids, batch["zone_code"], ts_ms)
+    trajectory_anomalies.update(moto_ids, xs, ys, batch["status_code"], ts_ms)
+    return batch
+
+
+# Erros ORA causados pelo conteúdo da linha (nulo, número/data inválidos,
+# valor grande demais, CHECK/FK): repetir o lote não adianta
+_DATA_ERROR_CODES = frozenset(
+    {1400, 1438, 1722, 1830, 1839, 1840, 1841, 1843, 1847, 1858, 1861, 2290, 2291}
+    | {12899}
+)
+
+
+def _is_data_error(error):
+    """True se ``error`` é um erro do Oracle sobre os dados do lote"""
+    if not isinstance(error, oracledb.DatabaseError) or not error.args:
+        return False
+    return getattr(error.args[0], "code", None) in _DATA_ERROR_CODES
+
+
+def _drain_spool_batch(moto_ids, xs, ys, ts_ms, last_seq):
+    """Sink do spool: grava o lote e o checkpoint no Oracle (tudo ou nada).
+
+    Só erros do Oracle sobre os dados (tipo, faixa, constraint; ver
+    ``_DATA_ERROR_CODES``) viram ``RejectedBatch``, para o spool isolar os
+    registros ruins. Todo o resto (conexão, tablespace cheio, deadlock,
+    timeout de lock, bug) propaga e o lote é repetido com backoff.
+    """
+    try:
+        persist_batch(
+            _build_batch(moto_ids.astype(np.int64), xs, ys, ts_ms.astype(np.int64)),
+            spool_id=spool.spool_id,
+            spool_seq=last_seq,
+        )
+    except Exception as e:
+        metric_inc("spool_drain_errors")
+        if not _is_data_error(e):
+            _ensure_db_connection()  # reabre se a falha foi a conexão
+            raise
+        raise RejectedBatch(str(e)) from e
+    metric_inc("spool_drained_rows", len(moto_ids))
+
+
+def _parse_ingest_body(raw, content_type):
+    """Converte o corpo do POST /ingest em DataFrame colunar.
+
+    Aceita NDJSON (um objeto por linha) ou JSON colunar
+    ({"moto_id": [...], "x": [...], "y": [...], "timestamp": [...]}).
+    """
+    text = raw.decode("utf-8")
+    if "ndjson" not in content_type:
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError:
+            payload = None  # Várias linhas JSON: trata como NDJSON
+        if isinstance(payload, dict):
+            return pd.DataFrame(payload), "columnar"
+        if payload is not None:
+            raise ValueError("JSON colunar deve ser um objeto de listas")
+    records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if not all(isinstance(record, dict) for record in records):
+        raise ValueError("Cada linha NDJSON deve ser um objeto JSON")
+    return pd.DataFrame.from_records(records), "ndjson"
+
+
+def _parse_timestamps_ms(values, now_ms):
+    """Converte timestamps (ISO-8601 ou epoch em s/ms) para epoch ms; inválidos viram -1"""
+    numeric = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+    ts_ms = np.full(len(values), -1, dtype=np.int64)
+
+    # Valores absurdos ficam de fora: a conversão para int64 estouraria
+    is_num = np.isfinite(numeric) & (np.abs(numeric) < 1e17)
+    # Heurística: valores abaixo de 1e11 são segundos, acima são milissegundos
+    ts_ms[is_num] = np.where(
+        numeric[is_num] < 1e11, numeric[is_num] * 1000, numeric[is_num]
+    ).astype(np.int64)
+
+    is_text = ~is_num & values.notna().to_numpy()
+    if is_text.any():
+        parsed = pd.to_datetime(
+            values[is_text].astype(str), errors="coerce", utc=True, format="ISO8601"
+        )
+        ok = parsed.notna()
+        parsed_ms = np.full(len(parsed), -1, dtype=np.int64)
+        parsed_ms[ok] = (
+            parsed[ok]
+            .dt.tz_convert(None)
+            .to_numpy()
+            .astype("datetime64[ms]")
+            .astype(np.int64)
+        )
+        ts_ms[is_text] = parsed_ms
+
+    # Sem timestamp: usa horário de recebimento do servidor
+    ts_ms[values.isna().to_numpy()] = now_ms
+    return ts_ms
+
+
+def validate_ingest_frame(df):
+    """Valida um lote inteiro de forma vetorizada.
+
+    Retorna (moto_ids, xs, ys, ts_ms) apenas das linhas aceitas e um dict
+    com a contagem de rejeições por motivo.
+    """
+    n = len(df)
+    for column in ("moto_id", "x", "y"):
+        if column not in df.columns:
+            raise ValueError(f"Campo obrigatório ausente: {column}")
+
+    moto = pd.to_numeric(df["moto_id"], errors="coerce").to_numpy(dtype=np.float64)
+    xs = pd.to_numeric(df["x"], errors="coerce").to_numpy(dtype=np.float64)
+    ys = pd.to_numeric(df["y"], errors="coerce").to_numpy(dtype=np.float64)
+    timestamps = df["timestamp"] if "timestamp" in df.columns else pd.Series([None] * n)
+    ts_ms = _parse_timestamps_ms(timestamps.reset_index(drop=True), _now_ms())
+
+    ok, rejections = _validate_arrays(moto, xs, ys, ts_ms)
+    return (moto[ok].astype(np.int64), xs[ok], ys[ok], ts_ms[ok]), rejections
+
+
+def _validate_arrays(moto, xs, ys, ts_ms):
+    """Máscara de linhas válidas + contagem de rejeições por motivo"""
+    bad_moto = (
+        ~np.isfinite(moto)
+        | (moto < 1)
+        | (moto > MOTO_ID_MAX)
+        | (moto != np.floor(moto))
+    )
+    bad_pos = (
+        ~np.isfinite(xs)
+        | ~np.isfinite(ys)
+        | (xs < 0)
+        | (xs > WIDTH)
+        | (ys < 0)
+        | (ys > HEIGHT)
+    )
+    now_ms = _now_ms()
+    bad_ts = (ts_ms < now_ms - INGEST_MAX_AGE_S * 1000) | (
+        ts_ms > now_ms + INGEST_MAX_SKEW_S * 1000
+    )
+
+    # Coordenadas fora do pátio de uma moto válida indicam rastreador com
+    # defeito: a linha é rejeitada, mas alimenta o detector de trajetória
+    outside = bad_pos & ~bad_moto & ~bad_ts & np.isfinite(xs) & np.isfinite(ys)
+    if outside.any():
+        trajectory_anomalies.out_of_bounds(
+            moto[outside].astype(np.int64), xs[outside], ys[outside], ts_ms[outside]
+        )
+
+    # Cada linha rejeitada conta apenas no primeiro motivo encontrado
+    rejections = {
+        "invalid_moto_id": int(bad_moto.sum()),
+        "out_of_bounds": int((bad_pos & ~bad_moto).sum()),
+        "invalid_timestamp": int((bad_ts & ~bad_moto & ~bad_pos).sum()),
+    }
+    return ~(bad_moto | bad_pos | bad_ts), rejections
+
+
+def ingest_arrays(moto_ids, xs, ys, ts_ms):
+    """Valida e grava arrays já decodificados (sink do listener UDP/TCP)"""
+    ok, rejections = _validate_arrays(moto_ids.astype(np.float64), xs, ys, ts_ms)
+    if ok.any():
+        ingest_batch(moto_ids[ok], xs[ok], ys[ok], ts_ms[ok])
+    return int(ok.sum()), rejections
+
+
+# ---------------- SIMULAÇÃO ----------------
+cores = [(0, 0, 255), (0, 255, 0), (255, 0, 0), (0, 255, 255)]
+# Estado da frota em arrays para avançar todas as motos de uma vez
+FLEET_IDS = np.arange(1, NUM_MOTOS + 1, dtype=np.int64)
+# As quatro posições de partida se repetem deslocadas quando o pátio tem mais motos
+_fleet_shift = (np.arange(NUM_MOTOS) // 4) * 53
+xs = np.resize(np.array([100, 700, 400, 200], dtype=np.float64), NUM_MOTOS)
+ys = np.resize(np.array([100, 500, 300, 400], dtype=np.float64), NUM_MOTOS)
+xs = (xs + _fleet_shift - 20) % (WIDTH - 40) + 20
+ys = (ys + _fleet_shift - 20) % (HEIGHT - 40) + 20
+vxs = np.resize(np.array([3, -2, 4, -3], dtype=np.float64), NUM_MOTOS)
+vys = np.resize(np.array([2, -3, -2, 3], dtype=np.float64), NUM_MOTOS)
+
+
+def step_fleet(xs, ys, vxs, vys):
+    """Avança a frota inteira um frame (in-place), refletindo nas bordas"""
+    xs += vxs
+    ys += vys
+    vxs[(xs <= 10) | (xs >= WIDTH - 10)] *= -1
+    vys[(ys <= 10) | (ys >= HEIGHT - 10)] *= -1
+
+
+class TickScheduler:
+    """Relógio de passo fixo com compensação de drift.
+
+    Os prazos são absolutos (início + k × período), então atrasos de um tick
+    não se acumulam. Se o laço atrasar, até ``max_catchup`` ticks são
+    executados em sequência para recuperar; além disso os ticks são pulados
+    (e contados) e o relógio é realinhado.
+    """
+
+    def __init__(self, hz, max_catchup=5):
+        self.period = 1.0 / hz
+        self.max_catchup = max_catchup
+        self.tick = 0
+        self._origin = time.monotonic()
+        self._next = self._origin
+        self.counters = {"ticks": 0, "overruns": 0, "skipped": 0}
+
+    def wait(self, stop_event=None):
+        """Dorme até o próximo prazo e devolve o índice do tick"""
+        now = time.monotonic()
+        late = now - self._next
+        if late < 0:
+            if stop_event is not None:
+                stop_event.wait(-late)
+            else:
+                time.sleep(-late)
+        elif late >= self.period:
+            self.counters["overruns"] += 1
+            behind = int(late / self.period)
+            if behind > self.max_catchup:
+                skipped = behind - self.max_catchup
+                self.counters["skipped"] += skipped
+                self.tick += skipped
+                self._next += skipped * self.period
+        tick = self.tick
+        self.tick += 1
+        self._next += self.period
+        self.counters["ticks"] += 1
+        return tick
+
+    def lag_ms(self):
+        """Atraso do laço em relação ao prazo do próximo tick (0 se em dia)"""
+        return max(0.0, (time.monotonic() - self._next) * 1000)
+
+    def stats(self):
+        return {
+            "tick_hz": round(1.0 / self.period, 3),
+            "elapsed_s": round(time.monotonic() - self._origin, 3),
+            "lag_ms": round(self.lag_ms(), 1),
+            **self.counters,
+        }
+
+
+simulation_scheduler = None
+scenario_engine = None
+_simulation_stop = threading.Event()
+_sim_pending = deque()  # ticks produzidos aguardando gravação
+_sim_pending_cond = threading.Condition()
+_sim_latest = None  # último tick, para o renderizador
+_sim_persist_thread = None
+_sim_last_write_error = None  # erro da última gravação (None = gravou)
+
+
+def _persist_simulation_ticks():
+    """Grava os ticks produzidos pela simulação, juntando os pendentes num lote"""
+    global _sim_last_write_error
+    while not _simulation_stop.is_set():
+        with _sim_pending_cond:
+            while not _sim_pending and not _simulation_stop.is_set():
+                _sim_pending_cond.wait(timeout=0.5)
+            ticks = list(_sim_pending)
+            _sim_pending.clear()
+        if not ticks:
+            continue
+        started = time.perf_counter()
+        try:
+            ingest_batch(
+                np.concatenate([t[0] for t in ticks]),
+                np.concatenate([t[1] for t in ticks]),
+                np.concatenate([t[2] for t in ticks]),
+                np.concatenate([t[3] for t in ticks]),
+            )
+            _sim_last_write_error = None
+        except Exception as e:
+            # Uma falha (ex.: Oracle fora sem spool) não pode derrubar a thread
+            _sim_last_write_error = str(e)
+            metric_inc("simulation_tick_errors")
+            print(f"⚠️  Erro ao salvar frame da simulação: {e}")
+        metric_observe("simulation_persist_ms", (time.perf_counter() - started) * 1000)
+        metric_observe("simulation_persist_ticks", len(ticks))
+
+
+def _render_simulation():
+    """Desenha o último tick na janela OpenCV (thread própria; ESC encerra)"""
+    status_colors = {
+        "em_uso": (0, 255, 0),  # Verde
+        "no_patio": (255, 255, 0),  # Amarelo
+        "manutencao": (0, 165, 255),  # Laranja
+        "reservada": (128, 0, 128),  # Roxo
+        "desconhecido": (255, 255, 255),  # Branco
+    }
+    while not _simulation_stop.is_set():
+        latest = _sim_latest
+        frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+        # desenha grid
+        for r in range(1, GRID_ROWS):
+            cv2.line(
+                frame,
+                (0, r * QUAD_HEIGHT),
+                (WIDTH, r * QUAD_HEIGHT),
+                (100, 100, 100),
+                1,
+            )
+        for c in range(1, GRID_COLS):
+            cv2.line(
+                frame, (c * QUAD_WIDTH, 0), (c * QUAD_WIDTH, HEIGHT), (100, 100, 100), 1
+            )
+
+        # desenha geofences
+        for fence in GEOFENCES:
+            points = np.round(np.asarray(fence["polygon"])).astype(np.int32)
+            cv2.polylines(frame, [points], True, (200, 200, 0), 1)
+            cv2.putText(
+                frame,
+                fence["name"],
+                (int(points[:, 0].min()) + 4, int(points[:, 1].min()) + 14),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.4,
+                (200, 200, 0),
+                1,
+            )
+
+        if latest is not None:
+            frame_ids, frame_xs, frame_ys, _, quad_codes, status_codes = latest
+            # Frotas grandes (cenários): pontos menores e sem legenda por moto
+            radius = 10 if len(frame_ids) <= len(cores) else 4
+            for i in range(len(frame_ids)):
+                # Desenha moto
+                cv2.circle(
+                    frame,
+                    (int(frame_xs[i]), int(frame_ys[i])),
+                    radius,
+                    cores[(int(frame_ids[i]) - 1) % len(cores)],
+                    -1,
+                )
+                if len(frame_ids) > len(cores):
+                    continue
+
+                # Quadrante e status
+                quad = QUADRANT_LABELS[quad_codes[i]]
+                status = STATUS_LABELS[status_codes[i]]
+                status_color = status_colors.get(status, (255, 255, 255))
+                cv2.putText(
+                    frame,
+                    f"Moto {frame_ids[i]}: {quad} - {status.upper()}",
+                    (10, 30 + i * 30),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.7,
+                    status_color,
+                    2,
+                )
+
+        cv2.imshow("Rastreamento das Motos - Oracle", frame)
+        key = cv2.waitKey(30) & 0xFF
+        if key == 27:  # ESC para sair
+            _simulation_stop.set()
+    cv2.destroyAllWindows()
+
+
+def run_simulation():
+    """Executa simulação de rastreamento (modo headless para containers).
+
+    O cálculo roda num relógio de passo fixo (``SIMULATION_TICK_HZ``); a
+    gravação e a renderização rodam em threads próprias e recebem os lotes
+    produzidos, então a latência do Oracle não altera a velocidade simulada.
+    """
+    global simulation_scheduler, scenario_engine, _sim_latest, _sim_persist_thread
+    # Detecta se há display disponível (para modo gráfico vs headless)
+    # Em containers Azure, geralmente não há display disponível
+    has_display = False
+    if os.environ.get("DISPLAY"):
+        try:
+            # Tenta detectar se cv2.imshow() funcionaria
+            test_frame = np.zeros((100, 100, 3), dtype=np.uint8)
+            cv2.namedWindow("test", cv2.WINDOW_NORMAL)
+            cv2.imshow("test", test_frame)
+            cv2.waitKey(1)
+            cv2.destroyWindow("test")
+            has_display = True
+        except Exception:
+            has_display = False
+
+    if not has_display:
+        print("Modo headless detectado - simulação rodando sem interface gráfica")
+
+    _sim_persist_thread = threading.Thread(
+        target=_persist_simulation_ticks, name="simulation-persist", daemon=True
+    )
+    _sim_persist_thread.start()
+    if has_display:
+        threading.Thread(
+            target=_render_simulation, name="simulation-render", daemon=True
+        ).start()
+
+    if SCENARIO_SPEC is not None:
+        scenario_engine = _new_scenario_engine(SCENARIO_SPEC)
+        print(
+            f"🎬 Cenário '{scenario_engine.name}': {NUM_MOTOS} motos, "
+            f"escala {scenario_engine.time_scale:g}x"
+        )
+
+    scheduler = simulation_scheduler = TickScheduler(
+        SIMULATION_TICK_HZ, SIMULATION_MAX_CATCHUP
+    )
+    period_ms = scheduler.period * 1000
+    start_ms = _now_ms()
+    while not _simulation_stop.is_set():
+        tick = scheduler.wait(_simulation_stop)
+        started = time.perf_counter()
+
+        if scenario_engine is not None:
+            active = scenario_engine.step(tick * scheduler.period)
+            tick_ids = FLEET_IDS[active]
+            tick_xs, tick_ys = scenario_engine.x[active], scenario_engine.y[active]
+        else:
+            step_fleet(xs, ys, vxs, vys)
+            tick_ids, tick_xs, tick_ys = FLEET_IDS, xs.copy(), ys.copy()
+        proximity_detector.check(tick_ids, tick_xs, tick_ys)
+        quad_codes, status_codes = classify_batch(tick_xs, tick_ys)
+        # Timestamp do tick no relógio simulado (regular mesmo sob carga)
+        ts_ms = np.full(len(tick_ids), start_ms + int(tick * period_ms), dtype=np.int64)
+        produced = (tick_ids, tick_xs, tick_ys, ts_ms, quad_codes, status_codes)
+        _sim_latest = produced
+
+        with _sim_pending_cond:
+            if len(_sim_pending) >= SIMULATION_MAX_PENDING:
+                _sim_pending.popleft()
+                metric_inc("simulation_dropped_ticks")
+            _sim_pending.append(produced[:4])
+            _sim_pending_cond.notify()
+        metric_observe("simulation_tick_ms", (time.perf_counter() - started) * 1000)
+        metric_set("simulation_pending_ticks", len(_sim_pending))
+
+        # Log a cada 100 frames para não poluir logs
+        if not has_display and scheduler.counters["ticks"] % 100 == 0:
+            print(
+                f"Simulação rodando... {scheduler.counters['ticks']} frames processados"
+            )
+
+
+# ---------------- GERAÇÃO SINTÉTICA ----------------
+def _new_scenario_engine(spec):
+    return ScenarioEngine(
+        spec,
+        QUADRANT_LABELS,
+        QUADRANT_LABELS_STATUS,
+        QUAD_WIDTH,
+        QUAD_HEIGHT,
+        GRID_COLS,
+    )
+
+
+def _reflect(raw, lo, hi):
+    """Posição de um movimento retilíneo refletido entre lo e hi (onda triangular)"""
+    span = hi - lo
+    u = np.mod(raw - lo, 2 * span)
+    return lo + np.where(u <= span, u, 2 * span - u)
+
+
+# Início padrão do histórico sintético: fixo para que a mesma seed gere as
+# mesmas linhas em qualquer dia (``--start`` escolhe outro)
+GENERATE_START_MS = int(np.datetime64("2025-01-01T00:00:00", "ms").astype(np.int64))
+
+
+def generate_synthetic_batches(
+    num_motos, ticks, tick_ms=1000, seed=42, start_ms=None, chunk_rows=200_000
+):
+    """Gera detecções sintéticas de forma determinística, sem dormir nem desenhar.
+
+    A posição em cada tick vem da forma fechada do movimento com reflexão nas
+    bordas, então cada bloco de ticks é calculado de uma vez para a frota toda.
+    Mesma seed e parâmetros produzem exatamente as mesmas linhas.
+    """
+    rng = np.random.default_rng(seed)
+    if start_ms is None:
+        start_ms = GENERATE_START_MS
+
+    x0 = rng.uniform(10, WIDTH - 10, num_motos)
+    y0 = rng.uniform(10, HEIGHT - 10, num_motos)
+    # Velocidades em px/s: o tick_ms muda a resolução, não a velocidade física
+    vx = rng.uniform(30, 130, num_motos) * rng.choice([-1, 1], num_motos)
+    vy = rng.uniform(30, 130, num_motos) * rng.choice([-1, 1], num_motos)
+    moto_ids = np.arange(1, num_motos + 1, dtype=np.int64)
+
+    ticks_per_chunk = max(1, chunk_rows // num_motos)
+    for t0 in range(0, ticks, ticks_per_chunk):
+        t = np.arange(t0, min(t0 + ticks_per_chunk, ticks), dtype=np.int64)
+        seconds = (t * tick_ms / 1000.0)[:, None]
+        batch_xs = np.round(_reflect(x0 + vx * seconds, 10, WIDTH - 10), 2).ravel()
+        batch_ys = np.round(_reflect(y0 + vy * seconds, 10, HEIGHT - 10), 2).ravel()
+        quad_codes, status_codes = classify_batch(batch_xs, batch_ys)
+        yield {
+            "moto_id": np.tile(moto_ids, len(t)),
+            "x": batch_xs,
+            "y": batch_ys,
+            "ts_ms": np.repeat(start_ms + t * tick_ms, num_motos),
+            "quad_code": quad_codes,
+            "status_code": status_codes,
+        }
+
+
+def generate_scenario_batches(
+    spec, ticks, tick_ms=1000, start_ms=None, chunk_rows=200_000
+):
+    """Histórico sintético guiado por um cenário (tempo de cenário = tempo simulado).
+
+    O motor é determinístico pela seed do cenário; cada tick avança a frota
+    inteira de forma vetorizada e os ticks são agrupados em blocos.
+    """
+    engine = _new_scenario_engine(spec)
+    engine.time_scale = 1.0
+    if start_ms is None:
+        start_ms = GENERATE_START_MS
+    moto_ids = np.arange(1, engine.fleet_size + 1, dtype=np.int64)
+    parts = []
+    rows = 0
+    for t in range(ticks):
+        active = engine.step(t * tick_ms / 1000.0)
+        count = int(active.sum())
+        parts.append(
+            (
+                moto_ids[active],
+                np.round(engine.x[active], 2),
+                np.round(engine.y[active], 2),
+                np.full(count, start_ms + t * tick_ms, dtype=np.int64),
+            )
+        )
+        rows += count
+        if rows >= chunk_rows or t == ticks - 1:
+            batch_xs = np.concatenate([p[1] for p in parts])
+            batch_ys = np.concatenate([p[2] for p in parts])
+            quad_codes, status_codes = classify_batch(batch_xs, batch_ys)
+            yield {
+                "moto_id": np.concatenate([p[0] for p in parts]),
+                "x": batch_xs,
+                "y": batch_ys,
+                "ts_ms": np.concatenate([p[3] for p in parts]),
+                "quad_code": quad_codes,
+                "status_code": status_codes,
+            }
+            parts, rows = [], 0
+
+
+def _write_batch_csv(batch, path, header):
+    pd.DataFrame(
+        {
+            "moto_id": batch["moto_id"],
+            "x": batch["x"],
+            "y": batch["y"],
+            "quadrant": QUADRANT_LABELS[batch["quad_code"]],
+            "status": STATUS_LABELS[batch["status_code"]],
+            "timestamp": batch["ts_ms"].astype("datetime64[ms]"),
+        }
+    ).to_csv(path, mode="w" if header else "a", header=header, index=False)
+
+
+def _ensure_load_table():
+    """Cria a tabela de staging da carga direta (mesmas colunas, sem trigger)"""
+    with db_lock:
+        cur = db_conn.cursor()
+        cur.execute(
+            "SELECT COUNT(*) FROM user_tables WHERE table_name = UPPER(:1)",
+            [LOAD_TABLE_NAME],
+        )
+        if cur.fetchone()[0] == 0:
+            cur.execute(
+                f"CREATE TABLE {LOAD_TABLE_NAME} NOLOGGING AS "
+                f"SELECT {_DETECTION_COLUMNS} FROM {TABLE_NAME} WHERE 1 = 0"
+            )
+            print(f"✅ Tabela {LOAD_TABLE_NAME} criada (staging da carga direta)")
+
+
+def _split_by_checkpoint(batch):
+    """Fatias do lote (ordenado por tempo) por intervalo de checkpoint: cada
+    fronteira cruzada vira um checkpoint, como na ingestão ao vivo"""
+    if CHECKPOINT_INTERVAL_MS <= 0 or len(batch["ts_ms"]) == 0:
+        yield batch
+        return
+    windows = batch["ts_ms"] // CHECKPOINT_INTERVAL_MS
+    bounds = np.flatnonzero(np.diff(windows)) + 1
+    for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(windows)]):
+        yield {key: values[start:end] for key, values in batch.items()}
+
+
+def run_fast_forward(
+    num_motos,
+    ticks,
+    tick_ms=1000,
+    seed=42,
+    start_ms=None,
+    chunk_rows=200_000,
+    direct_path=False,
+    output=None,
+    scenario=None,
+    chunked=False,
+):
+    """Carrega histórico sintético no banco (ou em CSV para SQL*Loader).
+
+    Com ``scenario`` (spec carregado por ``load_scenario``) a frota e o
+    movimento vêm do cenário; ``num_motos`` e ``seed`` são ignorados.
+    ``chunked`` grava direto em detections_chunks (formato compactado). No
+    banco, o histórico passa pela banda morta e gera intervalos de status e
+    checkpoints da frota, como a ingestão ao vivo.
+    """
+    if scenario is not None:
+        num_motos = int(scenario["fleet_size"])
+        batches = generate_scenario_batches(
+            scenario, ticks, tick_ms, start_ms, chunk_rows
+        )
+        label = f"cenário '{scenario.get('name', 'cenario')}'"
+    else:
+        batches = generate_synthetic_batches(
+            num_motos, ticks, tick_ms, seed, start_ms, chunk_rows
+        )
+        label = f"seed={seed}"
+    total_rows = num_motos * ticks
+    print(
+        f"⏩ Gerando até {total_rows:,} detecções ({num_motos} motos × {ticks} ticks de {tick_ms} ms, {label})"
+    )
+    if direct_path and output is None and not chunked:
+        _ensure_load_table()
+
+    trackers = history_trackers()
+    started = time.perf_counter()
+    written = 0
+    for batch in batches:
+        if output is None:
+            for part in _split_by_checkpoint(batch):
+                written += save_history_batch(
+                    part, trackers, direct_path=direct_path, chunked=chunked
+                )
+        else:
+            _write_batch_csv(batch, output, header=written == 0)
+            written += len(batch["moto_id"])
+        elapsed = time.perf_counter() - started
+        print(
+            f"   {written:,}/{total_rows:,} linhas · {written / elapsed:,.0f} linhas/s"
+        )
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {written:,} detecções em {elapsed:.1f} s")
+    return {"rows": written, "elapsed_s": elapsed}
+
+
+def _parse_generate_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="script.py generate",
+        description="Gera histórico sintético determinístico (sem sleep/render)",
+    )
+    parser.add_argument("--motos", type=int, default=NUM_MOTOS)
+    parser.add_argument("--days", type=float, default=1.0, help="duração simulada")
+    parser.add_argument("--tick-ms", type=int, default=1000, help="intervalo simulado")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--start",
+        default=None,
+        help="início ISO-8601 (padrão: 2025-01-01T00:00:00, fixo)",
+    )
+    parser.add_argument("--chunk-rows", type=int, default=200_000)
+    parser.add_argument(
+        "--direct-path",
+        action="store_true",
+        help="carga direta (APPEND_VALUES) numa tabela de staging, copiada para detections",
+    )
+    parser.add_argument(
+        "--output", default=None, help="grava CSV em vez do banco (SQL*Loader direct)"
+    )
+    parser.add_argument(
+        "--scenario", default=None, help="arquivo de cenário JSON (frota e rotas)"
+    )
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help="grava direto no formato compactado (detections_chunks)",
+    )
+    return parser.parse_args(argv)
+
+
+def _parse_compact_args(argv):
+    import argparse
 
+    parser = argparse.ArgumentParser(
+        prog="script.py compact",
+        description="Compacta janelas antigas de detections em chunks",
+    )
+    parser.add_argument(
+        "--older-than-s",
+        type=float,
+        default=CHUNK_COMPACT_AFTER_S,
+        help="idade mínima das linhas compactadas",
+    )
+    return parser.parse_args(argv)
 
-def run_simulation():
-    """Executa simulação de rastreamento (modo headless para containers)"""
-    import time
 
-    # Detecta se há display disponível (para modo gráfico vs headless)
-    # Em containers Azure, geralmente não há display disponível
-    has_display = False
-    if os.environ.get("DISPLAY"):
-        try:
-            # Tenta detectar se cv2.imshow() funcionaria
-            test_frame = np.zeros((100, 100, 3), dtype=np.uint8)
-            cv2.namedWindow("test", cv2.WINDOW_NORMAL)
-            cv2.imshow("test", test_frame)
-            cv2.waitKey(1)
-            cv2.destroyWindow("test")
-            has_display = True
-        except Exception:
-            has_display = False
+# ---------------- DASHBOARD ----------------
+def history_histogram(hours=24, bins=(160, 120), chunk_rows=200_000):
+    """Histograma 2D de posições por status das últimas ``hours`` horas.
+
+    Lê o histórico em blocos (``fetchmany``) e acumula com ``np.bincount``,
+    então a memória depende só do número de bins, não de linhas. Cada linha
+    pesa as ``samples`` detecções que representa (banda morta), então motos
+    paradas contam o tempo todo em que ficaram no lugar.
+    Retorna ``(counts[status, by, bx], total_detections)``.
+    """
+    bins_x, bins_y = bins
+    cell_count = bins_x * bins_y
+    counts = np.zeros(len(STATUS_LABELS) * cell_count, dtype=np.int64)
+    status_index = {label: i for i, label in enumerate(STATUS_LABELS.tolist())}
+    unknown = status_index["desconhecido"]
+    since = datetime.utcnow() - timedelta(hours=hours)
+    total = 0
+    with db_lock:
+        cur = db_conn.cursor()
+        cur.arraysize = chunk_rows
+        cur.execute(
+            f"SELECT x, y, status, samples FROM {TABLE_NAME} "
+            "WHERE yard_id = :1 AND timestamp >= :2",
+            [YARD_ID, since],
+        )
 
-    if not has_display:
-        print("Modo headless detectado - simulação rodando sem interface gráfica")
+    def accumulate(xs, ys, codes, samples):
+        bx = np.clip((xs * bins_x // WIDTH), 0, bins_x - 1).astype(np.int64)
+        by = np.clip((ys * bins_y // HEIGHT), 0, bins_y - 1).astype(np.int64)
+        flat = codes.astype(np.int64) * cell_count + by * bins_x + bx
+        counts[:] += np.bincount(flat, weights=samples, minlength=counts.size).astype(
+            np.int64
+        )
+        return int(samples.sum())
 
-    frame_count = 0
     while True:
-        frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        # Solta o lock entre blocos para não travar a ingestão
+        with db_lock:
+            rows = cur.fetchmany(chunk_rows)
+        if not rows:
+            break
+        chunk = pd.DataFrame(rows, columns=["x", "y", "status", "samples"])
+        total += accumulate(
+            chunk["x"].to_numpy(np.float64),
+            chunk["y"].to_numpy(np.float64),
+            chunk["status"].map(status_index).fillna(unknown).to_numpy(np.int64),
+            chunk["samples"].to_numpy(np.int64),
+        )
 
-        # desenha grid
-        for r in range(1, GRID_ROWS):
-            cv2.line(
-                frame,
-                (0, r * QUAD_HEIGHT),
-                (WIDTH, r * QUAD_HEIGHT),
-                (100, 100, 100),
-                1,
+    # Histórico compactado: decodifica só os chunks que alcançam a janela
+    since_ms = int(pd.Timestamp(since).value // 1_000_000)
+    for _, _, payload in _iter_chunks("AND max_ts >= :since", {"since": since}):
+        decoded = decode_chunk(payload)
+        keep = decoded["ts_ms"] >= since_ms
+        total += accumulate(
+            decoded["x"][keep],
+            decoded["y"][keep],
+            decoded["status_code"][keep],
+            decoded["samples"][keep],
+        )
+    return counts.reshape(len(STATUS_LABELS), bins_y, bins_x), total
+
+
+def plot_history(hours=24, bins=(160, 120), output=None):
+    """Mapa de densidade do histórico (heatmap por status) + posições recentes
+    em WebGL; ``output`` grava um HTML standalone que abre offline."""
+    started = time.perf_counter()
+    counts, total = history_histogram(hours, bins)
+    bins_x, bins_y = bins
+    xs_centers = (np.arange(bins_x) + 0.5) * WIDTH / bins_x
+    ys_centers = (np.arange(bins_y) + 0.5) * HEIGHT / bins_y
+
+    layers = [("todos", counts.sum(axis=0))] + [
+        (label, counts[i])
+        for i, label in enumerate(STATUS_LABELS.tolist())
+        if counts[i].any()
+    ]
+    fig = go.Figure()
+    for i, (label, grid) in enumerate(layers):
+        fig.add_trace(
+            go.Heatmap(
+                x=xs_centers,
+                y=ys_centers,
+                z=np.where(grid > 0, grid, np.nan),
+                colorscale="Inferno",
+                name=label,
+                visible=i == 0,
+                hovertemplate="x=%{x:.0f} y=%{y:.0f}<br>detecções=%{z}<extra></extra>",
             )
-        for c in range(1, GRID_COLS):
-            cv2.line(
-                frame, (c * QUAD_WIDTH, 0), (c * QUAD_WIDTH, HEIGHT), (100, 100, 100), 1
+        )
+    recent = detections_dataframe(500)
+    if not recent.empty:
+        recent.columns = recent.columns.str.lower()
+        fig.add_trace(
+            go.Scattergl(
+                x=recent["x"],
+                y=recent["y"],
+                mode="markers",
+                marker={"size": 5, "color": "#00e5ff"},
+                name="posições recentes",
+                text=recent["moto_id"].astype(str),
             )
+        )
+    has_recent = len(fig.data) > len(layers)
+    buttons = [
+        {
+            "label": label,
+            "method": "update",
+            "args": [
+                {
+                    "visible": [j == i for j in range(len(layers))]
+                    + ([True] if has_recent else [])
+                }
+            ],
+        }
+        for i, (label, _) in enumerate(layers)
+    ]
+    fig.update_layout(
+        title=f"Ocupação do pátio - últimas {hours:g} h ({total:,} detecções)",
+        updatemenus=[{"buttons": buttons, "direction": "down", "x": 1.0, "y": 1.15}],
+        xaxis={"range": [0, WIDTH], "title": "x"},
+        yaxis={"range": [HEIGHT, 0], "title": "y", "scaleanchor": "x"},
+        template="plotly_dark",
+    )
+    elapsed = time.perf_counter() - started
+    print(
+        f"📊 {total:,} detecções agregadas em {bins_x}×{bins_y} bins em {elapsed:.1f} s"
+    )
+    if output:
+        fig.write_html(output, include_plotlyjs=True, full_html=True)
+        print(f"✅ Dashboard salvo em {output}")
+    else:
+        fig.show()
+    return fig
 
-        for i in range(NUM_MOTOS):
-            xs[i] += vxs[i]
-            ys[i] += vys[i]
-
-            # Reflete nas bordas
-            if xs[i] <= 10 or xs[i] >= WIDTH - 10:
-                vxs[i] = -vxs[i]
-            if ys[i] <= 10 or ys[i] >= HEIGHT - 10:
-                vys[i] = -vys[i]
-
-            # Desenha moto
-            cv2.circle(frame, (int(xs[i]), int(ys[i])), 10, cores[i], -1)
-
-            # Quadrante e status
-            quad = get_quadrant(xs[i], ys[i])
-            status = get_status_from_quadrant(quad)
-
-            # Mapeia status para cores de texto
-            status_colors = {
-                "em_uso": (0, 255, 0),  # Verde
-                "no_patio": (255, 255, 0),  # Amarelo
-                "manutencao": (0, 165, 255),  # Laranja
-                "reservada": (128, 0, 128),  # Roxo
-                "desconhecido": (255, 255, 255),  # Branco
-            }
-            status_color = status_colors.get(status, (255, 255, 255))
-
-            # Exibe informação na tela (se houver display)
-            if has_display:
-                cv2.putText(
-                    frame,
-                    f"Moto {i+1}: {quad} - {status.upper()}",
-                    (10, 30 + i * 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    status_color,
-                    2,
-                )
-
-            # Salva no banco com status
-            save_detection(i + 1, xs[i], ys[i], quad)
-
-        # Apenas mostra janela se houver display disponível
-        if has_display:
-            cv2.imshow("Rastreamento das Motos - Oracle", frame)
-            key = cv2.waitKey(30) & 0xFF
-            if key == 27:  # ESC para sair
-                break
-        else:
-            # Modo headless: apenas espera um pouco e continua
-            time.sleep(0.03)  # ~30ms equivalente ao waitKey(30)
-            frame_count += 1
-            # Log a cada 100 frames para não poluir logs
-            if frame_count % 100 == 0:
-                print(f"Simulação rodando... {frame_count} frames processados")
-
-    if has_display:
-        cv2.destroyAllWindows()
 
+def plot_dashboard(hours=None, output=None):
+    """Posições recentes (WebGL); com ``hours`` usa o mapa de densidade agregado"""
+    if hours is not None:
+        return plot_history(hours, output=output)
 
-# ---------------- DASHBOARD ----------------
-def plot_dashboard():
     df = detections_dataframe(500)
     if df.empty:
         print("Nenhum dado coletado ainda.")
@@ -627,6 +4356,7 @@ def plot_dashboard():
             symbol="moto_id",
             title="Posições recentes das motos por Status - Oracle",
             labels={"status": "Status", "moto_id": "Moto ID"},
+            render_mode="webgl",
         )
     else:
         fig = px.scatter(
@@ -636,8 +4366,184 @@ def plot_dashboard():
             color="moto_id",
             symbol="quadrant",
             title="Posições recentes das motos - Oracle",
+            render_mode="webgl",
+        )
+    if output:
+        fig.write_html(output, include_plotlyjs=True, full_html=True)
+    else:
+        fig.show()
+
+
+def _parse_plot_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="script.py plot",
+        description="Mapa de densidade do histórico (WebGL, HTML offline)",
+    )
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument(
+        "--bins", default="160x120", help="resolução LARGURAxALTURA do histograma"
+    )
+    parser.add_argument("--output", default=None, help="arquivo HTML standalone")
+    args = parser.parse_args(argv)
+    args.bins = tuple(int(v) for v in args.bins.lower().split("x"))
+    return args
+
+
+# ---------------- SAÚDE ----------------
+class HealthProber:
+    """Verifica os componentes em background e guarda o último resultado.
+
+    ``checks`` mapeia nome -> função que devolve um dict com ``ok``. Os
+    endpoints de health só leem este cache, então respondem na hora mesmo
+    com o db_lock ocupado por inserts e consultas pesadas.
+    """
+
+    def __init__(self, checks, interval_s, stale_s):
+        self.checks = checks
+        self.interval_s = interval_s
+        self.stale_s = stale_s
+        self._lock = threading.Lock()
+        self._results = {}
+        self._checked_at = None  # time.monotonic() da última rodada
+        self._checked_wall = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        results = {}
+        for name, check in self.checks.items():
+            started = time.perf_counter()
+            try:
+                result = check()
+            except Exception as e:
+                result = {"ok": False, "error": str(e)}
+            result["check_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            results[name] = result
+        with self._lock:
+            self._results = results
+            self._checked_at = time.monotonic()
+            self._checked_wall = datetime.utcnow().isoformat()
+        metric_set("health_ready", int(all(r["ok"] for r in results.values())))
+        return results
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval_s)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._loop, name="health-prober", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """(pronto?, detalhes) a partir do último resultado em cache"""
+        with self._lock:
+            results = {name: dict(r) for name, r in self._results.items()}
+            checked_at, checked_wall = self._checked_at, self._checked_wall
+        age = time.monotonic() - checked_at if checked_at is not None else None
+        stale = age is None or age > self.stale_s
+        ready = not stale and all(r["ok"] for r in results.values())
+        return ready, {
+            "checked_at": checked_wall,
+            "age_s": round(age, 3) if age is not None else None,
+            "stale": stale,
+            "prober_alive": bool(self._thread and self._thread.is_alive()),
+            "components": results,
+        }
+
+
+_health_conn = None  # conexão exclusiva do prober
+
+
+def _check_database():
+    """Ping numa conexão própria do prober (não disputa o db_lock)"""
+    global _health_conn
+    started = time.perf_counter()
+    try:
+        if _health_conn is None:
+            _health_conn = oracledb.connect(
+                user=ORACLE_CONFIG["user"],
+                password=ORACLE_CONFIG["password"],
+                dsn=get_dsn(),
+                tcp_connect_timeout=HEALTH_DB_TIMEOUT_MS / 1000,
+            )
+            _health_conn.call_timeout = HEALTH_DB_TIMEOUT_MS
+        _health_conn.ping()
+    except oracledb.Error as e:
+        conn, _health_conn = _health_conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except oracledb.Error:
+                pass
+        (error,) = e.args
+        return {"ok": False, "error": getattr(error, "message", str(error))}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+def _simulation_threads_alive():
+    """Threads da simulação vivas (vazio se a simulação não foi iniciada)"""
+    if not _simulation_started:
+        return {}
+    return {
+        "loop": bool(_simulation_thread and _simulation_thread.is_alive()),
+        "persist": bool(_sim_persist_thread and _sim_persist_thread.is_alive()),
+    }
+
+
+def _check_simulation():
+    """Threads vivas e atraso do relógio de ticks dentro do limite"""
+    threads = _simulation_threads_alive()
+    if not threads:
+        return {"ok": True, "running": False}
+    lag = simulation_scheduler.lag_ms() if simulation_scheduler else None
+    return {
+        "ok": all(threads.values())
+        and lag is not None
+        and lag <= HEALTH_MAX_TICK_LAG_MS,
+        "running": True,
+        "threads": threads,
+        "tick_lag_ms": round(lag, 1) if lag is not None else None,
+        "ticks": simulation_scheduler.counters["ticks"] if simulation_scheduler else 0,
+    }
+
+
+def _check_writer():
+    """Fila de ticks a gravar, último erro de gravação e atraso do spool"""
+    pending = len(_sim_pending)
+    result = {"pending_ticks": pending, "last_error": _sim_last_write_error}
+    ok = pending <= HEALTH_MAX_PENDING_TICKS and _sim_last_write_error is None
+    if spool is not None:
+        stats = spool.stats()
+        result["spool"] = {
+            key: stats[key]
+            for key in ("lag_records", "lag_seconds", "drainer_alive", "last_error")
+        }
+        ok = (
+            ok
+            and stats["drainer_alive"]
+            and stats["lag_seconds"] <= HEALTH_MAX_SPOOL_LAG_S
         )
-    fig.show()
+    result["ok"] = ok
+    return result
+
+
+health_prober = HealthProber(
+    {
+        "database": _check_database,
+        "simulation": _check_simulation,
+        "writer": _check_writer,
+    },
+    HEALTH_CHECK_INTERVAL_S,
+    HEALTH_STALE_S,
+)
 
 
 # ---------------- API BACKEND ----------------
@@ -653,13 +4559,26 @@ def index():
             "name": "Motos IoT Tracking API",
             "version": "1.0",
             "endpoints": {
-                "/latest": "GET - Últimas detecções",
-                "/stats": "GET - Estatísticas gerais",
-                "/moto/<id>": "GET - Dados de uma moto específica",
-                "/status": "GET - Status de todas as motos",
+                "/latest": "GET - Últimas detecções (?limit=&before=<cursor>)",
+                "/stats": "GET - Estatísticas gerais (?hours=N)",
+                "/moto/<id>": "GET - Dados de uma moto específica (?limit=&before=<cursor>)",
+                "/moto/<id>/timeline": "GET - Intervalos de status da moto",
+                "/dwell?hours=24": "GET - Dwell time e transições da frota",
+                "/status": "GET - Status de todas as motos (?since=<seq> para delta)",
                 "/status/<id>": "GET - Status de uma moto específica",
                 "/alerts": "GET - Alertas em tempo real",
+                "/ingest": "POST - Ingestão em lote (NDJSON ou JSON colunar)",
+                "/snapshot": "GET - Status + KPIs em um payload compacto (dashboard); ?at=<ISO|epoch> = frota naquele instante",
+                "/heatmap?window=5m|1h|24h": "GET - Ocupação por célula",
+                "/telemetry/stats": "GET - Contadores do listener UDP/TCP",
+                "/spool/stats": "GET - Tamanho e atraso do spool em disco",
+                "/geofences": "GET - Geofences, ocupação e entradas/saídas",
+                "/metrics": "GET - Métricas internas",
                 "/health": "GET - Health check",
+                "/health/live": "GET - Liveness (threads da simulação)",
+                "/health/ready": "GET - Readiness (banco, simulação e gravação, em cache)",
+                "/yards": "GET - Pátios conhecidos e o nó que atende cada um",
+                "/yards/<yard>/<rota>": "GET - Rota acima no pátio indicado (roteada ao nó dono)",
             },
         }
     )
@@ -667,39 +4586,81 @@ def index():
 
 @app.route("/health")
 def health():
-    """Health check do sistema"""
-    try:
-        with db_lock:
-            cur = db_conn.cursor()
-            cur.execute("SELECT 1 FROM DUAL")
-            db_status = "connected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
+    """Health check do sistema (resultado em cache do prober, sem tocar no banco)"""
+    ready, details = health_prober.snapshot()
+    database = details["components"].get("database")
+    if database is None:
+        db_status = "unknown"
+    elif database["ok"]:
+        db_status = "connected"
+    else:
+        db_status = f"error: {database.get('error')}"
 
     return jsonify(
         {
-            "status": "healthy" if db_status == "connected" else "degraded",
+            "status": "healthy" if ready else "degraded",
             "database": db_status,
             "timestamp": datetime.utcnow().isoformat(),
+            **details,
         }
     )
 
 
+@app.route("/health/live")
+def health_live():
+    """Liveness: o processo responde e as threads da simulação estão vivas"""
+    threads = _simulation_threads_alive()
+    alive = all(threads.values())
+    return (
+        jsonify({"status": "alive" if alive else "dead", "threads": threads}),
+        200 if alive else 503,
+    )
+
+
+@app.route("/health/ready")
+def health_ready():
+    """Readiness: último resultado do prober (banco, simulação, gravação)"""
+    ready, details = health_prober.snapshot()
+    return (
+        jsonify({"status": "ready" if ready else "not_ready", **details}),
+        200 if ready else 503,
+    )
+
+
+def _page_args(default_limit):
+    """Lê ?limit= e ?before= (cursor); levanta ValueError se o cursor for inválido"""
+    limit = request.args.get("limit", default=default_limit, type=int)
+    limit = min(max(limit, 1), PAGE_MAX_LIMIT)  # Limite máximo
+    cursor = request.args.get("before")
+    return limit, decode_cursor(cursor) if cursor else None
+
+
 @app.route("/latest")
 def latest():
-    """Últimas detecções"""
-    limit = request.args.get("limit", default=50, type=int)
-    if limit > 500:
-        limit = 500  # Limite máximo
-    df = detections_dataframe(limit)
-    return jsonify(df.to_dict(orient="records"))
+    """Últimas detecções (próxima página via ?before=<X-Next-Cursor>)"""
+    try:
+        limit, before = _page_args(50)
+    except ValueError:
+        return jsonify({"error": "Cursor inválido"}), 400
+    df = detections_dataframe(limit, before)
+    response = jsonify(df.to_dict(orient="records"))
+    cursor = next_cursor(df, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+        response.headers["Link"] = (
+            f'<{request.path}?limit={limit}&before={cursor}>; rel="next"'
+        )
+    return response
 
 
 @app.route("/stats")
 def stats():
     """Estatísticas gerais do sistema"""
+    hours = request.args.get("hours", type=float)
+    if hours is not None and hours <= 0:
+        return jsonify({"error": "hours deve ser positivo"}), 400
     try:
-        stats_data = get_stats()
+        stats_data = get_stats(hours)
         return jsonify(stats_data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -711,35 +4672,89 @@ def moto(moto_id):
     if moto_id < 1 or moto_id > NUM_MOTOS:
         return jsonify({"error": f"Moto ID deve estar entre 1 e {NUM_MOTOS}"}), 400
 
-    limit = request.args.get("limit", default=100, type=int)
-    if limit > 1000:
-        limit = 1000  # Limite máximo
+    try:
+        limit, before = _page_args(100)
+    except ValueError:
+        return jsonify({"error": "Cursor inválido"}), 400
 
     try:
-        df = get_moto_data(moto_id, limit)
+        df = get_moto_data(moto_id, limit, before)
         if df.empty:
             return jsonify(
-                {"moto_id": moto_id, "message": "Nenhum dado encontrado", "data": []}
+                {
+                    "moto_id": moto_id,
+                    "message": "Nenhum dado encontrado",
+                    "data": [],
+                    "next_cursor": None,
+                }
             )
         return jsonify(
             {
                 "moto_id": moto_id,
                 "total_records": len(df),
                 "data": df.to_dict(orient="records"),
+                "next_cursor": next_cursor(df, limit),
             }
         )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/moto/<int:moto_id>/timeline")
+def moto_timeline(moto_id):
+    """Intervalos de status (entrada/saída) de uma moto"""
+    if moto_id < 1 or moto_id > NUM_MOTOS:
+        return jsonify({"error": f"Moto ID deve estar entre 1 e {NUM_MOTOS}"}), 400
+
+    limit = request.args.get("limit", default=100, type=int)
+    if limit > 1000:
+        limit = 1000  # Limite máximo
+
+    try:
+        return jsonify(get_moto_timeline(moto_id, limit))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/dwell")
+def dwell():
+    """Distribuição de dwell time por status e transições da frota"""
+    hours = request.args.get("hours", default=24, type=float)
+    try:
+        return jsonify(get_dwell_distribution(hours))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/status")
 def status_all():
-    """Status de todas as motos"""
+    """Status de todas as motos (ou só as alteradas com ?since=<seq>).
+
+    Vem do estado da frota em memória, que com o spool fica à frente do
+    banco; o banco só é lido quando a memória está vazia (restart, nó só de
+    /ingest). Assim o ``seq`` devolvido sempre descreve as motos da resposta.
+    """
+    since = request.args.get("since", type=int)
+    if since is not None or fleet_state.size():
+        delta = fleet_state.changes_since(since or 0, _now_ms())
+        payload = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "seq": delta["seq"],
+            "total_motos": fleet_state.size(),
+            "motos": delta["motos"],
+        }
+        if since is not None:
+            payload.update(since=since, full=delta["full"], changed=len(delta["motos"]))
+        return jsonify(payload)
+
     try:
+        # Lido antes da consulta: mudanças concorrentes aparecem no próximo since
+        seq = fleet_state.seq
         statuses = get_all_motos_status()
         return jsonify(
             {
                 "timestamp": datetime.utcnow().isoformat(),
+                "seq": seq,
                 "total_motos": len(statuses),
                 "motos": statuses,
             }
@@ -768,6 +4783,7 @@ def alerts():
         alerts_data = get_alerts()
         return jsonify(
             {
+                "yard": YARD_ID,
                 "timestamp": datetime.utcnow().isoformat(),
                 "total_alerts": len(alerts_data),
                 "alerts": alerts_data,
@@ -777,6 +4793,170 @@ def alerts():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/ingest", methods=["POST"])
+def ingest():
+    """Ingestão em lote de telemetria (NDJSON ou JSON colunar)"""
+    started = time.perf_counter()
+    try:
+        df, fmt = _parse_ingest_body(
+            request.get_data(cache=False), request.content_type or ""
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Corpo inválido: {e}"}), 400
+
+    if len(df) > INGEST_MAX_BATCH:
+        return (
+            jsonify({"error": f"Lote excede o máximo de {INGEST_MAX_BATCH} detecções"}),
+            413,
+        )
+
+    try:
+        (moto_ids, xs, ys, ts_ms), rejections = validate_ingest_frame(df)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        ingest_batch(moto_ids, xs, ys, ts_ms)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    elapsed = time.perf_counter() - started
+    return jsonify(
+        {
+            "format": fmt,
+            "received": int(len(df)),
+            "accepted": int(len(moto_ids)),
+            "rejected": int(len(df) - len(moto_ids)),
+            "rejections": rejections,
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "detections_per_second": int(len(df) / elapsed) if elapsed > 0 else None,
+        }
+    )
+
+
+@app.route("/snapshot")
+def snapshot():
+    """Status + KPIs + timestamp do servidor em uma única resposta (dashboard).
+
+    ``?at=<ISO-8601 ou epoch>`` devolve onde cada moto estava naquele instante.
+    """
+    at = request.args.get("at")
+    try:
+        if at is not None:
+            at_ms = int(_parse_timestamps_ms(pd.Series([at]), _now_ms())[0])
+            if at_ms < 0:
+                return jsonify({"error": "at deve ser ISO-8601 ou epoch"}), 400
+            return app.response_class(
+                build_snapshot_at(at_ms), mimetype="application/json"
+            )
+        return app.response_class(build_snapshot(), mimetype="application/json")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/heatmap")
+def heatmap():
+    """Ocupação por célula nas janelas 5m, 1h ou 24h"""
+    window = request.args.get("window", default="5m")
+    if window not in HEATMAP_WINDOWS:
+        return (
+            jsonify({"error": f"window deve ser um de: {', '.join(HEATMAP_WINDOWS)}"}),
+            400,
+        )
+    return jsonify(occupancy_heatmap.snapshot(window, _now_ms()))
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Contadores e tempos internos (detectores, ingestão, etc.)"""
+    return jsonify(
+        {
+            **metrics_snapshot(),
+            "moto_cache": moto_cache.stats(),
+            "moto_history": moto_history.stats(),
+            "simulation": (
+                simulation_scheduler.stats() if simulation_scheduler else None
+            ),
+            "scenario": scenario_engine.stats() if scenario_engine else None,
+            "fleet_checkpoints": fleet_checkpoints.stats(),
+            "trajectory_anomalies": trajectory_anomalies.stats(),
+        }
+    )
+
+
+@app.route("/telemetry/stats")
+def telemetry_stats():
+    """Contadores do listener UDP/TCP de telemetria"""
+    if _telemetry_listener is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **_telemetry_listener.stats()})
+
+
+@app.route("/spool/stats")
+def spool_stats():
+    """Tamanho, atraso de drenagem e checkpoint do spool em disco"""
+    if spool is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **spool.stats()})
+
+
+@app.route("/geofences")
+def geofences():
+    """Polígonos das geofences com ocupação atual e contagem de entradas/saídas"""
+    stats = geofence_tracker.stats()
+    return jsonify(
+        {
+            "geofences": [
+                {
+                    "name": fence["name"],
+                    "polygon": fence["polygon"],
+                    **stats[fence["name"]],
+                }
+                for fence in GEOFENCES
+            ]
+        }
+    )
+
+
+@app.route("/yards")
+def yards():
+    """Pátios do mapa e o nó que atende cada um"""
+    return jsonify(
+        {
+            "local": YARD_ID,
+            "yards": {
+                yard: {
+                    "url": config.get("url"),
+                    "local": yard == YARD_ID,
+                }
+                for yard, config in YARD_MAP.items()
+            },
+        }
+    )
+
+
+@app.route("/yards/<yard>/<path:subpath>", methods=["GET", "POST"])
+def yard_route(yard, subpath):
+    """Roteia ``/yards/<pátio>/<rota>``: atende localmente ou redireciona ao dono"""
+    if yard == YARD_ID:
+        adapter = app.url_map.bind_to_environ(request.environ)
+        try:
+            endpoint, args = adapter.match("/" + subpath, method=request.method)
+        except Exception:
+            return jsonify({"error": f"Rota não encontrada: /{subpath}"}), 404
+        if endpoint == "yard_route":
+            return jsonify({"error": "Rota de pátio aninhada"}), 400
+        return app.view_functions[endpoint](**args)
+
+    url = YARD_MAP.get(yard, {}).get("url")
+    if not url:
+        return jsonify({"error": f"Pátio desconhecido: {yard}"}), 404
+    # 307 preserva método e corpo (POST /ingest chega ao nó dono do pátio)
+    query = request.query_string.decode()
+    target = f"{url.rstrip('/')}/yards/{yard}/{subpath}"
+    return redirect(f"{target}?{query}" if query else target, code=307)
+
+
 @app.route("/dashboard")
 def dashboard():
     """Dashboard web desenhado no navegador (funciona no App Service)."""
@@ -804,6 +4984,8 @@ def dashboard():
     .kpi-item .label { color: #9fb0d6; font-size: 11px; }
     .kpi-item .value { font-size: 18px; font-weight: 600; margin-top: 4px; }
     a { color: #8ab4ff; text-decoration: none; }
+    #heat-controls button { background: #0b1326; color: #e6e9f0; border: 1px solid #223055; border-radius: 6px; padding: 2px 8px; cursor: pointer; }
+    #heat-controls button.active { border-color: #8ab4ff; color: #8ab4ff; }
   </style>
 </head>
 <body>
@@ -828,6 +5010,18 @@ def dashboard():
         <span><span class="dot" style="background:#ff8c42"></span>manutencao</span>
         <span><span class="dot" style="background:#a78bfa"></span>reservada</span>
       </div>
+      <div class="legend" id="heat-controls">
+        <span>Heatmap de ocupação:</span>
+        <button data-window="">off</button>
+        <button data-window="5m">5 min</button>
+        <button data-window="1h">1 h</button>
+        <button data-window="24h">24 h</button>
+      </div>
+      <div class="legend" id="scrub-controls">
+        <span>Linha do tempo (24 h):</span>
+        <input type="range" id="scrub" min="-86400" max="0" step="60" value="0" style="flex:1" />
+        <span id="scrub-label">ao vivo</span>
+      </div>
     </div>
 
     <div class="card">
@@ -849,7 +5043,7 @@ def dashboard():
           <div class="value" id="kpi-status">-</div>
         </div>
       </div>
-      <div style="margin-top:10px;color:#9fb0d6;font-size:12px">Atualiza a cada ~500 ms. Dados via <code>/status</code> e <code>/stats</code>.</div>
+      <div style="margin-top:10px;color:#9fb0d6;font-size:12px">Um <code>/snapshot</code> por segundo; o movimento é interpolado no navegador.</div>
     </div>
   </div>
 
@@ -858,72 +5052,156 @@ def dashboard():
     const QUAD_W = Math.floor(WIDTH / COLS), QUAD_H = Math.floor(HEIGHT / ROWS);
     const motoColors = ["#ff5555", "#22cc88", "#4aa3ff", "#00e5e5"]; // 1..4
     const statusColors = { em_uso: "#22cc88", no_patio: "#ffd166", manutencao: "#ff8c42", reservada: "#a78bfa", desconhecido: "#e6e9f0" };
+    const POLL_MS = 1000;          // um /snapshot por segundo
+    const RENDER_DELAY_MS = 1100;  // renderiza ~1 snapshot atrás para sempre ter dois pontos
 
     const canvas = document.getElementById('board');
     const ctx = canvas.getContext('2d');
+    // Grid + heatmap ficam em um canvas offscreen, redesenhado só quando o heatmap muda
+    const background = document.createElement('canvas');
+    background.width = WIDTH; background.height = HEIGHT;
+    const bg = background.getContext('2d');
+    let heatWindow = '', heat = null;
+    let snapshots = [];   // últimos snapshots recebidos (ordem de chegada)
+    let clockOffset = null; // relógio do cliente - relógio do servidor (ms)
+    let historic = null;    // snapshot de /snapshot?at= (null = ao vivo)
+    let loadError = false;
+
+    function drawHeat() {
+      if (!heat || !heat.max_occupancy) return;
+      for (let r=0; r<heat.rows; r++) {
+        for (let c=0; c<heat.cols; c++) {
+          const v = heat.occupancy[r][c] / heat.max_occupancy;
+          if (v <= 0) continue;
+          bg.fillStyle = `rgba(255, 85, 85, ${(0.08 + 0.5 * v).toFixed(3)})`;
+          bg.fillRect(c*heat.cell_width, r*heat.cell_height, heat.cell_width, heat.cell_height);
+        }
+      }
+    }
 
-    function drawGrid() {
-      ctx.clearRect(0,0,WIDTH,HEIGHT);
-      ctx.fillStyle = "#0a0f1f"; ctx.fillRect(0,0,WIDTH,HEIGHT);
-      ctx.strokeStyle = "#2a3350"; ctx.lineWidth = 1;
-      for (let r=1; r<ROWS; r++) { ctx.beginPath(); ctx.moveTo(0, r*QUAD_H); ctx.lineTo(WIDTH, r*QUAD_H); ctx.stroke(); }
-      for (let c=1; c<COLS; c++) { ctx.beginPath(); ctx.moveTo(c*QUAD_W, 0); ctx.lineTo(c*QUAD_W, HEIGHT); ctx.stroke(); }
+    function drawBackground() {
+      bg.fillStyle = "#0a0f1f"; bg.fillRect(0,0,WIDTH,HEIGHT);
+      drawHeat();
+      bg.strokeStyle = "#2a3350"; bg.lineWidth = 1;
+      for (let r=1; r<ROWS; r++) { bg.beginPath(); bg.moveTo(0, r*QUAD_H); bg.lineTo(WIDTH, r*QUAD_H); bg.stroke(); }
+      for (let c=1; c<COLS; c++) { bg.beginPath(); bg.moveTo(c*QUAD_W, 0); bg.lineTo(c*QUAD_W, HEIGHT); bg.stroke(); }
       // labels A1..E5
-      ctx.fillStyle = "#7085b6"; ctx.font = "12px system-ui";
+      bg.fillStyle = "#7085b6"; bg.font = "12px system-ui";
       for (let r=0; r<ROWS; r++) {
         for (let c=0; c<COLS; c++) {
           const label = String.fromCharCode(65 + r) + (c+1);
-          ctx.fillText(label, c*QUAD_W + 6, r*QUAD_H + 16);
+          bg.fillText(label, c*QUAD_W + 6, r*QUAD_H + 16);
         }
       }
     }
 
-    function drawMotos(motos) {
-      motos.forEach((m, idx) => {
-        const x = (m.position && m.position.x != null) ? m.position.x : 0;
-        const y = (m.position && m.position.y != null) ? m.position.y : 0;
-        const status = m.status || 'desconhecido';
-        // trail shadow
-        ctx.beginPath(); ctx.arc(x, y, 16, 0, Math.PI*2); ctx.fillStyle = "rgba(255,255,255,0.05)"; ctx.fill();
-        // main dot
-        ctx.beginPath(); ctx.arc(x, y, 10, 0, Math.PI*2); ctx.fillStyle = motoColors[(m.moto_id-1)%motoColors.length]; ctx.fill();
-        // status ring
-        ctx.beginPath(); ctx.arc(x, y, 12, 0, Math.PI*2); ctx.strokeStyle = statusColors[status] || "#e6e9f0"; ctx.lineWidth = 3; ctx.stroke();
-        // label
-        ctx.fillStyle = "#e6e9f0"; ctx.font = "12px system-ui";
-        ctx.fillText(`Moto ${m.moto_id} · ${status}`, x + 14, y - 12);
+    async function refreshHeat() {
+      if (!heatWindow) { heat = null; drawBackground(); return; }
+      try {
+        const res = await fetch(`/heatmap?window=${heatWindow}`, { cache: 'no-store' });
+        heat = await res.json();
+      } catch (e) { heat = null; }
+      drawBackground();
+    }
+
+    document.querySelectorAll('#heat-controls button').forEach(btn => {
+      btn.classList.toggle('active', btn.dataset.window === heatWindow);
+      btn.addEventListener('click', () => {
+        heatWindow = btn.dataset.window;
+        document.querySelectorAll('#heat-controls button').forEach(b => b.classList.toggle('active', b === btn));
+        refreshHeat();
       });
+    });
+
+    function drawMoto(id, x, y, status) {
+      // trail shadow
+      ctx.beginPath(); ctx.arc(x, y, 16, 0, Math.PI*2); ctx.fillStyle = "rgba(255,255,255,0.05)"; ctx.fill();
+      // main dot
+      ctx.beginPath(); ctx.arc(x, y, 10, 0, Math.PI*2); ctx.fillStyle = motoColors[(id-1)%motoColors.length]; ctx.fill();
+      // status ring
+      ctx.beginPath(); ctx.arc(x, y, 12, 0, Math.PI*2); ctx.strokeStyle = statusColors[status] || "#e6e9f0"; ctx.lineWidth = 3; ctx.stroke();
+      // label
+      ctx.fillStyle = "#e6e9f0"; ctx.font = "12px system-ui";
+      ctx.fillText(`Moto ${id} · ${status}`, x + 14, y - 12);
     }
 
-    async function refresh() {
-      try {
-        const [statusRes, statsRes] = await Promise.all([
-          fetch('/status', { cache: 'no-store' }),
-          fetch('/stats', { cache: 'no-store' })
-        ]);
-        const statusJson = await statusRes.json();
-        const statsJson = await statsRes.json();
-
-        drawGrid();
-        if (statusJson && Array.isArray(statusJson.motos)) {
-          drawMotos(statusJson.motos);
-          const ordered = statusJson.motos.sort((a,b)=>a.moto_id-b.moto_id).map(m=>m.status || '—');
-          document.getElementById('kpi-status').textContent = ordered.join(' | ');
+    // Posições interpoladas entre os dois snapshots que cercam o instante renderizado
+    function render() {
+      ctx.drawImage(background, 0, 0);
+      if (historic) {
+        for (const m of historic.motos) drawMoto(m[0], m[1], m[2], historic.statuses[m[3]]);
+      } else if (snapshots.length && clockOffset !== null) {
+        const t = Date.now() - clockOffset - RENDER_DELAY_MS;
+        let a = snapshots[0], b = snapshots[snapshots.length - 1];
+        for (let i = 0; i < snapshots.length - 1; i++) {
+          if (snapshots[i].t <= t && t <= snapshots[i+1].t) { a = snapshots[i]; b = snapshots[i+1]; break; }
         }
-
-        document.getElementById('kpi-total').textContent = (statsJson.total_detections ?? 0).toString();
-        document.getElementById('kpi-uniq').textContent = (statsJson.unique_motos ?? 0).toString();
-        document.getElementById('kpi-last').textContent = statsJson.last_detection ? new Date(statsJson.last_detection).toLocaleTimeString() : '—';
-      } catch (e) {
-        // simple error indicator
+        const span = b.t - a.t;
+        const k = span > 0 ? Math.min(1, Math.max(0, (t - a.t) / span)) : 1;
+        const prev = new Map(a.motos.map(m => [m[0], m]));
+        for (const m of b.motos) {
+          const p = prev.get(m[0]) || m;
+          drawMoto(m[0], p[1] + (m[1] - p[1]) * k, p[2] + (m[2] - p[2]) * k, b.statuses[k < 0.5 ? p[3] : m[3]]);
+        }
+      }
+      if (loadError) {
         ctx.fillStyle = "#ff5555"; ctx.font = "14px system-ui";
         ctx.fillText("Erro ao carregar dados", 10, HEIGHT - 10);
       }
+      requestAnimationFrame(render);
+    }
+
+    async function poll() {
+      try {
+        const res = await fetch('/snapshot', { cache: 'no-store' });
+        const snap = await res.json();
+        const offset = Date.now() - snap.t;
+        // Menor offset observado ~ menor latência de rede
+        clockOffset = clockOffset === null ? offset : Math.min(clockOffset, offset);
+        const last = snapshots[snapshots.length - 1];
+        if (!last || snap.t > last.t) snapshots.push(snap);
+        if (snapshots.length > 4) snapshots.shift();
+
+        const ordered = [...snap.motos].sort((a,b)=>a[0]-b[0]).map(m=>snap.statuses[m[3]] || '—');
+        document.getElementById('kpi-status').textContent = ordered.join(' | ');
+        document.getElementById('kpi-total').textContent = (snap.kpi.total_detections ?? 0).toString();
+        document.getElementById('kpi-uniq').textContent = (snap.kpi.unique_motos ?? 0).toString();
+        document.getElementById('kpi-last').textContent = snap.kpi.last_detection ? new Date(snap.kpi.last_detection).toLocaleTimeString() : '—';
+        loadError = false;
+      } catch (e) {
+        loadError = true;
+      }
     }
 
-    drawGrid();
-    refresh();
-    setInterval(refresh, 600); // ~600ms
+    // Linha do tempo: posição da frota no instante escolhido (checkpoints no servidor)
+    const scrub = document.getElementById('scrub');
+    const scrubLabel = document.getElementById('scrub-label');
+    let scrubTimer = null;
+    async function loadHistoric() {
+      const offsetS = Number(scrub.value);
+      if (offsetS === 0 || clockOffset === null) { historic = null; scrubLabel.textContent = 'ao vivo'; return; }
+      const at = Math.round(Date.now() - clockOffset + offsetS * 1000);
+      try {
+        const res = await fetch(`/snapshot?at=${at}`, { cache: 'no-store' });
+        const snap = await res.json();
+        if (Number(scrub.value) !== offsetS) return; // já mudou de posição
+        historic = snap;
+        scrubLabel.textContent = new Date(at).toLocaleString() + (snap.complete ? '' : ' (sem checkpoint)');
+        loadError = false;
+      } catch (e) {
+        loadError = true;
+      }
+    }
+    scrub.addEventListener('input', () => {
+      clearTimeout(scrubTimer);
+      scrubTimer = setTimeout(loadHistoric, 150);
+    });
+
+    drawBackground();
+    poll();
+    setInterval(poll, POLL_MS);
+    setInterval(refreshHeat, 5000); // heatmap muda devagar
+    requestAnimationFrame(render);
   </script>
 </body>
 </html>
@@ -962,12 +5240,25 @@ def run_api():
     print("📡 Endpoints disponíveis:")
     print(f"   GET http://localhost:{port}/")
     print(f"   GET http://localhost:{port}/health")
+    print(f"   GET http://localhost:{port}/health/live")
+    print(f"   GET http://localhost:{port}/health/ready")
     print(f"   GET http://localhost:{port}/latest")
     print(f"   GET http://localhost:{port}/stats")
     print(f"   GET http://localhost:{port}/moto/<id>")
+    print(f"   GET http://localhost:{port}/moto/<id>/timeline")
+    print(f"   GET http://localhost:{port}/dwell")
     print(f"   GET http://localhost:{port}/status")
     print(f"   GET http://localhost:{port}/status/<id>")
     print(f"   GET http://localhost:{port}/alerts")
+    print(f"   POST http://localhost:{port}/ingest")
+    print(f"   GET http://localhost:{port}/snapshot")
+    print(f"   GET http://localhost:{port}/heatmap?window=5m")
+    print(f"   GET http://localhost:{port}/telemetry/stats")
+    print(f"   GET http://localhost:{port}/spool/stats")
+    print(f"   GET http://localhost:{port}/geofences")
+    print(f"   GET http://localhost:{port}/metrics")
+    print(f"   GET http://localhost:{port}/yards")
+    print(f"   GET http://localhost:{port}/yards/{YARD_ID}/stats")
     app.run(host="0.0.0.0", port=port, debug=False, use_reloader=False)
 
 
@@ -991,12 +5282,135 @@ def _start_simulation_background():
     print("✅ Simulação iniciada em thread daemon")
 
 
-# Inicia automaticamente quando o módulo é importado
-_start_simulation_background()
+_telemetry_listener = None
+
+
+def _start_spool():
+    """Abre o spool em disco e inicia a thread de drenagem para o Oracle"""
+    global spool
+    if spool is not None or not SPOOL_ENABLED:
+        return
+
+    spool = Spool(
+        SPOOL_DIR,
+        _drain_spool_batch,
+        load_checkpoint=load_spool_checkpoint,
+        segment_records=SPOOL_SEGMENT_RECORDS,
+        drain_batch=SPOOL_DRAIN_BATCH,
+        on_dead_letter=lambda records, error: metric_inc(
+            "spool_dead_letter_rows", len(records)
+        ),
+    )
+    spool.start()
+    print(
+        f"💾 Spool em {spool.directory} (pendentes do último run: "
+        f"{spool.counters['replayed_on_start']})"
+    )
+
+
+def _start_chunk_compactor():
+    """Inicia a compactação periódica de detections em chunks"""
+    if CHUNK_COMPACT_INTERVAL_S <= 0:
+        return
+    threading.Thread(
+        target=_run_chunk_compactor, name="chunk-compactor", daemon=True
+    ).start()
+    print(
+        f"🗜️  Compactação de detections com mais de {CHUNK_COMPACT_AFTER_S:g} s "
+        f"a cada {CHUNK_COMPACT_INTERVAL_S:g} s"
+    )
+
+
+def _start_telemetry_listener():
+    """Inicia o listener UDP/TCP de telemetria ao lado da API Flask"""
+    global _telemetry_listener
+    if _telemetry_listener is not None or not TELEMETRY_LISTENER:
+        return
+
+    _telemetry_listener = TelemetryListener(
+        ingest_arrays,
+        udp_port=TELEMETRY_UDP_PORT,
+        tcp_port=TELEMETRY_TCP_PORT,
+        tick_ms=TELEMETRY_TICK_MS,
+        max_buffer=TELEMETRY_MAX_BUFFER,
+        udp_policy=TELEMETRY_UDP_POLICY,
+        tcp_policy=TELEMETRY_TCP_POLICY,
+    )
+    _telemetry_listener.start_in_thread()
+    print(
+        f"📡 Listener de telemetria em UDP {TELEMETRY_UDP_PORT} / TCP {TELEMETRY_TCP_PORT}"
+    )
+
+
+def _seed_fleet_state():
+    """Carrega a última posição de cada moto do banco (checkpoint + delta), para
+    /status não começar vazio após um restart nem num worker sem tráfego"""
+    try:
+        records, _, _ = fleet_as_of()
+    except Exception as e:
+        print(f"⚠️  Estado da frota não carregado do banco: {e}")
+        return
+    fleet_state.apply(
+        records["moto_id"].astype(np.int64),
+        records["x"].astype(np.float64),
+        records["y"].astype(np.float64),
+        records["quad"],
+        records["status"],
+        records["ts"],
+    )
+    print(f"🛰️  Estado da frota carregado do banco: {len(records)} motos")
+
+
+# Inicia automaticamente quando o módulo é importado. Subcomandos de CLI
+# (ex.: `python script.py generate`) são execuções em lote e não sobem nada.
+_CLI_COMMAND = sys.argv[1] if __name__ == "__main__" and len(sys.argv) > 1 else None
+if _CLI_COMMAND is None and AUTOSTART:
+    _seed_fleet_state()
+    _start_spool()
+    _start_simulation_background()
+    _start_telemetry_listener()
+    _start_chunk_compactor()
+    health_prober.start()
 
 
 # ---------------- MAIN ----------------
-if __name__ == "__main__":
+if __name__ == "__main__" and _CLI_COMMAND == "generate":
+    args = _parse_generate_args(sys.argv[2:])
+    run_fast_forward(
+        args.motos,
+        int(args.days * 86_400_000 // args.tick_ms),
+        tick_ms=args.tick_ms,
+        seed=args.seed,
+        start_ms=(
+            int(pd.Timestamp(args.start).value // 1_000_000) if args.start else None
+        ),
+        chunk_rows=args.chunk_rows,
+        direct_path=args.direct_path,
+        output=args.output,
+        scenario=load_scenario(args.scenario) if args.scenario else None,
+        chunked=args.chunked,
+    )
+elif __name__ == "__main__" and _CLI_COMMAND == "rebuild-summary":
+    rebuild_hourly_summary()
+elif __name__ == "__main__" and _CLI_COMMAND == "compact":
+    args = _parse_compact_args(sys.argv[2:])
+    started = time.perf_counter()
+    windows, rows, skipped = compact_detections(args.older_than_s)
+    print(
+        f"✅ {rows:,} detecções compactadas em {windows} janelas "
+        f"({time.perf_counter() - started:.1f} s)"
+    )
+    if skipped:
+        print(f"⚠️  {skipped} janelas presas por outro compactador, puladas")
+elif __name__ == "__main__" and _CLI_COMMAND == "plot":
+    args = _parse_plot_args(sys.argv[2:])
+    plot_history(args.hours, args.bins, args.output)
+elif __name__ == "__main__" and _CLI_COMMAND is not None:
+    print(
+        f"❌ Comando desconhecido: {_CLI_COMMAND} (disponível: generate, rebuild-summary, compact, plot)"
+    )
+    sys.exit(2)
+elif __name__ == "__main__":
     print("=" * 60)
     print("🏍️  SISTEMA DE RASTREAMENTO DE MOTOS - MOTTU")
     print("=" * 60)
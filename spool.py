@@ -0,0 +1,443 @@
+"""
+Spool local (append-only) para a ingestão sobreviver a quedas do Oracle.
+
+As detecções são gravadas primeiro em segmentos binários pré-alocados e
+mapeados em memória (mmap), com registros de tamanho fixo numerados por uma
+sequência monotônica. Uma thread drena os registros pendentes para o banco;
+o ``sink`` grava o lote e o checkpoint (último seq drenado) na mesma
+transação, então um replay após reconexão ou restart não duplica dados.
+Registros que o banco recusa por causa dos dados vão para um arquivo de
+dead letter (NDJSON) em vez de travar a drenagem.
+"""
+
+import fcntl
+import json
+import mmap
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("seq", "<u8"),
+        ("moto_id", "<i8"),
+        ("ts_ms", "<i8"),
+        ("x", "<f8"),
+        ("y", "<f8"),
+        ("check", "<u4"),
+        ("append_s", "<u4"),  # relógio de parede do append (0 em segmentos antigos)
+    ]
+)
+SEGMENT_PREFIX = "seg-"
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "checkpoint"
+SPOOL_ID_FILE = "SPOOL_ID"
+LOCK_FILE = "LOCK"
+DEAD_LETTER_FILE = "dead_letter.ndjson"
+
+
+class RejectedBatch(Exception):
+    """Levantada pelo sink quando o lote falha pelos dados, não pela conexão"""
+
+
+def _checksum(records):
+    """Hash barato por registro para detectar escrita parcial (crash no meio)"""
+    h = records["seq"] * np.uint64(0x9E3779B97F4A7C15)
+    h ^= records["moto_id"].view(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+    h ^= records["ts_ms"].view(np.uint64)
+    h ^= records["x"].view(np.uint64) * np.uint64(0x165667B19E3779F9)
+    h ^= records["y"].view(np.uint64)
+    # append_s = 0 (segmentos antigos) não altera o hash
+    h ^= records["append_s"].astype(np.uint64) * np.uint64(0x27D4EB2F165667C5)
+    return ((h ^ (h >> np.uint64(32))) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+class _Segment:
+    """Arquivo pré-alocado com capacidade fixa de registros, mapeado em memória"""
+
+    def __init__(self, path, first_seq, capacity, create):
+        self.path = path
+        self.first_seq = first_seq
+        self.capacity = capacity
+        size = capacity * RECORD_DTYPE.itemsize
+        with open(path, "r+b" if not create else "w+b") as f:
+            if create:
+                f.truncate(size)
+            self._mm = mmap.mmap(f.fileno(), size)
+        self.records = np.frombuffer(self._mm, dtype=RECORD_DTYPE)
+        self.count = 0 if create else self._recover()
+
+    def _recover(self):
+        """Quantidade de registros válidos e contíguos desde o início do segmento"""
+        expected = self.first_seq + np.arange(self.capacity, dtype=np.uint64)
+        valid = (self.records["seq"] == expected) & (
+            self.records["check"] == _checksum(self.records)
+        )
+        return self.capacity if valid.all() else int(np.argmin(valid))
+
+    @property
+    def last_seq(self):
+        return self.first_seq + self.count - 1
+
+    def write(self, records):
+        start = self.count
+        self.records[start : start + len(records)] = records
+        self.count += len(records)
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        # A view numpy precisa sumir antes de fechar o mmap
+        self.records = None
+        self._mm.close()
+
+
+class Spool:
+    """Log local segmentado com drenagem assíncrona e checkpoint.
+
+    ``sink(moto_ids, xs, ys, ts_ms, last_seq)`` grava no banco (junto com o
+    checkpoint) e levanta exceção em caso de falha; ``load_checkpoint()``
+    devolve o último seq confirmado no banco e é chamado ao (re)conectar.
+
+    Falhas comuns (conexão) são repetidas com backoff sobre o mesmo lote. Se
+    o sink levantar ``RejectedBatch``, o lote é dividido ao meio até isolar
+    os registros recusados; eles vão para ``dead_letter.ndjson`` (formato
+    aceito pelo POST /ingest) e o checkpoint passa por cima deles.
+    ``on_dead_letter(records, error)`` é avisado a cada registro descartado.
+    """
+
+    def __init__(
+        self,
+        directory,
+        sink,
+        load_checkpoint=None,
+        segment_records=1_000_000,
+        drain_batch=50_000,
+        max_retry_s=10.0,
+        on_dead_letter=None,
+    ):
+        self.sink = sink
+        self.load_checkpoint = load_checkpoint
+        self.on_dead_letter = on_dead_letter
+        self.segment_records = segment_records
+        self.drain_batch = drain_batch
+        self.max_retry_s = max_retry_s
+        self.directory, self._lock_handle = self._acquire_directory(directory)
+        self.spool_id = self._read_spool_id()
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._segments = []
+        self._stop = False
+        self._thread = None
+        self._resync = True
+        self.checkpoint = self._read_checkpoint()
+        self._open_segments()
+        tail = self._segments[-1].last_seq if self._segments else self.checkpoint
+        self.next_seq = max(tail, self.checkpoint) + 1
+
+        self.counters = {
+            "appended": 0,
+            "drained": 0,
+            "drain_batches": 0,
+            "drain_errors": 0,
+            "dead_lettered": 0,
+            "replayed_on_start": self.next_seq - 1 - self.checkpoint,
+        }
+        self.last_error = None
+        self.last_drain_ms = 0.0
+        # Registros de segmentos antigos (sem append_s) contam a partir daqui
+        self._opened_s = int(time.time())
+
+    # ---- diretório / arquivos ----
+    @staticmethod
+    def _acquire_directory(base):
+        """Usa o primeiro slot livre (base/0, base/1, ...) protegido por flock.
+
+        Vários workers (gunicorn) no mesmo host ficam com spools separados, e
+        um restart reabre o mesmo slot para fazer o replay.
+        """
+        slot = 0
+        while True:
+            path = os.path.join(base, str(slot))
+            os.makedirs(path, exist_ok=True)
+            handle = open(os.path.join(path, LOCK_FILE), "a")
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                slot += 1
+                continue
+            # O handle precisa ficar aberto para manter o lock
+            return path, handle
+
+    def _read_spool_id(self):
+        # Id persistido no diretório: se o spool for apagado nasce um novo id,
+        # evitando casar com o checkpoint antigo no banco
+        path = os.path.join(self.directory, SPOOL_ID_FILE)
+        if not os.path.exists(path):
+            self._atomic_write(path, uuid.uuid4().hex)
+        with open(path) as f:
+            return f.read().strip()
+
+    def _read_checkpoint(self):
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        try:
+            with open(path) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _atomic_write(path, text):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _segment_path(self, first_seq):
+        return os.path.join(
+            self.directory, f"{SEGMENT_PREFIX}{first_seq:020d}{SEGMENT_SUFFIX}"
+        )
+
+    def _open_segments(self):
+        names = sorted(
+            n
+            for n in os.listdir(self.directory)
+            if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX)
+        )
+        for name in names:
+            first_seq = int(name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)])
+            path = os.path.join(self.directory, name)
+            capacity = os.path.getsize(path) // RECORD_DTYPE.itemsize
+            segment = _Segment(path, first_seq, capacity, create=False)
+            if self._segments and first_seq != self._segments[-1].last_seq + 1:
+                # Buraco na sequência (segmento anterior truncado): o que vem
+                # depois não é confiável, descarta
+                segment.close()
+                os.remove(path)
+                continue
+            self._segments.append(segment)
+        self._collect_garbage()
+
+    def _collect_garbage(self):
+        """Remove segmentos cheios totalmente drenados"""
+        while self._segments:
+            head = self._segments[0]
+            full = head.count == head.capacity
+            if not (full and head.last_seq <= self.checkpoint):
+                break
+            self._segments.pop(0)
+            head.close()
+            os.remove(head.path)
+
+    # ---- escrita ----
+    def append(self, moto_ids, xs, ys, ts_ms):
+        """Grava o lote no spool (durável após o msync) e retorna o último seq"""
+        n = len(moto_ids)
+        if n == 0:
+            return self.next_seq - 1
+        records = np.zeros(n, dtype=RECORD_DTYPE)
+        records["moto_id"] = moto_ids
+        records["ts_ms"] = ts_ms
+        records["x"] = xs
+        records["y"] = ys
+        records["append_s"] = int(time.time())
+        with self._lock:
+            records["seq"] = self.next_seq + np.arange(n, dtype=np.uint64)
+            records["check"] = _checksum(records)
+            written = 0
+            touched = []
+            while written < n:
+                segment = self._segments[-1] if self._segments else None
+                if segment is None or segment.count == segment.capacity:
+                    segment = _Segment(
+                        self._segment_path(self.next_seq + written),
+                        self.next_seq + written,
+                        self.segment_records,
+                        create=True,
+                    )
+                    self._segments.append(segment)
+                take = min(segment.capacity - segment.count, n - written)
+                segment.write(records[written : written + take])
+                touched.append(segment)
+                written += take
+            for segment in touched:
+                segment.flush()
+            self.next_seq += n
+            self.counters["appended"] += n
+            self._wakeup.notify()
+            return self.next_seq - 1
+
+    # ---- drenagem ----
+    def _read_pending(self, limit):
+        """Cópia dos próximos registros após o checkpoint (até ``limit``)"""
+        out = []
+        taken = 0
+        start_seq = self.checkpoint + 1
+        for segment in self._segments:
+            if taken >= limit or segment.count == 0 or segment.last_seq < start_seq:
+                continue
+            offset = max(0, start_seq - segment.first_seq)
+            end = min(segment.count, offset + (limit - taken))
+            if end > offset:
+                out.append(segment.records[offset:end].copy())
+                taken += end - offset
+                start_seq = segment.first_seq + end
+        if not out:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return out[0] if len(out) == 1 else np.concatenate(out)
+
+    def _commit_checkpoint(self, last_seq):
+        self._atomic_write(os.path.join(self.directory, CHECKPOINT_FILE), str(last_seq))
+        self.checkpoint = last_seq
+        self._collect_garbage()
+
+    def _write_dead_letter(self, records, error):
+        """Anexa os registros recusados ao arquivo de dead letter (fsync)"""
+        lines = [
+            json.dumps(
+                {
+                    "seq": int(r["seq"]),
+                    "moto_id": int(r["moto_id"]),
+                    "x": float(r["x"]),
+                    "y": float(r["y"]),
+                    "timestamp": int(r["ts_ms"]),
+                    "error": str(error),
+                }
+            )
+            for r in records
+        ]
+        with open(os.path.join(self.directory, DEAD_LETTER_FILE), "a") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.counters["dead_lettered"] += len(records)
+        if self.on_dead_letter is not None:
+            self.on_dead_letter(records, error)
+
+    def _drain_records(self, records):
+        """Grava ``records`` e avança o checkpoint; retorna quantos foram para o
+        dead letter. Falhas que não são ``RejectedBatch`` propagam."""
+        last_seq = int(records["seq"][-1])
+        try:
+            self.sink(
+                records["moto_id"],
+                records["x"],
+                records["y"],
+                records["ts_ms"],
+                last_seq,
+            )
+            rejected = 0
+        except RejectedBatch as e:
+            if len(records) > 1:
+                # Bisseção: as metades boas são gravadas, só as ruins sobram
+                half = len(records) // 2
+                return self._drain_records(records[:half]) + self._drain_records(
+                    records[half:]
+                )
+            print(f"⚠️  Spool: registro {last_seq} recusado pelo banco ({e})")
+            self._write_dead_letter(records, e)
+            rejected = 1
+        with self._lock:
+            self._commit_checkpoint(last_seq)
+        return rejected
+
+    def _drain_loop(self):
+        retry_s = 0.5
+        while not self._stop:
+            try:
+                if self._resync and self.load_checkpoint is not None:
+                    confirmed = int(self.load_checkpoint(self.spool_id) or 0)
+                    with self._lock:
+                        if confirmed > self.checkpoint:
+                            # Banco já tem mais que o checkpoint local: crash
+                            # entre o commit e a gravação do arquivo
+                            self._commit_checkpoint(min(confirmed, self.next_seq - 1))
+                    self._resync = False
+
+                with self._lock:
+                    batch = self._read_pending(self.drain_batch)
+                    if not len(batch):
+                        self._wakeup.wait(timeout=0.5)
+                        continue
+
+                started = time.perf_counter()
+                rejected = self._drain_records(batch)
+                self.last_drain_ms = (time.perf_counter() - started) * 1000
+                self.counters["drained"] += len(batch) - rejected
+                self.counters["drain_batches"] += 1
+                retry_s = 0.5
+            except Exception as e:
+                self.counters["drain_errors"] += 1
+                self.last_error = str(e)
+                self._resync = True
+                print(
+                    f"⚠️  Spool: falha ao drenar ({e}); nova tentativa em {retry_s:.1f}s"
+                )
+                time.sleep(retry_s)
+                retry_s = min(retry_s * 2, self.max_retry_s)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._drain_loop, name="spool-drainer", daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        with self._lock:
+            self._stop = True
+            self._wakeup.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def close(self):
+        """Para a drenagem e libera os segmentos e o lock do diretório; um novo
+        ``Spool`` no mesmo diretório retoma do checkpoint"""
+        self.stop()
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+        self._lock_handle.close()
+
+    def stats(self, now_ms=None):
+        """Tamanho, lag e contadores do spool.
+
+        ``lag_seconds`` é a idade (relógio de parede do append) do registro
+        pendente mais antigo, não o timestamp da detecção: um backfill de
+        dados antigos drenando em dia não conta como atraso.
+        """
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self._lock:
+            segments = len(self._segments)
+            capacity = sum(segment.capacity for segment in self._segments)
+            head = self.next_seq - 1
+            checkpoint = self.checkpoint
+            pending = self._read_pending(1)
+        oldest = None
+        if len(pending):
+            oldest = (int(pending["append_s"][0]) or self._opened_s) * 1000
+        return {
+            "spool_id": self.spool_id,
+            "directory": self.directory,
+            "head_seq": head,
+            "checkpoint_seq": checkpoint,
+            "lag_records": head - checkpoint,
+            "lag_seconds": (
+                round(max(now_ms - oldest, 0) / 1000, 3) if oldest else 0.0
+            ),
+            "segments": segments,
+            "bytes_on_disk": capacity * RECORD_DTYPE.itemsize,
+            "drainer_alive": bool(self._thread and self._thread.is_alive()),
+            "last_drain_ms": round(self.last_drain_ms, 2),
+            "last_error": self.last_error,
+            "counters": dict(self.counters),
+        }
@@ -0,0 +1,429 @@
+"""
+Listener asyncio de telemetria (UDP/TCP) para rastreadores reais.
+
+Protocolos aceitos (podem ser misturados na mesma conexão/datagrama):
+
+- Linha (texto): ``moto_id,x,y[,timestamp_ms]\\n``
+- Binário: cabeçalho ``struct "<2sBH"`` (``b"MT"``, versão, quantidade)
+  seguido de registros de 20 bytes ``<Iffq`` (moto_id, x, y, timestamp_ms)
+
+Os registros recebidos ficam em um buffer limitado e são entregues em lote ao
+``sink`` uma vez por tick, na mesma thread de escrita para não bloquear o loop.
+"""
+
+import asyncio
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype(
+    [("moto_id", "<u4"), ("x", "<f4"), ("y", "<f4"), ("ts_ms", "<i8")]
+)
+FRAME_MAGIC = b"MT"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<2sBH")  # magic, versão, quantidade de registros
+MAX_FRAME_RECORDS = 0xFFFF  # limite do campo de quantidade (uint16)
+MAX_FRAME_BYTES = FRAME_HEADER.size + MAX_FRAME_RECORDS * RECORD_DTYPE.itemsize
+
+# Políticas quando o buffer enche
+DROP_OLDEST = "drop_oldest"  # descarta os registros mais antigos
+DROP_NEWEST = "drop_newest"  # descarta o que acabou de chegar
+BACKPRESSURE = "backpressure"  # pausa a leitura dos sockets TCP (só TCP)
+
+
+def encode_frame(records):
+    """Codifica um array RECORD_DTYPE no formato binário do protocolo"""
+    records = np.asarray(records, dtype=RECORD_DTYPE)
+    return (
+        FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(records)) + records.tobytes()
+    )
+
+
+def encode_lines(records):
+    """Codifica um array RECORD_DTYPE no protocolo de linha"""
+    return "".join(
+        f"{int(r['moto_id'])},{float(r['x']):.2f},{float(r['y']):.2f},{int(r['ts_ms'])}\n"
+        for r in records
+    ).encode("ascii")
+
+
+_MOTO_ID_RANGE = (0, np.iinfo(np.uint32).max)
+_TS_RANGE = (np.iinfo(np.int64).min, np.iinfo(np.int64).max)
+
+
+def _parse_line(line):
+    parts = line.split(b",")
+    if len(parts) not in (3, 4):
+        raise ValueError("linha deve ter 3 ou 4 campos")
+    moto_id = int(parts[0])
+    ts_ms = int(parts[3]) if len(parts) == 4 else 0
+    # Fora da faixa dos campos binários o np.array do lote estouraria
+    # (OverflowError) e derrubaria o datagrama/conexão inteiro
+    if not _MOTO_ID_RANGE[0] <= moto_id <= _MOTO_ID_RANGE[1]:
+        raise ValueError("moto_id fora da faixa uint32")
+    if not _TS_RANGE[0] <= ts_ms <= _TS_RANGE[1]:
+        raise ValueError("timestamp fora da faixa int64")
+    return moto_id, float(parts[1]), float(parts[2]), ts_ms
+
+
+def decode_stream(data):
+    """Decodifica o máximo possível de ``data``.
+
+    Retorna (registros, erros de parse, bytes consumidos). O que sobrar é um
+    frame ou linha incompleta que deve esperar mais bytes (TCP).
+    """
+    chunks = []
+    lines = []
+    errors = 0
+    pos = 0
+    size = len(data)
+    while pos < size:
+        if data[pos : pos + 2] == FRAME_MAGIC:
+            if size - pos < FRAME_HEADER.size:
+                break
+            _, version, count = FRAME_HEADER.unpack_from(data, pos)
+            end = pos + FRAME_HEADER.size + count * RECORD_DTYPE.itemsize
+            if end > size:
+                break
+            if version != FRAME_VERSION:
+                errors += count
+            else:
+                chunks.append(
+                    np.frombuffer(
+                        data, RECORD_DTYPE, count, pos + FRAME_HEADER.size
+                    ).copy()
+                )
+            pos = end
+            continue
+
+        newline = data.find(b"\n", pos)
+        if newline < 0:
+            break
+        line = bytes(data[pos:newline]).strip()
+        pos = newline + 1
+        if not line:
+            continue
+        try:
+            lines.append(_parse_line(line))
+        except ValueError:
+            errors += 1
+
+    if lines:
+        chunks.append(np.array(lines, dtype=RECORD_DTYPE))
+    if not chunks:
+        return np.empty(0, dtype=RECORD_DTYPE), errors, pos
+    records = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+    return records, errors, pos
+
+
+class _BoundedBuffer:
+    """Fila de blocos de registros com capacidade máxima em registros"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self._chunks = deque()
+
+    def push(self, records, policy):
+        """Enfileira registros; retorna (descartados_antigos, descartados_novos)"""
+        dropped_oldest = dropped_newest = 0
+        free = self.capacity - self.size
+        if len(records) > free:
+            if policy == DROP_OLDEST:
+                if len(records) > self.capacity:
+                    dropped_newest = len(records) - self.capacity
+                    records = records[-self.capacity :]
+                dropped_oldest = self._evict(len(records) - free)
+            else:
+                dropped_newest = len(records) - free
+                records = records[:free]
+        if len(records):
+            self._chunks.append(records)
+            self.size += len(records)
+        return dropped_oldest, dropped_newest
+
+    def _evict(self, count):
+        evicted = 0
+        while evicted < count and self._chunks:
+            head = self._chunks[0]
+            take = min(len(head), count - evicted)
+            if take == len(head):
+                self._chunks.popleft()
+            else:
+                self._chunks[0] = head[take:]
+            evicted += take
+        self.size -= evicted
+        return evicted
+
+    def take(self, limit):
+        """Remove até ``limit`` registros do início da fila"""
+        out = []
+        taken = 0
+        while self._chunks and taken < limit:
+            head = self._chunks.popleft()
+            room = limit - taken
+            if len(head) > room:
+                self._chunks.appendleft(head[room:])
+                head = head[:room]
+            out.append(head)
+            taken += len(head)
+        self.size -= taken
+        if not out:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return out[0] if len(out) == 1 else np.concatenate(out)
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener._on_data(data, "udp")
+
+
+class _TcpProtocol(asyncio.Protocol):
+    def __init__(self, listener):
+        self.listener = listener
+        self.transport = None
+        self._pending = bytearray()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.listener._tcp_connected(self)
+
+    def connection_lost(self, exc):
+        self.listener._tcp_disconnected(self)
+
+    def data_received(self, data):
+        self._pending += data
+        consumed = self.listener._on_data(self._pending, "tcp")
+        del self._pending[:consumed]
+        if len(self._pending) > self.listener.max_pending_bytes:
+            # Cliente mandando lixo sem quebra de linha: encerra a conexão
+            self.listener.counters["parse_errors"] += 1
+            self.transport.close()
+
+
+class TelemetryListener:
+    """Recebe telemetria via UDP/TCP e entrega lotes ao ``sink`` por tick.
+
+    ``sink(moto_ids, xs, ys, ts_ms)`` roda em uma thread dedicada e deve
+    retornar ``(aceitos, rejeicoes_por_motivo)``.
+    """
+
+    def __init__(
+        self,
+        sink,
+        host="0.0.0.0",
+        udp_port=None,
+        tcp_port=None,
+        tick_ms=50,
+        max_buffer=200_000,
+        max_batch=50_000,
+        udp_policy=DROP_OLDEST,
+        tcp_policy=BACKPRESSURE,
+    ):
+        if udp_policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Política UDP inválida: {udp_policy}")
+        if tcp_policy not in (DROP_OLDEST, DROP_NEWEST, BACKPRESSURE):
+            raise ValueError(f"Política TCP inválida: {tcp_policy}")
+        self.sink = sink
+        self.host = host
+        self.udp_port = udp_port
+        self.tcp_port = tcp_port
+        self.tick = tick_ms / 1000.0
+        self.max_batch = max_batch
+        self.udp_policy = udp_policy
+        self.tcp_policy = tcp_policy
+        # Cabe o maior frame binário válido; só lixo sem quebra passa disso
+        self.max_pending_bytes = max(1 << 20, MAX_FRAME_BYTES)
+        # Pausa TCP ao atingir 80% do buffer e retoma abaixo de 50%
+        self.high_water = int(max_buffer * 0.8)
+        self.low_water = int(max_buffer * 0.5)
+
+        self._buffer = _BoundedBuffer(max_buffer)
+        self._tcp_clients = set()
+        self._paused = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="telemetry-sink"
+        )
+        self._thread = None
+        self._loop = None
+        self.counters = {
+            "udp_datagrams": 0,
+            "tcp_connections": 0,
+            "tcp_connections_active": 0,
+            "records_received": 0,
+            "parse_errors": 0,
+            "dropped_oldest": 0,
+            "dropped_newest": 0,
+            "backpressure_pauses": 0,
+            "batches_flushed": 0,
+            "records_accepted": 0,
+            "records_rejected": 0,
+            "sink_errors": 0,
+            "tick_overruns": 0,
+            "buffer_high_water_mark": 0,
+        }
+        self.rejections = {}
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    # ---- recepção ----
+    def _on_data(self, data, transport_kind):
+        records, errors, consumed = decode_stream(data)
+        counters = self.counters
+        if transport_kind == "udp":
+            counters["udp_datagrams"] += 1
+            # Datagrama é autocontido: sobra incompleta conta como erro
+            if consumed < len(data):
+                errors += 1
+        counters["parse_errors"] += errors
+        if len(records):
+            # Timestamp 0 = sem timestamp do dispositivo: usa o de recepção
+            missing_ts = records["ts_ms"] == 0
+            if missing_ts.any():
+                records["ts_ms"][missing_ts] = int(time.time() * 1000)
+            counters["records_received"] += len(records)
+            policy = self.udp_policy if transport_kind == "udp" else self.tcp_policy
+            dropped_oldest, dropped_newest = self._buffer.push(records, policy)
+            counters["dropped_oldest"] += dropped_oldest
+            counters["dropped_newest"] += dropped_newest
+            if self._buffer.size > counters["buffer_high_water_mark"]:
+                counters["buffer_high_water_mark"] = self._buffer.size
+            if policy == BACKPRESSURE and self._buffer.size >= self.high_water:
+                self._pause_tcp()
+        return consumed
+
+    def _tcp_connected(self, client):
+        self._tcp_clients.add(client)
+        self.counters["tcp_connections"] += 1
+        self.counters["tcp_connections_active"] = len(self._tcp_clients)
+        if self._paused:
+            client.transport.pause_reading()
+
+    def _tcp_disconnected(self, client):
+        self._tcp_clients.discard(client)
+        self.counters["tcp_connections_active"] = len(self._tcp_clients)
+
+    def _pause_tcp(self):
+        if self._paused:
+            return
+        self._paused = True
+        self.counters["backpressure_pauses"] += 1
+        for client in self._tcp_clients:
+            client.transport.pause_reading()
+
+    def _resume_tcp(self):
+        if not self._paused or self._buffer.size > self.low_water:
+            return
+        self._paused = False
+        for client in self._tcp_clients:
+            client.transport.resume_reading()
+
+    # ---- entrega ----
+    def _deliver(self, batch):
+        return self.sink(
+            batch["moto_id"].astype(np.int64),
+            batch["x"].astype(np.float64),
+            batch["y"].astype(np.float64),
+            batch["ts_ms"].astype(np.int64),
+        )
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time() + self.tick
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            next_tick += self.tick
+            batch = self._buffer.take(self.max_batch)
+            self._resume_tcp()
+            if not len(batch):
+                continue
+
+            started = time.perf_counter()
+            try:
+                accepted, rejections = await loop.run_in_executor(
+                    self._executor, self._deliver, batch
+                )
+            except Exception as e:
+                self.counters["sink_errors"] += 1
+                print(f"⚠️  Erro ao gravar lote de telemetria: {e}")
+                continue
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+            self.counters["batches_flushed"] += 1
+            self.counters["records_accepted"] += accepted
+            self.counters["records_rejected"] += len(batch) - accepted
+            for reason, count in rejections.items():
+                self.rejections[reason] = self.rejections.get(reason, 0) + count
+
+            # Gravação mais lenta que o tick: realinha em vez de acumular atraso
+            if loop.time() > next_tick:
+                self.counters["tick_overruns"] += 1
+                next_tick = loop.time() + self.tick
+            self._resume_tcp()
+
+    async def _serve(self, ready):
+        loop = asyncio.get_running_loop()
+        # reuse_port permite vários workers (gunicorn) na mesma porta
+        if self.udp_port:
+            await loop.create_datagram_endpoint(
+                lambda: _UdpProtocol(self),
+                local_addr=(self.host, self.udp_port),
+                reuse_port=True,
+            )
+        if self.tcp_port:
+            await loop.create_server(
+                lambda: _TcpProtocol(self),
+                self.host,
+                self.tcp_port,
+                reuse_port=True,
+            )
+        ready.set()
+        await self._flush_loop()
+
+    def _run(self, ready):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve(ready))
+        except Exception as e:
+            print(f"❌ Listener de telemetria encerrado: {e}")
+        finally:
+            ready.set()
+
+    def start_in_thread(self):
+        """Inicia o event loop em uma thread daemon e espera os sockets abrirem"""
+        ready = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(ready,), name="telemetry-listener", daemon=True
+        )
+        self._thread.start()
+        ready.wait(timeout=5)
+        return self._thread
+
+    def stats(self):
+        """Contadores e estado do buffer para monitoramento"""
+        return {
+            "udp_port": self.udp_port,
+            "tcp_port": self.tcp_port,
+            "tick_ms": round(self.tick * 1000, 1),
+            "policies": {"udp": self.udp_policy, "tcp": self.tcp_policy},
+            "running": bool(self._thread and self._thread.is_alive()),
+            "buffer": {
+                "depth": self._buffer.size,
+                "capacity": self._buffer.capacity,
+                "tcp_paused": self._paused,
+            },
+            "counters": dict(self.counters),
+            "rejections": dict(self.rejections),
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga local para o listener de telemetria (sem dispositivos reais).
+
+Exemplos:
+    python telemetry_loadgen.py --proto udp --format binary --motos 5000 --rate 20000
+    python telemetry_loadgen.py --proto tcp --format line --port 5006 --duration 30
+"""
+
+import argparse
+import socket
+import time
+
+import numpy as np
+
+from telemetry_listener import (
+    MAX_FRAME_RECORDS,
+    RECORD_DTYPE,
+    encode_frame,
+    encode_lines,
+)
+
+WIDTH, HEIGHT = 800, 600
+# Limite seguro para um datagrama UDP sem fragmentação em loopback/LAN
+MAX_UDP_RECORDS = 60
+
+
+def _positions(rng, num_motos):
+    xs = rng.uniform(10, WIDTH - 10, num_motos)
+    ys = rng.uniform(10, HEIGHT - 10, num_motos)
+    vxs = rng.uniform(-4, 4, num_motos)
+    vys = rng.uniform(-4, 4, num_motos)
+    return xs, ys, vxs, vys
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    xs, ys, vxs, vys = _positions(rng, args.motos)
+    moto_ids = np.arange(1, args.motos + 1, dtype=np.uint32)
+    encode = encode_frame if args.format == "binary" else encode_lines
+
+    if args.proto == "udp":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        per_message = min(args.batch, MAX_UDP_RECORDS)
+    else:
+        sock = socket.create_connection((args.host, args.port))
+        per_message = args.batch
+        if args.format == "binary":
+            # O cabeçalho do frame guarda a quantidade em 16 bits
+            per_message = min(per_message, MAX_FRAME_RECORDS)
+
+    sent = 0
+    messages = 0
+    started = time.perf_counter()
+    deadline = started + args.duration
+    cursor = 0
+    try:
+        while time.perf_counter() < deadline:
+            # Avança a frota inteira uma vez por volta completa
+            if cursor == 0:
+                xs += vxs
+                ys += vys
+                vxs[(xs <= 10) | (xs >= WIDTH - 10)] *= -1
+                vys[(ys <= 10) | (ys >= HEIGHT - 10)] *= -1
+                np.clip(xs, 0, WIDTH, out=xs)
+                np.clip(ys, 0, HEIGHT, out=ys)
+
+            end = min(cursor + per_message, args.motos)
+            records = np.empty(end - cursor, dtype=RECORD_DTYPE)
+            records["moto_id"] = moto_ids[cursor:end]
+            records["x"] = xs[cursor:end]
+            records["y"] = ys[cursor:end]
+            records["ts_ms"] = int(time.time() * 1000)
+            payload = encode(records)
+            if args.proto == "udp":
+                sock.sendto(payload, (args.host, args.port))
+            else:
+                sock.sendall(payload)
+            sent += len(records)
+            messages += 1
+            cursor = end % args.motos
+
+            # Controle de taxa: dorme quando estiver adiantado
+            if args.rate:
+                ahead = sent / args.rate - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Enviados: {sent} registros em {messages} mensagens ({args.proto}/{args.format})"
+    )
+    print(f"Tempo: {elapsed:.2f} s · Taxa: {sent / elapsed:,.0f} registros/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--port", type=int, default=None, help="padrão: 5005 UDP / 5006 TCP"
+    )
+    parser.add_argument("--proto", choices=["udp", "tcp"], default="udp")
+    parser.add_argument("--format", choices=["binary", "line"], default="binary")
+    parser.add_argument("--motos", type=int, default=1000)
+    parser.add_argument(
+        "--rate", type=float, default=10_000, help="registros/s (0 = sem limite)"
+    )
+    parser.add_argument("--batch", type=int, default=500, help="registros por mensagem")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.port is None:
+        args.port = 5005 if args.proto == "udp" else 5006
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
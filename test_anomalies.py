@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Testes do detector de anomalias de trajetória (TrajectoryAnomalyDetector) -
+não precisam do Oracle
+"""
+
+import numpy as np
+
+from fake_oracle import load_script
+
+script = load_script()
+
+T0 = 1_700_000_000_000
+EM_USO, NO_PATIO = 0, 1
+
+
+def _detector():
+    # 100 px/s, salto de 200 px, parada de 10 s num raio de 5 px, pátio 800x600
+    return script.TrajectoryAnomalyDetector(100.0, 200.0, 5.0, 10_000, 800, 600)
+
+
+def _update(detector, moto_ids, xs, ys, ts_ms, statuses=None):
+    n = len(moto_ids)
+    alerts = detector.update(
+        np.asarray(moto_ids, dtype=np.int64),
+        np.asarray(xs, dtype=float),
+        np.asarray(ys, dtype=float),
+        np.asarray(statuses if statuses is not None else [EM_USO] * n),
+        np.asarray(ts_ms, dtype=np.int64),
+    )
+    return [(a["moto_id"], a["type"]) for a in alerts]
+
+
+def test_speeding_once_per_episode():
+    """Excesso de velocidade alerta na entrada; volta a alertar após normalizar"""
+    detector = _detector()
+    ts = T0 + np.arange(6) * 100
+    # 20 px a cada 100 ms = 200 px/s
+    assert _update(detector, [1] * 4, np.arange(4) * 20, [50] * 4, ts[:4]) == [
+        (1, "speeding")
+    ]
+    assert detector.stats()["speeding"] == 1
+    # Devagar (5 px/100 ms) encerra o episódio; rápido de novo alerta de novo
+    assert _update(detector, [1], [65], [50], [ts[4]]) == []
+    assert detector.stats()["speeding"] == 0
+    assert _update(detector, [1], [85], [50], [ts[5]]) == [(1, "speeding")]
+    print("✅ Excesso de velocidade uma vez por episódio")
+
+
+def test_teleport():
+    """Salto grande e rápido é teleport; o mesmo salto em tempo longo não"""
+    detector = _detector()
+    _update(detector, [1, 2], [100, 100], [100, 100], [T0, T0])
+    alerts = _update(detector, [1, 2], [500, 500], [100, 100], [T0 + 100, T0 + 10_000])
+    assert alerts == [(1, "teleport")]
+    # Salto grande no mesmo timestamp: velocidade implícita infinita
+    assert _update(detector, [2], [100], [100], [T0 + 10_000]) == [(2, "teleport")]
+    print("✅ Teleport só com velocidade implícita acima do limite")
+
+
+def test_stuck_only_when_in_use():
+    """Moto em uso parada por stuck_ms alerta uma vez; no pátio, nunca"""
+    detector = _detector()
+    ts = T0 + np.arange(12) * 1_000
+    jitter = 300 + np.arange(12) % 3  # dentro do raio de 5 px
+    in_use = _update(detector, [1] * 12, jitter, [200] * 12, ts)
+    parked = _update(detector, [2] * 12, jitter, [200] * 12, ts, [NO_PATIO] * 12)
+    assert in_use == [(1, "stuck")] and parked == []
+    assert detector.stats()["stuck"] == 1
+
+    # Andou: sai da condição e a contagem recomeça
+    assert _update(detector, [1], [320], [200], [T0 + 12_000]) == []
+    assert detector.stats()["stuck"] == 0
+    print("✅ Parada em uso detectada só para status em_uso")
+
+
+def test_out_of_bounds_and_late_rows():
+    """Fora do pátio alerta uma vez e não move a trajetória; atrasada é ignorada"""
+    detector = _detector()
+    _update(detector, [1], [100], [100], [T0])
+    alerts = _update(detector, [1, 1], [-5, 900], [100, 100], [T0 + 100, T0 + 200])
+    assert alerts == [(1, "out_of_bounds")]
+    assert _update(detector, [1], [-5], [100], [T0 + 300]) == []
+    assert detector.stats()["out_of_bounds"] == 1
+
+    # De volta ao pátio perto da última posição válida: sem teleport
+    assert _update(detector, [1], [105], [100], [T0 + 400]) == []
+    assert detector.stats()["out_of_bounds"] == 0
+    assert _update(detector, [1], [810], [100], [T0 + 500]) == [(1, "out_of_bounds")]
+
+    # Atrasada muito longe não gera teleport nem muda a última posição
+    assert _update(detector, [1], [700], [500], [T0 + 50]) == []
+    assert _update(detector, [1], [110], [100], [T0 + 600]) == []
+    print("✅ Fora do pátio e detecções atrasadas")
+
+
+if __name__ == "__main__":
+    test_speeding_once_per_episode()
+    test_teleport()
+    test_stuck_only_when_in_use()
+    test_out_of_bounds_and_late_rows()
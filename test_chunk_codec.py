@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Testes do codec de chunks (chunk_codec.py) - não precisam do Oracle
+"""
+
+import struct
+
+import numpy as np
+
+from chunk_codec import (
+    _HEADER,
+    _SECTION,
+    decode_chunk,
+    encode_chunk,
+    varint_decode,
+    varint_encode,
+)
+
+
+def _sample_chunk(n=500, seed=7):
+    """Amostras de uma moto: intervalo quase regular, trechos parados"""
+    rng = np.random.default_rng(seed)
+    ts = 1_700_000_000_000 + np.cumsum(rng.integers(95, 106, n))
+    xs = np.round(np.cumsum(rng.normal(0, 3, n)) + 400, 2)
+    ys = np.round(np.cumsum(rng.normal(0, 3, n)) + 300, 2)
+    xs[n // 5 : 2 * n // 5] = xs[n // 5]
+    quads = rng.integers(0, 25, n) // 5
+    status = np.arange(n) * 5 // n
+    samples = rng.integers(1, 4, n)
+    return ts, xs, ys, quads, status, samples
+
+
+def _assert_chunk(decoded, ts, xs, ys, quads, status, samples):
+    np.testing.assert_array_equal(decoded["ts_ms"], ts)
+    np.testing.assert_allclose(decoded["x"], xs, atol=1e-9)
+    np.testing.assert_allclose(decoded["y"], ys, atol=1e-9)
+    np.testing.assert_array_equal(decoded["quad_code"], quads)
+    np.testing.assert_array_equal(decoded["status_code"], status)
+    np.testing.assert_array_equal(decoded["samples"], samples)
+
+
+def _as_mck1(blob):
+    """Regrava um blob MCK2 no formato antigo, sem a seção de amostras"""
+    offset = _HEADER.size
+    for _ in range(5):
+        (size,) = _SECTION.unpack_from(blob, offset)
+        offset += _SECTION.size + size
+    return b"MCK1" + blob[4:offset]
+
+
+def _expect_value_error(blob):
+    try:
+        decode_chunk(blob)
+    except ValueError:
+        return
+    raise AssertionError("decode_chunk aceitou um chunk inválido")
+
+
+def test_round_trip():
+    """Codifica e decodifica um chunk e compara todas as colunas"""
+    chunk = _sample_chunk()
+    blob = encode_chunk(*chunk)
+    _assert_chunk(decode_chunk(blob), *chunk)
+    assert len(blob) < len(chunk[0]) * 8
+    print(f"✅ Round-trip de {len(chunk[0])} amostras em {len(blob)} bytes")
+
+
+def test_single_sample():
+    """Chunk com uma amostra só: seções de delta ficam vazias"""
+    chunk = _sample_chunk(n=1)
+    _assert_chunk(decode_chunk(encode_chunk(*chunk)), *chunk)
+    print("✅ Chunk de uma amostra")
+
+
+def test_extreme_values():
+    """Deltas negativos e saltos grandes de timestamp e coordenada"""
+    ts = np.array([0, 2**40, 2**40 + 1, 5], dtype=np.int64)
+    xs = np.array([-1e6, 1e6, 0.01, -0.01])
+    ys = np.zeros(4)
+    chunk = (ts, xs, ys, np.zeros(4, int), np.zeros(4, int), np.ones(4, int))
+    _assert_chunk(decode_chunk(encode_chunk(*chunk)), *chunk)
+    values = np.array([0, 1, 127, 128, 2**63, 2**64 - 1], dtype=np.uint64)
+    np.testing.assert_array_equal(
+        varint_decode(varint_encode(values), len(values)), values
+    )
+    print("✅ Valores extremos e varints de 64 bits")
+
+
+def test_reads_mck1():
+    """Blobs MCK1 continuam legíveis, com uma amostra por linha"""
+    ts, xs, ys, quads, status, _ = _sample_chunk(n=50)
+    blob = _as_mck1(encode_chunk(ts, xs, ys, quads, status))
+    assert blob[:4] == b"MCK1"
+    _assert_chunk(decode_chunk(blob), ts, xs, ys, quads, status, np.ones(50))
+    print("✅ Leitura de blobs MCK1")
+
+
+def test_rejects_corrupt():
+    """Chunks truncados ou corrompidos geram ValueError, não lixo"""
+    blob = encode_chunk(*_sample_chunk(n=50))
+
+    # Truncado em qualquer ponto: cabeçalho, tamanho de seção ou varints
+    for cut in range(len(blob)):
+        _expect_value_error(blob[:cut])
+
+    # Varint sem o byte final dentro da seção de timestamps
+    ts_size = _SECTION.unpack_from(blob, _HEADER.size)[0]
+    end = _HEADER.size + _SECTION.size + ts_size - 1
+    broken = bytearray(blob)
+    broken[end] |= 0x80
+    _expect_value_error(bytes(broken))
+
+    # Varint com mais de 10 bytes (não cabe em 64 bits)
+    ts_section = b"\xff" * 11 + b"\x01"
+    header = _HEADER.pack(b"MCK2", 2, 0, 0, 0)
+    sections = [ts_section] + [varint_encode([0])] * 2
+    sections += [varint_encode([0, 2])] * 3
+    overlong = header + b"".join(_SECTION.pack(len(s)) + s for s in sections)
+    _expect_value_error(overlong)
+
+    # Cabeçalho com n diferente do conteúdo das seções
+    wrong_count = bytearray(blob)
+    struct.pack_into("<I", wrong_count, 4, 49)
+    _expect_value_error(bytes(wrong_count))
+
+    # Formato desconhecido
+    _expect_value_error(b"XXXX" + blob[4:])
+    print("✅ Chunks corrompidos e truncados rejeitados")
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_single_sample()
+    test_extreme_values()
+    test_reads_mck1()
+    test_rejects_corrupt()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Testes do cursor keyset (encode_cursor/decode_cursor/next_cursor) - não
+precisam do Oracle
+"""
+
+import base64
+from datetime import datetime
+
+import pandas as pd
+
+from fake_oracle import load_script
+
+script = load_script()
+
+
+def _raw_cursor(text):
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def _expect_value_error(cursor):
+    try:
+        script.decode_cursor(cursor)
+    except ValueError:
+        return
+    raise AssertionError(f"decode_cursor aceitou {cursor!r}")
+
+
+def test_round_trip():
+    """(timestamp, id) volta igual, com microssegundos, e sem padding na URL"""
+    for ts, row_id in [
+        (datetime(2024, 5, 1, 12, 30, 15, 123456), 42),
+        (pd.Timestamp("1970-01-01"), 0),
+        (datetime(1969, 12, 31, 23, 59, 59, 999999), 2**63 - 1),
+    ]:
+        cursor = script.encode_cursor(ts, row_id)
+        assert "=" not in cursor
+        assert script.decode_cursor(cursor) == (
+            pd.Timestamp(ts).to_pydatetime(),
+            row_id,
+        )
+    print("✅ Round-trip do cursor")
+
+
+def test_rejects_invalid():
+    """Cursor malformado ou fora da faixa gera ValueError (vira 400 na rota)"""
+    for cursor in [
+        "!!!",
+        _raw_cursor("abc"),
+        _raw_cursor("1:2:3"),
+        _raw_cursor("x:1"),
+        _raw_cursor(f"{pd.Timestamp.max.value // 1000 + 1}:1"),
+        _raw_cursor(f"{pd.Timestamp.min.value // 1000}:1"),
+        _raw_cursor("0:-1"),
+        _raw_cursor(f"0:{2**63}"),
+        base64.urlsafe_b64encode(b"\xff\xfe:1").decode(),
+    ]:
+        _expect_value_error(cursor)
+    print("✅ Cursores inválidos rejeitados")
+
+
+def test_next_cursor():
+    """Página cheia gera cursor da última linha; id nulo (memória) vira 0"""
+    ts = pd.Timestamp("2024-05-01 12:00:00")
+    page = pd.DataFrame({"ID": [7, 5], "TIMESTAMP": [ts, ts]})
+    assert script.next_cursor(page, 3) is None
+    assert script.decode_cursor(script.next_cursor(page, 2)) == (ts, 5)
+
+    memory = pd.DataFrame({"id": [None, None], "timestamp": [ts, ts]})
+    assert script.decode_cursor(script.next_cursor(memory, 2)) == (ts, 0)
+    print("✅ Cursor da próxima página")
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_rejects_invalid()
+    test_next_cursor()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Testes da banda morta antes de detections (DeadBandFilter) - não precisam do
+Oracle
+"""
+
+import numpy as np
+
+from fake_oracle import load_script
+
+script = load_script()
+
+T0 = 1_700_000_000_000
+
+
+def _batch(moto_ids, xs, ts_ms, quads=None, statuses=None):
+    n = len(moto_ids)
+    return {
+        "moto_id": np.asarray(moto_ids, dtype=np.int64),
+        "x": np.asarray(xs, dtype=float),
+        "y": np.full(n, 100.0),
+        "ts_ms": np.asarray(ts_ms, dtype=np.int64),
+        "quad_code": np.asarray(quads if quads is not None else [0] * n),
+        "status_code": np.asarray(statuses if statuses is not None else [1] * n),
+    }
+
+
+def _apply(dead_band, batch):
+    rows, pending = dead_band.plan(batch)
+    dead_band.commit(pending)
+    return rows
+
+
+def _held(dead_band):
+    return int(dead_band._state["held"].sum())
+
+
+def test_stationary_moto_and_heartbeat():
+    """Parada: só a primeira linha e o heartbeat, que carrega as suprimidas"""
+    dead_band = script.DeadBandFilter(epsilon=2.0, heartbeat_ms=1_000)
+    ts = T0 + np.arange(12) * 100
+    rows = _apply(dead_band, _batch([1] * 12, 50 + (np.arange(12) % 2), ts))
+    assert rows["ts_ms"].tolist() == [T0, T0 + 1_000]
+    assert rows["samples"].tolist() == [1, 10]
+    assert _held(dead_band) == 1  # T0 + 1100 aguarda a próxima linha
+
+    # Andou mais que epsilon: a linha absorve a suprimida
+    rows = _apply(dead_band, _batch([1], [60], [T0 + 1_200]))
+    assert rows["samples"].tolist() == [2]
+    assert _held(dead_band) == 0
+    print("✅ Moto parada: primeira linha e heartbeat")
+
+
+def test_reclassification_flushes_held():
+    """Troca de quadrante grava antes a última suprimida, no quadrante antigo"""
+    dead_band = script.DeadBandFilter(epsilon=5.0, heartbeat_ms=60_000)
+    batch = _batch(
+        [1] * 4,
+        [10, 11, 12, 13],
+        T0 + np.arange(4) * 100,
+        quads=[0, 0, 0, 1],
+        statuses=[1, 1, 1, 2],
+    )
+    rows = _apply(dead_band, batch)
+    assert rows["ts_ms"].tolist() == [T0, T0 + 200, T0 + 300]
+    assert rows["x"].tolist() == [10.0, 12.0, 13.0]
+    assert rows["quad_code"].tolist() == [0, 0, 1]
+    assert rows["status_code"].tolist() == [1, 1, 2]
+    assert rows["samples"].tolist() == [1, 2, 1]
+    print("✅ Troca de quadrante/status grava a suprimida antes")
+
+
+def test_late_rows_and_plan_without_commit():
+    """Atrasada é gravada como veio; plan() só muda o estado no commit"""
+    dead_band = script.DeadBandFilter(epsilon=5.0, heartbeat_ms=60_000)
+    _apply(dead_band, _batch([1], [10], [T0 + 1_000]))
+
+    batch = _batch([1, 1], [10, 300], [T0 + 500, T0 + 1_100])
+    first, _ = dead_band.plan(batch)
+    second, pending = dead_band.plan(batch)
+    for key in first:
+        np.testing.assert_array_equal(first[key], second[key])
+    assert first["ts_ms"].tolist() == [T0 + 500, T0 + 1_100]
+    assert first["samples"].tolist() == [1, 1]
+
+    dead_band.commit(pending)
+    rows = _apply(dead_band, _batch([1], [301], [T0 + 1_200]))
+    assert len(rows["ts_ms"]) == 0  # referência agora é x=300
+    print("✅ Atrasadas e estado só no commit")
+
+
+def test_samples_conserved_across_motos():
+    """Lotes aleatórios: toda detecção conta uma vez (gravada ou suprimida)"""
+    rng = np.random.default_rng(9)
+    dead_band = script.DeadBandFilter(epsilon=3.0, heartbeat_ms=2_000)
+    total = written = 0
+    ts = T0
+    for _ in range(30):
+        n = int(rng.integers(1, 60))
+        moto_ids = rng.integers(1, 9, n)
+        xs = np.round(rng.normal(100, 2, n), 1)
+        quads = (rng.random(n) < 0.1).astype(int)
+        stamps = ts + rng.integers(0, 500, n)
+        ts += 500
+        rows = _apply(dead_band, _batch(moto_ids, xs, stamps, quads=quads))
+        assert (np.diff(rows["ts_ms"]) >= 0).all()
+        total += n
+        written += int(rows["samples"].sum())
+        assert written + _held(dead_band) == total
+    assert written < total
+    print(f"✅ {total} detecções conservadas em samples")
+
+
+def test_disabled():
+    """Desligada: todas as linhas passam com samples = 1"""
+    dead_band = script.DeadBandFilter(epsilon=5.0, heartbeat_ms=1_000, enabled=False)
+    rows, pending = dead_band.plan(_batch([1, 1], [10, 10], [T0, T0 + 1]))
+    assert pending is None
+    assert rows["samples"].tolist() == [1, 1]
+    print("✅ Banda morta desligada")
+
+
+if __name__ == "__main__":
+    test_stationary_moto_and_heartbeat()
+    test_reclassification_flushes_held()
+    test_late_rows_and_plan_without_commit()
+    test_samples_conserved_across_motos()
+    test_disabled()
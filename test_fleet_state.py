@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Testes do estado da frota (FleetState: seq, log circular e épocas) - não
+precisam do Oracle
+"""
+
+import numpy as np
+
+from fake_oracle import load_script
+
+script = load_script()
+
+NOW_MS = 1_700_000_000_000
+
+
+def _apply(state, moto_ids, xs, ts_ms, status=0):
+    n = len(moto_ids)
+    state.apply(
+        np.asarray(moto_ids, dtype=np.int64),
+        np.asarray(xs, dtype=float),
+        np.full(n, 50.0),
+        np.zeros(n, dtype=np.int64),
+        np.full(n, status, dtype=np.int64),
+        np.asarray(ts_ms, dtype=np.int64),
+    )
+
+
+def _changed_ids(state, since):
+    changes = state.changes_since(since, NOW_MS)
+    return changes["full"], [m["moto_id"] for m in changes["motos"]]
+
+
+def test_seq_only_on_changes():
+    """Só mudança de posição/status gera seq; atrasada não sobrescreve"""
+    state = script.FleetState(100)
+    start = state.seq
+    _apply(state, [1, 2, 1], [10, 20, 11], [NOW_MS, NOW_MS, NOW_MS + 100])
+    assert state.seq == start + 2  # uma mudança por moto (a última do lote)
+    seq = state.seq
+
+    # Mesma posição: só o timestamp anda
+    _apply(state, [2], [20], [NOW_MS + 500])
+    assert state.seq == seq
+    assert state.record(2, NOW_MS + 500)["last_update"].endswith(".500000")
+
+    # Atrasada em relação à última gravada: ignorada
+    _apply(state, [1], [99], [NOW_MS - 1_000])
+    assert state.seq == seq
+    assert state.record(1, NOW_MS)["position"]["x"] == 11.0
+    assert state.record(3, NOW_MS) is None
+    print("✅ seq só nas mudanças; atrasada ignorada")
+
+
+def test_changes_since():
+    """since=N devolve só as motos alteradas depois de N"""
+    state = script.FleetState(100)
+    _apply(state, [1, 2, 3], [10, 20, 30], [NOW_MS] * 3)
+    since = state.seq
+    assert _changed_ids(state, since) == (False, [])
+
+    _apply(state, [3, 1], [31, 12], [NOW_MS + 100] * 2)
+    changes = state.changes_since(since, NOW_MS)
+    assert changes["seq"] == state.seq
+    assert _changed_ids(state, since) == (False, [1, 3])
+
+    # Formato compacto do /snapshot: [moto_id, x, y, status_code, quad_code]
+    seq, full, rows = state.compact_changes(since)
+    assert (seq, full) == (state.seq, False)
+    assert rows == [[1, 12.0, 50.0, 0, 0], [3, 31.0, 50.0, 0, 0]]
+    print("✅ Mudanças desde um seq")
+
+
+def test_full_snapshot_when_since_unusable():
+    """Log sobrescrito, seq do futuro, 0 ou de outra época: snapshot completo"""
+    state = script.FleetState(4)
+    _apply(state, [1, 2], [10, 20], [NOW_MS] * 2)
+    since = state.seq
+    for i in range(5):
+        _apply(state, [1], [100 + i], [NOW_MS + i + 1])
+    # 5 mudanças num log de 4: a de since+1 já foi sobrescrita
+    assert _changed_ids(state, since) == (True, [1, 2])
+    assert _changed_ids(state, since + 1) == (False, [1])
+
+    assert _changed_ids(state, state.seq + 1) == (True, [1, 2])
+    assert _changed_ids(state, 0) == (True, [1, 2])
+    # Outro worker (ou antes do restart): mesma contagem, outra época
+    other_epoch = state._epoch % ((1 << 20) - 1) + 1
+    other = (other_epoch << state._COUNTER_BITS) | state._counter
+    assert _changed_ids(state, other) == (True, [1, 2])
+    print("✅ Snapshot completo para since inutilizável")
+
+
+def test_epoch_rollover():
+    """Contador esgotado troca de época; since da época antiga recebe tudo"""
+    state = script.FleetState(100)
+    _apply(state, [1], [10], [NOW_MS])
+    state._counter = (1 << state._COUNTER_BITS) - 1
+    old = state.seq
+    _apply(state, [2], [20], [NOW_MS])
+    assert state._counter == 1
+    assert 0 < state.seq < 1 << 52
+    assert _changed_ids(state, old) == (True, [1, 2])
+    print("✅ Troca de época quando o contador esgota")
+
+
+if __name__ == "__main__":
+    test_seq_only_on_changes()
+    test_changes_since()
+    test_full_snapshot_when_since_unusable()
+    test_epoch_rollover()
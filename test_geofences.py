@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Testes das geofences (load_geofences/rasterize_geofences) - não precisam do
+Oracle
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from fake_oracle import load_script
+
+script = load_script()
+
+EXAMPLE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "geofences", "exemplo.json"
+)
+
+
+def _inside(polygon, x, y):
+    """Ray casting: (x, y) está dentro do polígono?"""
+    inside = False
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def _expect_value_error(fences):
+    with tempfile.TemporaryDirectory() as base:
+        path = os.path.join(base, "geofences.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"geofences": fences}, f)
+        try:
+            script.load_geofences(path)
+        except ValueError:
+            return
+    raise AssertionError(f"load_geofences aceitou {fences!r}")
+
+
+def test_rectangle_and_overlap():
+    """Retângulo inclui as bordas; na sobreposição vale a última geofence"""
+    fences = [
+        {"name": "a", "polygon": [[10, 10], [19, 10], [19, 14], [10, 14]]},
+        {"name": "b", "polygon": [[15, 12], [30, 12], [30, 20], [15, 20]]},
+    ]
+    mask = script.rasterize_geofences(fences, 40, 30)
+    assert mask.shape == (30, 40)
+    assert (mask[10:12, 10:20] == 1).all() and (mask[12:15, 10:15] == 1).all()
+    assert (mask[12:21, 15:31] == 2).all()
+    assert (mask == 1).sum() == 10 * 5 - 5 * 3
+    assert (mask == 2).sum() == 16 * 9
+    assert mask[9, 10] == 0 and mask[10, 9] == 0 and mask[21, 20] == 0
+    print("✅ Retângulos e sobreposição")
+
+
+def test_matches_point_in_polygon():
+    """Máscara do exemplo bate com ray casting longe das arestas"""
+    fences = script.load_geofences(EXAMPLE)
+    mask = script.rasterize_geofences(fences, script.WIDTH, script.HEIGHT)
+    rng = np.random.default_rng(2)
+    checked = 0
+    for x, y in zip(rng.uniform(0, 800, 5000), rng.uniform(0, 600, 5000)):
+        # Só pontos cujos vizinhos a 1,5 px concordam (sem aresta no meio)
+        probes = [(x + dx, y + dy) for dx in (-1.5, 1.5) for dy in (-1.5, 1.5)]
+        expected = 0
+        for code, fence in enumerate(fences, start=1):
+            inside = [_inside(fence["polygon"], px, py) for px, py in probes]
+            if all(inside):
+                expected = code
+            elif any(inside):
+                break
+        else:
+            assert mask[int(y), int(x)] == expected, (x, y)
+            checked += 1
+    assert checked > 4500
+    print(f"✅ Máscara igual ao point-in-polygon em {checked} pontos")
+
+
+def test_rejects_invalid_files():
+    """Nome ausente ou repetido, polígono degenerado e status desconhecido"""
+    square = [[0, 0], [5, 0], [5, 5]]
+    _expect_value_error([{"polygon": square}])
+    _expect_value_error([{"name": "a", "polygon": square}] * 2)
+    _expect_value_error([{"name": "a", "polygon": square[:2]}])
+    _expect_value_error([{"name": "a", "polygon": square, "status": "voando"}])
+    print("✅ Arquivos de geofence inválidos rejeitados")
+
+
+if __name__ == "__main__":
+    test_rectangle_and_overlap()
+    test_matches_point_in_polygon()
+    test_rejects_invalid_files()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Testes do heatmap de ocupação (OccupancyHeatmap) - não precisam do Oracle
+"""
+
+import numpy as np
+
+from fake_oracle import load_script
+
+script = load_script()
+
+NOW_MS = 1_700_000_000_000
+
+
+def _heatmap():
+    # 2x2 células de 400x300 px; janela de 10 s com buckets de 1 s
+    return script.OccupancyHeatmap(2, 2, {"10s": (10, 1)})
+
+
+def _record(heatmap, moto_ids, xs, ys, ts_ms, now_ms=NOW_MS):
+    heatmap.record(
+        np.asarray(moto_ids),
+        np.asarray(xs, dtype=float),
+        np.asarray(ys, dtype=float),
+        np.asarray(ts_ms, dtype=np.int64),
+        now_ms,
+    )
+
+
+def test_cells():
+    """Posições viram linha * cols + coluna, com as bordas presas na grade"""
+    heatmap = _heatmap()
+    cells = heatmap.cells([0, 799, 450, -5, 900], [0, 10, 599, 310, 700])
+    assert cells.tolist() == [0, 1, 3, 2, 3]
+    print("✅ Índices de célula")
+
+
+def test_one_sample_per_moto_and_bucket():
+    """Rajada de uma moto no mesmo bucket conta uma vez, na última posição"""
+    heatmap = _heatmap()
+    _record(
+        heatmap,
+        [1, 1, 1, 2],
+        [10, 10, 500, 10],
+        [10, 10, 400, 10],
+        [NOW_MS - 900, NOW_MS - 800, NOW_MS - 700, NOW_MS - 500],
+    )
+    snap = heatmap.snapshot("10s", NOW_MS)
+    assert snap["samples"] == 1
+    assert snap["counts"] == [[1, 0], [0, 1]]
+    assert snap["max_occupancy"] == 1.0
+
+    # Segundo bucket: a moto 2 mudou de célula
+    _record(heatmap, [1, 2], [500, 500], [400, 10], [NOW_MS + 100] * 2, NOW_MS + 100)
+    snap = heatmap.snapshot("10s", NOW_MS + 100)
+    assert snap["samples"] == 2
+    assert snap["counts"] == [[1, 1], [0, 2]]
+    assert snap["occupancy"] == [[0.5, 0.5], [0.0, 1.0]]
+    print("✅ Uma amostra por moto e bucket")
+
+
+def test_window_expiry():
+    """Buckets saem do total quando a janela passa; atrasados demais são ignorados"""
+    heatmap = _heatmap()
+    _record(heatmap, [1], [10], [10], [NOW_MS])
+    # Fora da janela (mais velho que 10 s) e no futuro: não contam
+    _record(heatmap, [2, 3], [10, 10], [10, 10], [NOW_MS - 10_000, NOW_MS + 5_000])
+    assert heatmap.snapshot("10s", NOW_MS)["counts"] == [[1, 0], [0, 0]]
+
+    # 9 s depois o bucket ainda está na janela; 10 s depois já saiu
+    assert heatmap.snapshot("10s", NOW_MS + 9_000)["samples"] == 1
+    snap = heatmap.snapshot("10s", NOW_MS + 10_000)
+    assert snap["samples"] == 0
+    assert snap["counts"] == [[0, 0], [0, 0]]
+    assert snap["max_occupancy"] == 0.0
+
+    # O slot do anel é reaproveitado sem sobrar contagem antiga
+    _record(heatmap, [1], [500], [400], [NOW_MS + 10_000], NOW_MS + 10_000)
+    assert heatmap.snapshot("10s", NOW_MS + 10_000)["counts"] == [[0, 0], [0, 1]]
+    print("✅ Expiração dos buckets da janela")
+
+
+if __name__ == "__main__":
+    test_cells()
+    test_one_sample_per_moto_and_bucket()
+    test_window_expiry()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Testes da máquina de estados de dwell time (StatusIntervalTracker) - não
+precisam do Oracle
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from fake_oracle import load_script
+
+script = load_script()
+
+EM_USO, NO_PATIO, MANUTENCAO = 0, 1, 2
+
+
+class IntervalsCursor:
+    """Cursor que responde ao SELECT do último intervalo de cada moto"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = []
+
+    def execute(self, sql, params):
+        self.params.append(params)
+
+    def fetchall(self):
+        return self.rows
+
+
+def _arrays(moto_ids, statuses, ts_ms):
+    return (
+        np.asarray(moto_ids, dtype=np.int64),
+        np.asarray(statuses, dtype=np.int64),
+        np.asarray(ts_ms, dtype=np.int64),
+    )
+
+
+def test_closes_intervals_on_change():
+    """Cada mudança de status fecha um intervalo; lote fora de ordem é ordenado"""
+    tracker = script.StatusIntervalTracker()
+    closed = tracker.update(
+        *_arrays(
+            [2, 1, 1, 2, 1, 1],
+            [NO_PATIO, MANUTENCAO, EM_USO, NO_PATIO, EM_USO, NO_PATIO],
+            [100, 300, 100, 200, 200, 400],
+        )
+    )
+    assert closed == [
+        (1, EM_USO, MANUTENCAO, 100, 300),
+        (1, MANUTENCAO, NO_PATIO, 300, 400),
+    ]
+    assert tracker.current(1) == [NO_PATIO, 400, 400]
+    assert tracker.current(2) == [NO_PATIO, 100, 200]
+    assert tracker.current(3) is None
+
+    # O próximo lote continua do estado anterior
+    closed = tracker.update(*_arrays([2], [EM_USO], [250]))
+    assert closed == [(2, NO_PATIO, EM_USO, 100, 250)]
+    print("✅ Intervalos fechados nas mudanças de status")
+
+
+def test_late_rows_and_plan_without_commit():
+    """Detecções atrasadas são descartadas; plan() só muda o estado no commit"""
+    tracker = script.StatusIntervalTracker()
+    tracker.update(*_arrays([1], [EM_USO], [1_000]))
+
+    # Atrasada: mais antiga que o último timestamp visto
+    assert tracker.update(*_arrays([1], [MANUTENCAO], [900])) == []
+    assert tracker.current(1) == [EM_USO, 1_000, 1_000]
+
+    closed, pending = tracker.plan(*_arrays([1], [NO_PATIO], [1_500]))
+    assert closed == [(1, EM_USO, NO_PATIO, 1_000, 1_500)]
+    assert tracker.current(1) == [EM_USO, 1_000, 1_000]
+    tracker.commit(pending)
+    assert tracker.current(1) == [NO_PATIO, 1_500, 1_500]
+    print("✅ Atrasadas descartadas e estado só no commit")
+
+
+def test_seeded_from_last_interval():
+    """Após restart, a moto parte do next_status do último intervalo gravado"""
+    exit_ts = datetime(2024, 1, 1, 12, 0)
+    exit_ms = int(np.datetime64(exit_ts, "ms").astype(np.int64))
+    cur = IntervalsCursor([(1, "manutencao", exit_ts), (2, "status_removido", exit_ts)])
+    tracker = script.StatusIntervalTracker()
+
+    closed, pending = tracker.plan(
+        *_arrays([1, 2], [NO_PATIO, NO_PATIO], [exit_ms + 60_000] * 2), cur=cur
+    )
+    assert cur.params == [[script.YARD_ID, 1, 2]]
+    # Moto 1 fecha a manutenção em curso; moto 2 (status desconhecido) recomeça
+    assert closed == [(1, MANUTENCAO, NO_PATIO, exit_ms, exit_ms + 60_000)]
+    tracker.commit(pending)
+    assert tracker.current(2) == [NO_PATIO, exit_ms + 60_000, exit_ms + 60_000]
+
+    # Motos já em memória não voltam ao banco
+    tracker.plan(*_arrays([1], [EM_USO], [exit_ms + 90_000]), cur=cur)
+    assert len(cur.params) == 1
+    print("✅ Estado inicial a partir do último intervalo")
+
+
+if __name__ == "__main__":
+    test_closes_intervals_on_change()
+    test_late_rows_and_plan_without_commit()
+    test_seeded_from_last_interval()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Testes do cache por moto (MotoQueryCache: versão, TTL, LRU e single-flight) -
+não precisam do Oracle
+"""
+
+import threading
+import time
+
+import pandas as pd
+
+from fake_oracle import load_script
+
+script = load_script()
+
+
+class Loader:
+    """Loader que conta chamadas e devolve um DataFrame novo a cada uma"""
+
+    def __init__(self, rows=10):
+        self.calls = 0
+        self.rows = rows
+
+    def __call__(self):
+        self.calls += 1
+        return pd.DataFrame({"x": range(self.rows), "call": self.calls})
+
+
+def _wait_for(condition, timeout_s=5.0):
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        assert time.monotonic() < deadline, "condição não foi atingida"
+        time.sleep(0.005)
+
+
+def test_hit_and_write_version():
+    """Hit até a moto ser gravada; bump() descarta só as entradas dela"""
+    cache = script.MotoQueryCache(60, 1 << 20)
+    loader = Loader()
+    first = cache.get_or_load(("moto", 1), 1, loader)
+    assert cache.get_or_load(("moto", 1), 1, loader) is first
+    cache.get_or_load(("moto", 2), 2, loader)
+
+    cache.bump([1, 1])
+    assert cache.get_or_load(("moto", 1), 1, loader)["call"][0] == 3
+    assert cache.get_or_load(("moto", 2), 2, loader)["call"][0] == 2
+    assert loader.calls == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stale"]) == (2, 3, 1)
+    assert stats["entries"] == 2
+    print("✅ Hit e invalidação por versão de escrita")
+
+
+def test_ttl_and_lru_eviction():
+    """Entrada expira no TTL; acima de max_bytes sai a menos usada"""
+    cache = script.MotoQueryCache(0.05, 1 << 20)
+    loader = Loader()
+    cache.get_or_load("a", 1, loader)
+    time.sleep(0.06)
+    cache.get_or_load("a", 1, loader)
+    assert loader.calls == 2
+
+    size = int(Loader()().memory_usage(deep=True).sum())
+    cache = script.MotoQueryCache(60, 2 * size)
+    loader = Loader()
+    for key in ["a", "b", "a", "c"]:  # "a" foi usada depois de "b"
+        cache.get_or_load(key, 1, loader)
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.stats()["bytes"] == 2 * size
+    assert cache.counters["evictions"] == 1
+
+    # Resultado maior que o cache inteiro não é guardado
+    big = Loader(rows=10_000)
+    cache.get_or_load("big", 1, big)
+    cache.get_or_load("big", 1, big)
+    assert big.calls == 2
+    assert list(cache._entries) == ["a", "c"]
+    print("✅ TTL e despejo LRU por bytes")
+
+
+def test_single_flight():
+    """Misses simultâneos da mesma chave fazem uma consulta só"""
+    cache = script.MotoQueryCache(60, 1 << 20)
+    release = threading.Event()
+    loader = Loader()
+
+    def slow_loader():
+        release.wait(5)
+        return loader()
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_load("k", 1, slow_loader))
+        )
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    _wait_for(lambda: cache.counters["coalesced"] == 3)
+    release.set()
+    for t in threads:
+        t.join()
+    assert loader.calls == 1
+    assert len(results) == 4 and all(r is results[0] for r in results)
+    print("✅ Single-flight: uma consulta para misses simultâneos")
+
+
+def test_loader_error_not_cached():
+    """Erro do loader chega a quem esperava e a próxima chamada tenta de novo"""
+    cache = script.MotoQueryCache(60, 1 << 20)
+    release = threading.Event()
+
+    def failing_loader():
+        release.wait(5)
+        raise RuntimeError("banco fora")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_load("k", 1, failing_loader)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for t in threads:
+        t.start()
+    _wait_for(lambda: cache.counters["coalesced"] == 1)
+    release.set()
+    for t in threads:
+        t.join()
+    assert errors == ["banco fora", "banco fora"]
+
+    loader = Loader()
+    cache.get_or_load("k", 1, loader)
+    assert loader.calls == 1
+    print("✅ Erro do loader não fica no cache")
+
+
+if __name__ == "__main__":
+    test_hit_and_write_version()
+    test_ttl_and_lru_eviction()
+    test_single_flight()
+    test_loader_error_not_cached()
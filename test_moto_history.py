@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Testes dos ring buffers de histórico recente (MotoHistory) - não precisam do
+Oracle
+"""
+
+import numpy as np
+
+from fake_oracle import load_script
+
+script = load_script()
+
+T0 = 1_700_000_000_000
+
+
+def _history(capacity, initial_slots=2):
+    history = script.MotoHistory(capacity, initial_slots=initial_slots)
+    history.started_ms = 0  # o horizonte vem só dos buffers cheios
+    return history
+
+
+def _record(history, moto_ids, ts_ms, samples=None):
+    n = len(moto_ids)
+    ts_ms = np.asarray(ts_ms, dtype=np.int64)
+    history.record(
+        np.asarray(moto_ids, dtype=np.int64),
+        (ts_ms % 800).astype(float),
+        np.full(n, 10.0),
+        np.zeros(n, dtype=np.int64),
+        np.ones(n, dtype=np.int64),
+        ts_ms,
+        None if samples is None else np.asarray(samples, dtype=np.int32),
+    )
+
+
+def test_ring_matches_reference():
+    """Lotes de tamanhos variados (inclusive maiores que o buffer) e motos novas"""
+    capacity = 8
+    history = _history(capacity)
+    rng = np.random.default_rng(5)
+    reference = {}
+    ts = T0
+    for _ in range(40):
+        n = int(rng.integers(1, 3 * capacity))
+        moto_ids = rng.integers(1, 7, n)
+        stamps = ts + np.arange(n)
+        ts += n
+        _record(history, moto_ids, stamps, samples=stamps % 5 + 1)
+        for moto_id, stamp in zip(moto_ids.tolist(), stamps.tolist()):
+            reference.setdefault(moto_id, []).append(stamp)
+
+    assert history.stats()["motos"] == len(reference)
+    assert history.stats()["allocated_slots"] >= len(reference)
+    for moto_id, stamps in reference.items():
+        kept = stamps[-capacity:]
+        page = history.moto(moto_id, len(kept))
+        expected = np.array(kept[::-1]).astype("datetime64[ms]")
+        np.testing.assert_array_equal(page["TIMESTAMP"].to_numpy(), expected)
+        np.testing.assert_array_equal(page["SAMPLES"], np.array(kept[::-1]) % 5 + 1)
+        assert (page["MOTO_ID"] == moto_id).all() and page["ID"].isna().all()
+        assert history.moto(moto_id, len(kept) + 1) is None
+    assert history.moto(99, 1) is None
+    print("✅ Ring buffers iguais à referência")
+
+
+def test_cutoff_ties():
+    """Linhas com o timestamp do corte entram todas, em moto() e latest()"""
+    history = _history(10)
+    # Dois ticks da frota: três motos em T0 e três em T0 + 100
+    _record(history, [1, 2, 3, 1, 2, 3], [T0] * 3 + [T0 + 100] * 3)
+
+    page = history.latest(4)
+    assert len(page) == 6
+    assert page["TIMESTAMP"].is_monotonic_decreasing
+    assert len(history.latest(3)) == 3
+
+    _record(history, [1], [T0 + 100])
+    assert len(history.moto(1, 1)) == 2
+    assert len(history.moto(1, 3)) == 3
+    print("✅ Empates no corte entram na página")
+
+
+def test_latest_horizon():
+    """Buffer cheio: só responde se o corte for mais novo que o início dele"""
+    history = _history(4)
+    _record(history, [1] * 6, T0 + np.arange(6) * 100)  # guarda 200..500
+    _record(history, [2] * 2, [T0 + 50, T0 + 450])
+    # A moto 1 já descartou 0 e 100: cortes até T0 + 200 vão ao banco
+    assert len(history.latest(2)) == 2  # corte em T0 + 450
+    assert len(history.latest(4)) == 4  # corte em T0 + 300
+    assert history.latest(5) is None  # corte em T0 + 200
+
+    history.started_ms = T0 + 1_000
+    assert history.latest(1) is None
+    assert history.latest(0) is None
+    print("✅ Horizonte do latest()")
+
+
+if __name__ == "__main__":
+    test_ring_matches_reference()
+    test_cutoff_ties()
+    test_latest_horizon()
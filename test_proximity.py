@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Testes da detecção de proximidade (find_close_pairs/ProximityDetector) - não
+precisam do Oracle
+"""
+
+import numpy as np
+
+from fake_oracle import load_script
+
+script = load_script()
+
+
+def _brute_force(xs, ys, distance):
+    """Todos os pares i < j a menos de ``distance``, em O(n²)"""
+    dist = np.hypot(xs[:, None] - xs[None, :], ys[:, None] - ys[None, :])
+    i, j = np.nonzero(np.triu(dist < distance, k=1))
+    return {(a, b): dist[a, b] for a, b in zip(i.tolist(), j.tolist())}
+
+
+def _pairs(xs, ys, distance):
+    i, j, dist = script.find_close_pairs(xs, ys, distance)
+    pairs = {}
+    for a, b, d in zip(i.tolist(), j.tolist(), dist.tolist()):
+        key = (min(a, b), max(a, b))
+        assert key not in pairs, f"par {key} repetido"
+        pairs[key] = d
+    return pairs
+
+
+def test_matches_brute_force():
+    """Mesmos pares e distâncias da comparação O(n²), cada par uma vez"""
+    rng = np.random.default_rng(11)
+    for n, distance in [(300, 25.0), (200, 7.5), (50, 400.0)]:
+        xs = rng.uniform(0, 800, n)
+        ys = rng.uniform(0, 600, n)
+        # Aglomerado e pontos repetidos numa mesma célula
+        xs[:20] = 100 + rng.normal(0, 2, 20)
+        ys[:20] = 100 + rng.normal(0, 2, 20)
+        xs[20:23], ys[20:23] = 500.0, 300.0
+        expected = _brute_force(xs, ys, distance)
+        found = _pairs(xs, ys, distance)
+        assert found.keys() == expected.keys()
+        for key, d in expected.items():
+            assert abs(found[key] - d) < 1e-9
+    print("✅ Pares iguais aos da força bruta")
+
+
+def test_cell_borders():
+    """Vizinhos em células adjacentes (inclusive na diagonal) são encontrados"""
+    distance = 10.0
+    xs = np.array([9.9, 10.1, 19.9, 20.1, 29.9, 0.0])
+    ys = np.array([9.9, 10.1, 0.5, 9.5, 19.9, 30.0])
+    expected = _brute_force(xs, ys, distance)
+    assert _pairs(xs, ys, distance).keys() == expected.keys()
+    assert (0, 1) in expected and (2, 3) in expected
+
+    # Exatamente na distância não conta; menos de dois pontos não gera pares
+    assert _pairs(np.array([0.0, 10.0]), np.array([0.0, 0.0]), distance) == {}
+    assert _pairs(np.array([1.0]), np.array([1.0]), distance) == {}
+    print("✅ Vizinhos em células adjacentes")
+
+
+def test_detector_alerts_on_entry():
+    """Alerta só quando o par entra no raio, não a cada verificação"""
+    detector = script.ProximityDetector(10.0)
+    moto_ids = np.array([7, 3, 5])
+
+    def alerts():
+        return [
+            (a["moto_id"], a["other_moto_id"])
+            for a in script.alert_feed.recent(60)
+            if a["type"] == "proximity" and a["moto_id"] in (3, 7)
+        ]
+
+    before = len(alerts())
+    close = (np.array([0.0, 5.0, 300.0]), np.array([0.0, 0.0, 300.0]))
+    assert list(detector.check(moto_ids, *close)) == [(3, 7)]
+    detector.check(moto_ids, *close)
+    assert alerts()[before:] == [(3, 7)]
+
+    # Afastam e voltam: novo alerta
+    detector.check(moto_ids, np.array([0.0, 200.0, 300.0]), close[1])
+    detector.check(moto_ids, *close)
+    assert alerts()[before:] == [(3, 7), (3, 7)]
+    print("✅ Alerta de proximidade na entrada do par")
+
+
+if __name__ == "__main__":
+    test_matches_brute_force()
+    test_cell_borders()
+    test_detector_alerts_on_entry()
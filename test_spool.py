@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Testes de recuperação do spool (spool.py) após crash - não precisam do Oracle
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from fake_oracle import FAKE_CONN, database_error, load_script
+from spool import CHECKPOINT_FILE, DEAD_LETTER_FILE, RECORD_DTYPE, SEGMENT_PREFIX, Spool
+
+
+class FakeDatabase:
+    """Sink em memória: grava linhas e checkpoint juntos, como a transação real"""
+
+    def __init__(self):
+        self.seqs = []
+        self.checkpoint = 0
+
+    def sink(self, moto_ids, xs, ys, ts_ms, last_seq):
+        first = last_seq - len(moto_ids) + 1
+        self.seqs.extend(range(first, last_seq + 1))
+        self.checkpoint = last_seq
+
+    def load_checkpoint(self, spool_id):
+        return self.checkpoint
+
+
+def _open(directory, db, **kwargs):
+    kwargs.setdefault("segment_records", 4)
+    return Spool(directory, db.sink, db.load_checkpoint, **kwargs)
+
+
+def _append(spool, n):
+    moto_ids = np.arange(n) % 4 + 1
+    return spool.append(moto_ids, np.full(n, 10.0), np.full(n, 20.0), np.arange(n))
+
+
+def _drain(spool, until_seq, timeout_s=5.0):
+    """Sobe o drainer (se parado) e espera o checkpoint chegar em ``until_seq``"""
+    if spool._thread is None or not spool._thread.is_alive():
+        spool.start()
+    deadline = time.monotonic() + timeout_s
+    while spool.checkpoint < until_seq:
+        assert time.monotonic() < deadline, "drainer não alcançou o checkpoint"
+        time.sleep(0.01)
+
+
+def _segment_files(directory):
+    return sorted(n for n in os.listdir(directory) if n.startswith(SEGMENT_PREFIX))
+
+
+def test_partial_record_truncated():
+    """Registro escrito pela metade no crash: o spool para no último válido"""
+    with tempfile.TemporaryDirectory() as base:
+        db = FakeDatabase()
+        spool = _open(base, db, segment_records=16)
+        assert _append(spool, 10) == 10
+        directory = spool.directory
+        spool.close()
+
+        # Crash no meio do registro 8: só metade dos bytes chegou ao disco
+        path = os.path.join(directory, _segment_files(directory)[0])
+        size = RECORD_DTYPE.itemsize
+        with open(path, "r+b") as f:
+            f.seek(7 * size + size // 2)
+            f.write(b"\x00" * (size - size // 2))
+
+        spool = _open(base, db, segment_records=16)
+        assert spool.next_seq == 8
+        assert _append(spool, 3) == 10
+        _drain(spool, 10)
+        spool.close()
+        assert db.seqs == list(range(1, 11))
+    print("✅ Registro parcial descartado e sequência retomada")
+
+
+def test_resume_without_duplicates():
+    """Restart no meio da drenagem não regrava o que o banco já tem"""
+    with tempfile.TemporaryDirectory() as base:
+        db = FakeDatabase()
+        spool = _open(base, db, drain_batch=3)
+        _append(spool, 6)
+        _drain(spool, 6)
+        # Drainer parado: os próximos 5 ficam só no spool quando o processo cai
+        spool.stop()
+        _append(spool, 5)
+        spool.close()
+
+        spool = _open(base, db, drain_batch=3)
+        assert spool.checkpoint == 6
+        assert spool.counters["replayed_on_start"] == 5
+        _drain(spool, 11)
+        spool.close()
+        assert db.seqs == list(range(1, 12))
+    print("✅ Retomada do checkpoint sem duplicatas")
+
+
+def test_database_checkpoint_ahead():
+    """Crash entre o commit no banco e a gravação do checkpoint local"""
+    with tempfile.TemporaryDirectory() as base:
+        db = FakeDatabase()
+        spool = _open(base, db)
+        _append(spool, 9)
+        directory = spool.directory
+        spool.close()
+
+        # O banco confirmou até o seq 7, mas o arquivo ficou em 2
+        db.sink(np.zeros(7), None, None, None, 7)
+        with open(os.path.join(directory, CHECKPOINT_FILE), "w") as f:
+            f.write("2")
+
+        spool = _open(base, db)
+        assert spool.checkpoint == 2
+        _drain(spool, 9)
+        spool.close()
+        assert db.seqs == list(range(1, 10))
+        with open(os.path.join(directory, CHECKPOINT_FILE)) as f:
+            assert int(f.read()) == 9
+    print("✅ Checkpoint do banco à frente do arquivo local")
+
+
+def test_garbage_collection():
+    """Segmentos cheios e drenados são apagados; buracos descartam o resto"""
+    with tempfile.TemporaryDirectory() as base:
+        db = FakeDatabase()
+        spool = _open(base, db)
+        _append(spool, 14)
+        directory = spool.directory
+        assert len(_segment_files(directory)) == 4
+        _drain(spool, 14)
+        # Só o segmento parcial (seq 13-14) continua em disco
+        assert _segment_files(directory) == [f"{SEGMENT_PREFIX}{13:020d}.log"]
+        assert spool.stats()["lag_records"] == 0
+        _append(spool, 10)
+        spool.close()
+
+        # Segmento do meio perdido: o que vem depois dele não é confiável
+        files = _segment_files(directory)
+        assert len(files) == 3
+        os.remove(os.path.join(directory, files[1]))
+        spool = _open(base, db)
+        assert _segment_files(directory) == files[:1]
+        assert spool.next_seq == 17
+        spool.close()
+    print("✅ Coleta de segmentos drenados")
+
+
+def test_database_failures_are_retried():
+    """Falha do banco que não é sobre os dados não vai para o dead letter"""
+    script = load_script()
+    assert script._is_data_error(database_error(12899))
+    assert not script._is_data_error(database_error(1653))  # tablespace cheio
+
+    failures = [database_error(1653), database_error(60), TypeError("bug")]
+    rng = np.random.default_rng(3)
+    with tempfile.TemporaryDirectory() as base:
+        spool = Spool(base, script._drain_spool_batch, max_retry_s=0.05)
+        previous, script.spool = script.spool, spool
+        spool.start()
+        try:
+            for error in failures:
+                FAKE_CONN.fail_with = error
+                # Posições novas: a banda morta não segura as linhas
+                last_seq = spool.append(
+                    np.arange(1, 6),
+                    rng.uniform(0, 800, 5),
+                    rng.uniform(0, 600, 5),
+                    np.full(5, script._now_ms()),
+                )
+                _drain(spool, last_seq)
+            assert spool.counters["drain_errors"] == len(failures)
+            assert spool.counters["dead_lettered"] == 0
+            assert spool.counters["drained"] == 15
+            dead_letter = os.path.join(spool.directory, DEAD_LETTER_FILE)
+            assert not os.path.exists(dead_letter)
+
+            # Erro sobre os dados (valor grande demais): esse sim é isolado
+            FAKE_CONN.fail_with = database_error(12899)
+            _drain(spool, spool.append([9], [1.0], [2.0], [script._now_ms()]))
+            assert spool.counters["dead_lettered"] == 1
+            assert os.path.exists(dead_letter)
+        finally:
+            script.spool = previous
+            spool.close()
+    print("✅ Falhas do banco repetidas, nada no dead letter")
+
+
+if __name__ == "__main__":
+    test_partial_record_truncated()
+    test_resume_without_duplicates()
+    test_database_checkpoint_ahead()
+    test_garbage_collection()
+    test_database_failures_are_retried()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Testes do relógio de passo fixo da simulação (TickScheduler) com um relógio
+falso - não precisam do Oracle
+"""
+
+from fake_oracle import load_script
+
+script = load_script()
+
+
+class FakeClock:
+    """Substitui o módulo ``time`` do script: sleep só avança o relógio"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+class FakeStop:
+    """Event de parada que nunca dispara: wait() dorme no relógio falso"""
+
+    def __init__(self, clock):
+        self.clock = clock
+
+    def wait(self, timeout):
+        self.clock.sleep(timeout)
+        return False
+
+
+def _with_clock(test):
+    def run():
+        clock = FakeClock()
+        previous, script.time = script.time, clock
+        try:
+            test(clock)
+        finally:
+            script.time = previous
+
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+
+@_with_clock
+def test_no_drift(clock):
+    """Prazos absolutos: o trabalho de cada tick não empurra os seguintes"""
+    scheduler = script.TickScheduler(10)
+    assert scheduler.wait() == 0
+    assert clock.sleeps == []  # o primeiro prazo é o próprio início
+    for expected in range(1, 6):
+        clock.now += 0.03  # trabalho do tick
+        assert scheduler.wait() == expected
+    assert clock.sleeps == [0.07] * 5
+    assert abs(clock.now - 1000.5) < 1e-9
+    assert scheduler.counters == {"ticks": 6, "overruns": 0, "skipped": 0}
+    assert scheduler.lag_ms() == 0.0
+    print("✅ Passo fixo sem drift")
+
+
+@_with_clock
+def test_catchup_and_skip(clock):
+    """Atraso pequeno é recuperado em sequência; grande pula ticks"""
+    scheduler = script.TickScheduler(10, max_catchup=3)
+    scheduler.wait()
+
+    # 0,25 s de atraso: ticks 1, 2 e 3 saem em seguida, sem dormir
+    clock.now += 0.35
+    assert [scheduler.wait() for _ in range(3)] == [1, 2, 3]
+    assert clock.sleeps == []
+    assert scheduler.counters["overruns"] == 2  # ticks 1 e 2 com ≥ 1 período
+    # Em dia de novo: o tick 4 volta a esperar o prazo
+    assert scheduler.wait() == 4
+    assert clock.sleeps == [0.05] and abs(clock.now - 1000.4) < 1e-9
+
+    # 0,95 s de atraso: 9 ticks para trás, só max_catchup são recuperados
+    clock.now += 1.05
+    assert abs(scheduler.lag_ms() - 950.0) < 1e-6
+    assert scheduler.wait() == 5 + 6
+    assert scheduler.counters["skipped"] == 6
+    assert [scheduler.wait() for _ in range(3)] == [12, 13, 14]
+    assert len(clock.sleeps) == 1
+    assert scheduler.wait() == 15 and len(clock.sleeps) == 2
+    print("✅ Recuperação limitada e ticks pulados")
+
+
+@_with_clock
+def test_stop_event(clock):
+    """Com stop_event a espera usa event.wait (a parada acorda o laço)"""
+    scheduler = script.TickScheduler(4)
+    stop = FakeStop(clock)
+    scheduler.wait(stop)
+    scheduler.wait(stop)
+    assert clock.sleeps == [0.25]
+    assert scheduler.stats()["tick_hz"] == 4.0
+    print("✅ Espera pelo evento de parada")
+
+
+if __name__ == "__main__":
+    test_no_drift()
+    test_catchup_and_skip()
+    test_stop_event()